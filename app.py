@@ -1,12 +1,16 @@
 """Main application factory for the Wake-on-LAN Flask application."""
 
-from flask import Flask
+from flask import Flask, Response, jsonify
+from typing import Tuple
 from core.config import config
-from services import DeviceService, MonitoringService, DiscoveryService, WakeOnLanService
+from core.shared_state import LeaderUnavailable
+from services import (
+    DeviceService, MonitoringService, DiscoveryService, WakeOnLanService, WakeJobService, ClusterService
+)
 from routes import (
-    main_bp, devices_bp, status_bp, wol_bp, discovery_bp,
+    main_bp, devices_bp, status_bp, wol_bp, discovery_bp, events_bp, metrics_bp,
     init_main_routes, init_device_routes, init_status_routes, 
-    init_wol_routes, init_discovery_routes
+    init_wol_routes, init_discovery_routes, init_metrics_routes
 )
 
 
@@ -16,17 +20,20 @@ def create_app() -> Flask:
     app.secret_key = config.app_secret_key
     
     # Initialize services
-    device_service = DeviceService()
-    monitoring_service = MonitoringService(device_service)
-    discovery_service = DiscoveryService()
-    wol_service = WakeOnLanService(device_service)
+    cluster = ClusterService() if config.multi_worker else None
+    device_service = DeviceService(cluster=cluster)
+    monitoring_service = MonitoringService(device_service, cluster)
+    discovery_service = DiscoveryService(device_service, cluster=cluster)
+    wol_service = WakeOnLanService(device_service, monitoring_service)
+    wake_job_service = WakeJobService(wol_service, monitoring_service, cluster)
     
     # Initialize route dependencies
     init_main_routes(device_service, monitoring_service)
-    init_device_routes(device_service)
+    init_device_routes(device_service, monitoring_service)
     init_status_routes(monitoring_service)
-    init_wol_routes(wol_service)
+    init_wol_routes(wol_service, wake_job_service)
     init_discovery_routes(discovery_service, device_service)
+    init_metrics_routes(monitoring_service)
     
     # Register blueprints
     app.register_blueprint(main_bp)
@@ -34,9 +41,19 @@ def create_app() -> Flask:
     app.register_blueprint(status_bp)
     app.register_blueprint(wol_bp)
     app.register_blueprint(discovery_bp)
+    app.register_blueprint(events_bp)
+    if config.metrics_enabled:
+        app.register_blueprint(metrics_bp)
+    
+    @app.errorhandler(LeaderUnavailable)
+    def leader_unavailable(e: LeaderUnavailable) -> Tuple[Response, int]:
+        return jsonify({'error': str(e)}), 503
     
-    # Start monitoring service
-    monitoring_service.start_monitoring()
+    # Start monitoring service; with several workers only the elected leader monitors
+    if cluster is not None:
+        cluster.start(monitoring_service, discovery_service, wake_job_service)
+    else:
+        monitoring_service.start_monitoring()
     
     return app
 
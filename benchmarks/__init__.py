@@ -0,0 +1 @@
+"""Offline benchmark and load-test suite; run with ``python -m benchmarks``."""
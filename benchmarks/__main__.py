@@ -0,0 +1,153 @@
+"""Command-line entry point for the benchmark suite.
+
+    python -m benchmarks run --sizes 100,1000,10000
+    python -m benchmarks compare benchmarks/results/abc1234.json benchmarks/results/def5678.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .fake_network import FakeNetwork
+
+SCENARIOS = ('sweep', 'discovery', 'routes')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(['git', *args], capture_output=True, text=True, timeout=10,
+                              cwd=os.path.dirname(RESULTS_DIR)).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def _parse_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def run(args: argparse.Namespace) -> int:
+    # Imported here so `compare` works without the app's dependencies
+    from .scenarios import run_size
+
+    scenarios = _parse_list(args.scenarios)
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    sizes = [int(size) for size in _parse_list(args.sizes)]
+    commit = _git('rev-parse', '--short', 'HEAD') or 'unknown'
+    report: Dict[str, Any] = {
+        'meta': {
+            'commit': commit,
+            'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'params': {
+                'scenarios': scenarios, 'backend': args.backend, 'storage': args.storage,
+                'online_fraction': args.online, 'latency_ms': args.latency_ms,
+                'jitter_ms': args.jitter_ms, 'loss': args.loss, 'probe_timeout': args.probe_timeout,
+                'workers': args.workers, 'clients': args.clients, 'requests': args.requests,
+                'seed': args.seed,
+            },
+        },
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='wol-bench-') as workdir:
+        for size in sizes:
+            fake = FakeNetwork.for_size(size, online_fraction=args.online, latency_ms=args.latency_ms,
+                                        jitter_ms=args.jitter_ms, loss=args.loss,
+                                        down_wait_ms=args.probe_timeout * 1000, seed=args.seed)
+            print(f'Benchmarking {size} devices on {fake.network} ...', file=sys.stderr)
+            directory = os.path.join(workdir, str(size))
+            report['results'][str(size)] = run_size(
+                fake, directory, scenarios, args.backend, args.storage, args.probe_timeout,
+                args.workers, args.timeout, args.clients, args.requests)
+
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}.json')
+    if output == '-':
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f'Results written to {output}', file=sys.stderr)
+    return 0
+
+
+def _flatten(data: Any, prefix: str = '') -> Iterator[Tuple[str, float]]:
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from _flatten(value, f'{prefix}.{key}' if prefix else str(key))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        yield prefix, float(data)
+
+
+def compare(args: argparse.Namespace) -> int:
+    reports = []
+    for path in (args.base, args.new):
+        with open(path) as f:
+            reports.append(json.load(f))
+    base, new = (dict(_flatten(report.get('results', {}))) for report in reports)
+    base_meta, new_meta = (report.get('meta', {}) for report in reports)
+    if base_meta.get('params') != new_meta.get('params'):
+        print('Warning: the runs used different parameters', file=sys.stderr)
+    print(f"{'metric':<60} {base_meta.get('commit', 'base'):>12} {new_meta.get('commit', 'new'):>12} {'change':>9}")
+    for key in sorted(set(base) | set(new)):
+        old_value: Optional[float] = base.get(key)
+        new_value: Optional[float] = new.get(key)
+        if old_value is not None and new_value is not None and old_value:
+            change = f'{(new_value - old_value) / abs(old_value) * 100:+.1f}%'
+        else:
+            change = ''
+        print(f"{key:<60} {'-' if old_value is None else f'{old_value:g}':>12} "
+              f"{'-' if new_value is None else f'{new_value:g}':>12} {change:>9}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Benchmark the app against a simulated network')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run the benchmarks and write JSON results')
+    run_parser.add_argument('--sizes', default='100,1000', help='Comma-separated inventory sizes (100 to 50000)')
+    run_parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f"Comma-separated subset of {', '.join(SCENARIOS)}")
+    run_parser.add_argument('--backend', choices=('native', 'subprocess'), default='native',
+                            help='Probe backend; subprocess runs stub ping/arping/wakeonlan commands')
+    run_parser.add_argument('--storage', choices=('json', 'sqlite'), default='json')
+    run_parser.add_argument('--online', type=float, default=0.8, help='Fraction of hosts that are up')
+    run_parser.add_argument('--latency-ms', type=float, default=1.0, help='Mean reply latency')
+    run_parser.add_argument('--jitter-ms', type=float, default=0.5, help='Reply latency spread')
+    run_parser.add_argument('--loss', type=float, default=0.0, help='Probability that a probe is lost')
+    run_parser.add_argument('--probe-timeout', type=float, default=1.0,
+                            help='Probe timeout, also how long silent hosts keep a probe waiting')
+    run_parser.add_argument('--workers', type=int, default=2048, help='Monitoring probes in flight at once')
+    run_parser.add_argument('--clients', type=int, default=8, help='Concurrent HTTP clients')
+    run_parser.add_argument('--requests', type=int, default=200, help='Requests per route')
+    run_parser.add_argument('--timeout', type=float, default=600, help='Limit per sweep or scan in seconds')
+    run_parser.add_argument('--seed', type=int, default=1)
+    run_parser.add_argument('--output', help="Output file (default benchmarks/results/<commit>.json, '-' for stdout)")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser('compare', help='Show the change between two result files')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Simulated network for the benchmarks.
+
+Hosts are the first ``size`` addresses of ``network``. Whether each one is up
+and its MAC address are derived from a seeded hash of the address, so the
+command stubs (separate processes) and the in-process probe patches agree
+without sharing state. A probe of an up host is answered after
+``latency_ms`` +/- ``jitter_ms`` unless it is dropped with probability
+``loss``; unanswered probes wait ``down_wait_ms`` (or the caller's timeout).
+
+This module only uses the standard library so the command stubs start fast.
+"""
+
+import importlib
+import ipaddress
+import math
+import os
+import random
+import sys
+import time
+import zlib
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_STUB = '''#!{python} -S
+import sys
+sys.path.insert(0, {root!r})
+from benchmarks.fake_network import FakeNetwork
+sys.exit(FakeNetwork(**{params!r}).run_command({name!r}, sys.argv[1:]))
+'''
+
+
+class FakeNetwork:
+    """Deterministic simulated hosts with configurable latency and loss"""
+
+    def __init__(self, network: str = '10.0.0.0/24', size: int = 100, online_fraction: float = 0.8,
+                 latency_ms: float = 1.0, jitter_ms: float = 0.5, loss: float = 0.0,
+                 down_wait_ms: float = 1000.0, seed: int = 1):
+        self.network = network
+        self.size = size
+        self.online_fraction = online_fraction
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.loss = loss
+        self.down_wait_ms = down_wait_ms
+        self.seed = seed
+        self._network = ipaddress.IPv4Network(network)
+        self._random = random.Random(seed)
+        self.arp_cache: Dict[str, str] = {}
+
+    @classmethod
+    def for_size(cls, size: int, **kwargs: Any) -> 'FakeNetwork':
+        """Network in 10.0.0.0/8 just large enough for size hosts (at least a /24)"""
+        prefix = min(24, 32 - math.ceil(math.log2(size + 2)))
+        return cls(network=f'10.0.0.0/{prefix}', size=size, **kwargs)
+
+    def params(self) -> Dict[str, Any]:
+        return {'network': self.network, 'size': self.size, 'online_fraction': self.online_fraction,
+                'latency_ms': self.latency_ms, 'jitter_ms': self.jitter_ms, 'loss': self.loss,
+                'down_wait_ms': self.down_wait_ms, 'seed': self.seed}
+
+    def addresses(self) -> List[str]:
+        """Addresses of the simulated hosts, up or not"""
+        return [str(ip) for ip in islice(self._network.hosts(), self.size)]
+
+    def address_count(self) -> int:
+        """Usable addresses in the network, which a discovery sweep covers"""
+        return max(0, self._network.num_addresses - 2)
+
+    def is_up(self, ip: str) -> bool:
+        try:
+            offset = int(ipaddress.IPv4Address(ip)) - int(self._network.network_address)
+        except ValueError:
+            return False
+        if not 0 < offset <= self.size:
+            return False
+        return zlib.crc32(f'{self.seed}:{ip}'.encode()) / 2 ** 32 < self.online_fraction
+
+    def expected_online(self) -> int:
+        return sum(1 for ip in self.addresses() if self.is_up(ip))
+
+    @staticmethod
+    def mac_for(ip: str) -> str:
+        """Locally administered MAC derived from the address"""
+        return '02:00:' + ':'.join(f'{b:02X}' for b in ipaddress.IPv4Address(ip).packed)
+
+    def answers(self, ip: str) -> bool:
+        """Whether one probe of ip gets a reply"""
+        return self.is_up(ip) and self._random.random() >= self.loss
+
+    def rtt(self) -> float:
+        """Round-trip time of one answered probe, in seconds"""
+        return max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    # Command stubs
+
+    def run_command(self, name: str, args: List[str]) -> int:
+        """Behave like ping, arping or wakeonlan as invoked by the app. Returns the exit code."""
+        if name == 'wakeonlan':
+            print(f"Sending magic packet to 255.255.255.255:9 with {args[-1] if args else ''}")
+            return 0
+        ip = args[-1] if args else ''
+        # Every stub process starts from the same seed; vary it so loss and
+        # jitter differ between invocations
+        self._random.seed(f'{self.seed}:{os.getpid()}:{ip}')
+        count = int(args[args.index('-c') + 1]) if '-c' in args else 1
+        deadline = float(args[args.index('-w') + 1]) if '-w' in args else None
+        answered = 0
+        for _ in range(count):
+            if self.answers(ip):
+                time.sleep(self.rtt())
+                answered += 1
+        if not answered:
+            wait = self.down_wait_ms / 1000
+            time.sleep(min(wait, deadline) if deadline is not None else wait)
+            return 1
+        if name == 'arping':
+            print(f"Unicast reply from {ip} [{self.mac_for(ip)}]  {self.latency_ms:.3f}ms")
+        else:
+            print(f"64 bytes from {ip}: icmp_seq=1 ttl=64 time={self.latency_ms:.3f} ms")
+        return 0
+
+    def write_commands(self, directory: str) -> Dict[str, str]:
+        """Write ping, arping and wakeonlan stubs. Returns name -> path."""
+        paths = {}
+        for name in ('ping', 'arping', 'wakeonlan'):
+            path = os.path.join(directory, name)
+            with open(path, 'w') as f:
+                f.write(_STUB.format(python=sys.executable, root=_ROOT, params=self.params(), name=name))
+            os.chmod(path, 0o755)
+            paths[name] = path
+        return paths
+
+    # In-process probes for the native backend
+
+    async def ping_async(self, host: str, timeout: float) -> Optional[float]:
+        """Stand-in for the probe engine's native ping: the reply arrives after one
+        round trip, a silent host keeps the probe waiting for the timeout"""
+        import asyncio
+        if self.answers(host):
+            rtt = self.rtt()
+            if rtt < timeout:
+                await asyncio.sleep(rtt)
+                self.arp_cache[host] = self.mac_for(host)
+                return rtt
+        await asyncio.sleep(timeout)
+        return None
+
+    def read_arp_table(self) -> Dict[str, str]:
+        return dict(self.arp_cache)
+
+    @contextmanager
+    def patch_native(self) -> Iterator['FakeNetwork']:
+        """Route the probe engine's native pings, ARP table reads and raw-socket
+        checks to this network for the duration of the block"""
+        engine = importlib.import_module('core.probe_engine').probe_engine
+        discovery = importlib.import_module('services.discovery_service')
+        patches = [
+            (engine, '_native_ping', self.ping_async),
+            (discovery, 'read_arp_table', self.read_arp_table),
+            (discovery, 'read_neighbor_table', self.read_arp_table),
+            (discovery, 'neighbor_table_available', lambda: True),
+            (discovery, 'arp_socket_available', lambda: False),
+        ]
+        originals = []
+        for target, attribute, replacement in patches:
+            originals.append((target, attribute, target.__dict__.get(attribute)))
+            setattr(target, attribute, replacement)
+        try:
+            yield self
+        finally:
+            for target, attribute, original in reversed(originals):
+                if original is None:
+                    delattr(target, attribute)  # instance attribute shadowing a method
+                else:
+                    setattr(target, attribute, original)
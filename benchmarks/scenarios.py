@@ -0,0 +1,285 @@
+"""Benchmark scenarios run against a FakeNetwork.
+
+Each scenario builds the real services through ``create_app`` with the
+configuration pointed at a scratch directory, so storage, monitoring,
+discovery and the routes are exercised exactly as in production; only the
+network underneath is simulated.
+"""
+
+import http.client
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from core.config import config
+from core.models import Device
+from core.utils import generate_device_id
+from .fake_network import FakeNetwork
+
+# Routes loaded by the concurrent clients; {device_id} is filled per request
+ROUTES: Sequence[Tuple[str, str]] = (
+    ('GET', '/'),
+    ('GET', '/devices'),
+    ('GET', '/devices?status=online&sort=name&page=2'),
+    ('GET', '/status'),
+    ('GET', '/status/monitoring'),
+    ('GET', '/status/history'),
+    ('GET', '/discover/status'),
+    ('GET', '/metrics'),
+    ('POST', '/wake/{device_id}'),
+)
+
+POLL_SECONDS = 0.05
+
+
+def configure(workdir: str, fake: FakeNetwork, backend: str, storage: str,
+              probe_timeout: float, workers: int) -> None:
+    """Point every path at workdir and the network settings at the fake network"""
+    settings = {
+        'paths': {
+            'storage_backend': storage,
+            'devices_file': os.path.join(workdir, 'devices.json'),
+            'database_file': os.path.join(workdir, 'wol.db'),
+            'discovery_file': os.path.join(workdir, 'discovery.json'),
+            'oui_file': os.path.join(workdir, 'oui.bin'),
+            'history_dir': '',
+        },
+        'monitoring': {
+            # One sweep per run: the first probes are spread over a second,
+            # the next ones are an interval away
+            'interval_seconds': 3600,
+            'jitter': 0,
+            'ping_count': 1,
+            'probe_timeout_seconds': probe_timeout,
+            'max_workers': workers,
+        },
+        'network': {
+            'local_network': fake.network,
+            'local_networks': [],
+            'discovery_mode': 'active',
+            'probe_backend': backend,
+            'resolve_hostnames': False,
+            'arp_timeout_seconds': probe_timeout,
+        },
+        'wol': {
+            'method': 'native' if backend == 'native' else 'command',
+            'broadcast_address': '127.0.0.1',
+            'subnets': [],
+        },
+    }
+    if backend != 'native':
+        commands = fake.write_commands(workdir)
+        settings['paths'].update({f'{name}_command': path for name, path in commands.items()})
+    for section, values in settings.items():
+        for key, value in values.items():
+            config.set(section, key, value)
+
+
+def make_inventory(fake: FakeNetwork) -> List[Device]:
+    """One synthetic device per simulated host"""
+    created_at = datetime.now().isoformat()
+    devices = []
+    for index, ip in enumerate(fake.addresses()):
+        mac = fake.mac_for(ip)
+        name = f'bench-{index:05d}'
+        devices.append({
+            'id': generate_device_id(name, mac),
+            'name': name,
+            'mac': mac,
+            'ip': ip,
+            'description': 'Synthetic benchmark device',
+            'created_at': created_at,
+            'last_wake': None,
+            'tags': [f'rack-{index % 40}'],
+        })
+    return devices  # type: ignore
+
+
+def wait_until(predicate: Callable[[], bool], timeout: float, what: str) -> float:
+    """Poll predicate; returns the seconds waited or raises TimeoutError"""
+    started = time.perf_counter()
+    while not predicate():
+        if time.perf_counter() - started > timeout:
+            raise TimeoutError(f'{what} did not finish within {timeout:g}s')
+        time.sleep(POLL_SECONDS)
+    return time.perf_counter() - started
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """Nearest-rank p50/p90/p99 plus mean and max, in milliseconds"""
+    if not values:
+        return {'p50_ms': None, 'p90_ms': None, 'p99_ms': None, 'mean_ms': None, 'max_ms': None}
+    ordered = sorted(values)
+
+    def rank(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {'p50_ms': rank(0.50), 'p90_ms': rank(0.90), 'p99_ms': rank(0.99),
+            'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3), 'max_ms': round(ordered[-1] * 1000, 3)}
+
+
+def _stop_app_services() -> None:
+    """Stop the background work started by the most recent create_app()"""
+    import routes.discovery
+    import routes.status
+    routes.discovery.discovery_service.stop_discovery()
+    routes.status.monitoring_service.stop_monitoring()
+
+
+def run_discovery(fake: FakeNetwork, timeout: float) -> Dict[str, Any]:
+    """Full discovery sweep of the fake network, then import of every host found"""
+    from app import create_app
+    import routes.discovery
+
+    app = create_app()
+    client = app.test_client()
+    try:
+        started = time.perf_counter()
+        response = client.post('/discover/start', json={'mode': 'full'})
+        if response.status_code != 200:
+            raise RuntimeError(f'/discover/start returned {response.status_code}')
+        service = routes.discovery.discovery_service
+        wait_until(lambda: not service.discovery_active, timeout, 'Discovery')
+        discovery_seconds = time.perf_counter() - started
+        found = len(service.get_pending_hosts())
+
+        started = time.perf_counter()
+        response = client.post('/discover/import', json={})
+        import_seconds = time.perf_counter() - started
+        imported = (response.get_json() or {}).get('imported_count', 0)
+    finally:
+        _stop_app_services()
+    return {
+        'addresses': fake.address_count(),
+        'discovery_seconds': round(discovery_seconds, 3),
+        'addresses_per_second': round(fake.address_count() / discovery_seconds, 1),
+        'hosts_found': found,
+        'import_seconds': round(import_seconds, 4),
+        'imported': imported,
+    }
+
+
+def _client(port: int, method: str, path: str, body: Optional[bytes], count: int,
+            ids: List[str], latencies: List[float], errors: List[int]) -> None:
+    """One client issuing count requests over a keep-alive connection"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    try:
+        for _ in range(count):
+            target = path.format(device_id=random.choice(ids)) if '{device_id}' in path else path
+            started = time.perf_counter()
+            try:
+                connection.request(method, target, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors.append(1)
+    finally:
+        connection.close()
+
+
+def load_routes(port: int, ids: List[str], clients: int, requests: int) -> Dict[str, Any]:
+    """Hit every route with concurrent clients; latency percentiles per route"""
+    results = {}
+    for method, path in ROUTES:
+        latencies: List[float] = []
+        errors: List[int] = []
+        body = b'{}' if method == 'POST' else None
+        per_client = [requests // clients + (1 if i < requests % clients else 0) for i in range(clients)]
+        threads = [threading.Thread(target=_client, args=(port, method, path, body, n, ids, latencies, errors))
+                   for n in per_client if n]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        results[f'{method} {path}'] = {
+            'requests': len(latencies),
+            'errors': len(errors),
+            'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+            **percentiles(latencies),
+        }
+    return results
+
+
+def run_inventory(fake: FakeNetwork, timeout: float, clients: int, requests: int,
+                  load: bool = True) -> Dict[str, Any]:
+    """Store a synthetic inventory, time the first monitoring sweep over it
+    and, with load, measure the routes under concurrent clients"""
+    from app import create_app
+    from services import DeviceService
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    import routes.status
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args: Any, **kwargs: Any) -> None:
+            pass
+
+    inventory = make_inventory(fake)
+    device_service = DeviceService()
+    started = time.perf_counter()
+    device_service.add_devices(inventory)
+    device_service.flush()
+    store_seconds = time.perf_counter() - started
+
+    results: Dict[str, Any] = {'store_seconds': round(store_seconds, 4)}
+    started = time.perf_counter()
+    app = create_app()
+    monitoring = routes.status.monitoring_service
+    try:
+        wait_until(lambda: len(monitoring.device_status) >= len(inventory), timeout, 'Monitoring sweep')
+        sweep_seconds = time.perf_counter() - started
+        online = sum(1 for status in monitoring.get_all_statuses().values() if status == 'online')
+        results['sweep'] = {
+            'devices': len(inventory),
+            'seconds': round(sweep_seconds, 3),
+            'probes_per_second': round(len(inventory) / sweep_seconds, 1),
+            'online': online,
+            'expected_online': fake.expected_online(),
+        }
+        if load:
+            server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                results['routes'] = load_routes(server.server_port, [d['id'] for d in inventory],
+                                                clients, requests)
+            finally:
+                server.shutdown()
+    finally:
+        _stop_app_services()
+    return results
+
+
+def run_size(fake: FakeNetwork, workdir: str, scenarios: Sequence[str], backend: str, storage: str,
+             probe_timeout: float, workers: int, timeout: float, clients: int,
+             requests: int) -> Dict[str, Any]:
+    """Every selected scenario for one inventory size, each in its own directory"""
+    results: Dict[str, Any] = {}
+
+    def guarded(name: str, function: Callable[[], Dict[str, Any]]) -> None:
+        directory = os.path.join(workdir, name)
+        os.makedirs(directory, exist_ok=True)
+        configure(directory, fake, backend, storage, probe_timeout, workers)
+        try:
+            with fake.patch_native() if backend == 'native' else nullcontext():
+                results.update(function())
+        except Exception as e:
+            print(f'{name} scenario failed for {fake.size} devices: {e}')
+            results.setdefault('errors', {})[name] = str(e)
+
+    if 'discovery' in scenarios:
+        guarded('discovery', lambda: {'discovery': run_discovery(fake, timeout)})
+    if 'sweep' in scenarios or 'routes' in scenarios:
+        guarded('inventory', lambda: run_inventory(fake, timeout, clients, requests, 'routes' in scenarios))
+    return results
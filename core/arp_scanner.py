@@ -0,0 +1,207 @@
+"""In-process ARP sweeps from a single AF_PACKET socket (Linux, needs CAP_NET_RAW)."""
+
+import fcntl
+import ipaddress
+import socket
+import struct
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+from .config import config
+from .ratelimit import RateLimiter
+
+ETH_P_ARP = 0x0806
+_ARP_REQUEST = 1
+_ARP_REPLY = 2
+
+# ioctls for interface addresses (linux/sockios.h)
+_SIOCGIFADDR = 0x8915
+_SIOCGIFNETMASK = 0x891B
+
+_BROADCAST_MAC = b'\xff' * 6
+_ARP_HEADER = struct.Struct('!HHBBH6s4s6s4s')
+
+
+@lru_cache(maxsize=1)
+def arp_socket_available() -> bool:
+    """Return True if this process may open raw AF_PACKET sockets"""
+    if not hasattr(socket, 'AF_PACKET'):
+        return False
+    try:
+        socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP)).close()
+        return True
+    except OSError:
+        return False
+
+
+def _interface_network(name: str) -> Optional[ipaddress.IPv4Interface]:
+    """Return the IPv4 address and netmask configured on an interface"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        request = struct.pack('256s', name.encode()[:15])
+        try:
+            address = fcntl.ioctl(sock.fileno(), _SIOCGIFADDR, request)[20:24]
+            netmask = fcntl.ioctl(sock.fileno(), _SIOCGIFNETMASK, request)[20:24]
+        except OSError:
+            return None
+    return ipaddress.IPv4Interface(f'{socket.inet_ntoa(address)}/{socket.inet_ntoa(netmask)}')
+
+
+def _interface_mac(name: str) -> Optional[bytes]:
+    try:
+        with open(f'/sys/class/net/{name}/address') as f:
+            return bytes.fromhex(f.read().strip().replace(':', ''))
+    except (OSError, ValueError):
+        return None
+
+
+def find_interface(network: ipaddress.IPv4Network) -> Optional[Tuple[str, bytes, ipaddress.IPv4Address]]:
+    """Pick the interface for a scan: network.interface if set, otherwise the
+    first interface whose subnet overlaps the network. Returns (name, mac, ip)."""
+    names = [config.network_interface] if config.network_interface else \
+        [name for _, name in socket.if_nameindex() if name != 'lo']
+    for name in names:
+        interface = _interface_network(name)
+        mac = _interface_mac(name)
+        if interface is None or mac is None or len(mac) != 6:
+            continue
+        if config.network_interface or interface.network.overlaps(network):
+            return name, mac, interface.ip
+    return None
+
+
+class ArpScanner:
+    """Sweeps addresses with ARP requests from one raw socket.
+
+    ``start`` opens the socket and a receiver thread that collects replies;
+    ``send`` may then be called any number of times, from several threads,
+    to request batches of addresses paced by a rate limiter
+    (``network.scan_rate_per_subnet`` by default, or one shared with other
+    scans of the same subnet); ``finish`` waits ``network.arp_timeout_seconds``
+    after the last request and returns every reply. A whole subnet is thus
+    swept with one socket, one receiver and one final timeout, bounded by the
+    packet rate rather than by per-host round trips. ``scan`` does all three
+    for a single batch.
+    """
+
+    def __init__(self, interface: str, mac: bytes, ip: ipaddress.IPv4Address,
+                 limiter: RateLimiter | None = None, timeout: float | None = None):
+        self.interface = interface
+        self.mac = mac
+        self.ip = ip
+        self.limiter = limiter or RateLimiter(config.scan_rate_per_subnet)
+        self.timeout = timeout if timeout is not None else config.arp_timeout
+        self._sock: Optional[socket.socket] = None
+        self._receiver: Optional[threading.Thread] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._targets: Set[str] = set()
+        self._replies: Dict[str, str] = {}
+        self._on_reply: Optional[Callable[[str, str], None]] = None
+        self._last_send = 0.0
+
+    @classmethod
+    def for_network(cls, network: ipaddress.IPv4Network,
+                    limiter: RateLimiter | None = None) -> Optional['ArpScanner']:
+        """Create a scanner on the interface facing a network, or None"""
+        found = find_interface(network)
+        if found is None:
+            return None
+        return cls(*found, limiter=limiter)
+
+    def _request(self, target: str) -> bytes:
+        arp = _ARP_HEADER.pack(1, 0x0800, 6, 4, _ARP_REQUEST, self.mac, self.ip.packed,
+                               b'\x00' * 6, socket.inet_aton(target))
+        return _BROADCAST_MAC + self.mac + struct.pack('!H', ETH_P_ARP) + arp
+
+    def start(self, on_reply: Optional[Callable[[str, str], None]] = None) -> None:
+        """Open the socket and start collecting replies. on_reply is called
+        with (ip, upper-case MAC) as replies arrive. Raises OSError if the
+        socket cannot be opened."""
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+        try:
+            sock.bind((self.interface, ETH_P_ARP))
+            sock.settimeout(0.2)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        self._on_reply = on_reply
+        self._targets = set()
+        self._replies = {}
+        self._last_send = time.monotonic()
+        self._done.clear()
+        self._receiver = threading.Thread(target=self._receive, args=(sock,), daemon=True, name='arp-receiver')
+        self._receiver.start()
+
+    def _receive(self, sock: socket.socket) -> None:
+        while not self._done.is_set():
+            try:
+                frame = sock.recv(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            if len(frame) < 14 + _ARP_HEADER.size:
+                continue
+            fields = _ARP_HEADER.unpack_from(frame, 14)
+            if fields[4] != _ARP_REPLY:
+                continue
+            ip = socket.inet_ntoa(fields[6])
+            mac = ':'.join(f'{b:02X}' for b in fields[5])
+            with self._lock:
+                if ip not in self._targets or ip in self._replies:
+                    continue
+                self._replies[ip] = mac
+            if self._on_reply is not None:
+                self._on_reply(ip, mac)
+
+    def send(self, addresses: Iterable[str], should_continue: Callable[[], bool] = lambda: True) -> int:
+        """Send an ARP request to every address; the receiver started by
+        ``start`` collects the replies. Returns the number of requests sent."""
+        sock = self._sock
+        if sock is None:
+            raise RuntimeError('ArpScanner.start() must be called before send()')
+        sent = 0
+        for address in addresses:
+            if sent % 64 == 0 and not should_continue():
+                break
+            with self._lock:
+                self._targets.add(address)
+            self.limiter.acquire()
+            try:
+                sock.send(self._request(address))
+            except OSError as e:
+                print(f"ARP scan send error for {address}: {e}")
+            self._last_send = time.monotonic()
+            sent += 1
+        return sent
+
+    def finish(self, should_continue: Callable[[], bool] = lambda: True) -> Dict[str, str]:
+        """Wait for replies until the timeout after the last request, then
+        close the socket. Returns ip -> upper-case MAC for every host that answered."""
+        deadline = self._last_send + self.timeout
+        while time.monotonic() < deadline and should_continue():
+            time.sleep(0.05)
+        self._done.set()
+        if self._receiver is not None:
+            self._receiver.join(timeout=1)
+            self._receiver = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        with self._lock:
+            return dict(self._replies)
+
+    def scan(self, addresses: Iterable[str],
+             on_reply: Optional[Callable[[str, str], None]] = None,
+             should_continue: Callable[[], bool] = lambda: True) -> Dict[str, str]:
+        """Send an ARP request to every address and return ip -> upper-case MAC
+        for the hosts that answered. on_reply is called as replies arrive."""
+        self.start(on_reply)
+        try:
+            self.send(addresses, should_continue)
+        except BaseException:
+            self.finish(lambda: False)
+            raise
+        return self.finish(should_continue)
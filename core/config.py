@@ -32,20 +32,75 @@ class Config:
                 "secret_key": "default-secret-key-change-me",
                 "debug": True,
                 "host": "127.0.0.1",
-                "port": 5000
+                "port": 5000,
+                "metrics_enabled": True,
+                "multi_worker": False,
+                "leader_call_timeout_seconds": 5
             },
             "monitoring": {
                 "interval_seconds": 30,
-                "ping_count": 4
+                "ping_count": 4,
+                "max_workers": 2048,
+                "probe_timeout_seconds": 5,
+                "max_interval_seconds": 600,
+                "offline_backoff": 2.0,
+                "recheck_seconds": 5,
+                "jitter": 0.1,
+                "history_samples": 2880,
+                "history_retention_days": 30
             },
             "paths": {
+                "storage_backend": "json",
                 "devices_file": "devices.json",
+                "database_file": "wol.db",
+                "discovery_file": "discovery.json",
+                "oui_file": "oui.bin",
+                "history_dir": "",
+                "shared_state_file": "shared_state.db",
+                "leader_lock_file": "wol.leader.lock",
+                "flush_delay_ms": 200,
                 "ping_command": "/usr/bin/ping",
                 "arping_command": "/usr/bin/arping",
                 "wakeonlan_command": "/usr/bin/wakeonlan"
             },
+            "wol": {
+                "method": "native",
+                "broadcast_address": "255.255.255.255",
+                "port": 9,
+                "repeat": 1,
+                "subnets": [],
+                "packets_per_second": 100
+            },
+            "wake_verify": {
+                "initial_interval_seconds": 1,
+                "max_interval_seconds": 5,
+                "backoff": 1.5,
+                "probe_timeout_seconds": 1,
+                "timeout_seconds": 120,
+                "resend_after_seconds": 30,
+                "max_resends": 2
+            },
             "network": {
-                "local_network": "192.168.1.0/24"
+                "local_network": "192.168.1.0/24",
+                "local_networks": [],
+                "discovery_mode": "hybrid",
+                "discovery_workers": 4,
+                "discovery_stale_seconds": 3600,
+                "interface": "",
+                "scan_rate_per_subnet": 1000,
+                "arp_timeout_seconds": 1,
+                "probe_backend": "native",
+                "tcp_probe_ports": [22, 80, 443, 445, 3389],
+                "probe_concurrency": 4096,
+                "probe_rate_per_second": 5000,
+                "discovery_probe_share": 0.5,
+                "max_processes": 128,
+                "resolve_hostnames": True,
+                "hostname_methods": ["dns", "mdns", "netbios"],
+                "dns_server": "",
+                "hostname_workers": 8,
+                "hostname_timeout_seconds": 1,
+                "hostname_cache_ttl_seconds": 3600
             }
         }
     
@@ -57,6 +112,10 @@ class Config:
         """Get an entire configuration section"""
         return self._config.get(section, {})
     
+    def set(self, section: str, key: str, value: Any) -> None:
+        """Override a configuration value for the rest of this process"""
+        self._config.setdefault(section, {})[key] = value
+    
     @property
     def app_secret_key(self) -> str:
         return self.get('app', 'secret_key', 'default-secret-key')
@@ -73,6 +132,21 @@ class Config:
     def app_port(self) -> int:
         return self.get('app', 'port', 5000)
     
+    @property
+    def metrics_enabled(self) -> bool:
+        """Serve Prometheus metrics at /metrics"""
+        return self.get('app', 'metrics_enabled', True)
+    
+    @property
+    def multi_worker(self) -> bool:
+        """Elect one process to monitor and share its state with the other workers"""
+        return self.get('app', 'multi_worker', False)
+    
+    @property
+    def leader_call_timeout(self) -> float:
+        """Seconds a worker waits for the leader to answer a forwarded call"""
+        return self.get('app', 'leader_call_timeout_seconds', 5)
+    
     @property
     def monitoring_interval(self) -> int:
         return self.get('monitoring', 'interval_seconds', 30)
@@ -81,10 +155,81 @@ class Config:
     def ping_count(self) -> int:
         return self.get('monitoring', 'ping_count', 4)
     
+    @property
+    def monitoring_workers(self) -> int:
+        """Monitoring probes in flight at once"""
+        return self.get('monitoring', 'max_workers', 2048)
+    
+    @property
+    def probe_timeout(self) -> float:
+        return self.get('monitoring', 'probe_timeout_seconds', 5)
+    
+    @property
+    def monitoring_max_interval(self) -> float:
+        return self.get('monitoring', 'max_interval_seconds', 600)
+    
+    @property
+    def monitoring_offline_backoff(self) -> float:
+        return self.get('monitoring', 'offline_backoff', 2.0)
+    
+    @property
+    def monitoring_recheck(self) -> float:
+        return self.get('monitoring', 'recheck_seconds', 5)
+    
+    @property
+    def monitoring_jitter(self) -> float:
+        return self.get('monitoring', 'jitter', 0.1)
+    
+    @property
+    def history_samples(self) -> int:
+        """Probe results kept in memory per device"""
+        return self.get('monitoring', 'history_samples', 2880)
+    
+    @property
+    def history_retention_days(self) -> float:
+        return self.get('monitoring', 'history_retention_days', 30)
+    
     @property
     def devices_file(self) -> str:
         return self.get('paths', 'devices_file', 'devices.json')
     
+    @property
+    def storage_backend(self) -> str:
+        """Either 'json' (devices_file) or 'sqlite' (database_file)"""
+        return self.get('paths', 'storage_backend', 'json')
+    
+    @property
+    def database_file(self) -> str:
+        return self.get('paths', 'database_file', 'wol.db')
+    
+    @property
+    def discovery_file(self) -> str:
+        return self.get('paths', 'discovery_file', 'discovery.json')
+    
+    @property
+    def oui_file(self) -> str:
+        """Vendor database built with ``python -m core.oui build``"""
+        return self.get('paths', 'oui_file', 'oui.bin')
+    
+    @property
+    def history_dir(self) -> str:
+        """Directory for compressed status history segments; empty keeps history in memory only"""
+        return self.get('paths', 'history_dir', '')
+    
+    @property
+    def shared_state_file(self) -> str:
+        """SQLite database through which the leader shares state in multi-worker mode"""
+        return self.get('paths', 'shared_state_file', 'shared_state.db')
+    
+    @property
+    def leader_lock_file(self) -> str:
+        """File locked by the leader process in multi-worker mode"""
+        return self.get('paths', 'leader_lock_file', 'wol.leader.lock')
+    
+    @property
+    def flush_delay_ms(self) -> int:
+        return self.get('paths', 'flush_delay_ms', 200)
+    
     @property
     def ping_command(self) -> str:
         return self.get('paths', 'ping_command', '/usr/bin/ping')
@@ -97,9 +242,151 @@ class Config:
     def wakeonlan_command(self) -> str:
         return self.get('paths', 'wakeonlan_command', '/usr/bin/wakeonlan')
     
+    @property
+    def wol_method(self) -> str:
+        """Either 'native' (in-process UDP) or 'command' (wakeonlan_command)"""
+        return self.get('wol', 'method', 'native')
+    
+    @property
+    def wol_broadcast_address(self) -> str:
+        return self.get('wol', 'broadcast_address', '255.255.255.255')
+    
+    @property
+    def wol_port(self) -> int:
+        return self.get('wol', 'port', 9)
+    
+    @property
+    def wol_repeat(self) -> int:
+        return self.get('wol', 'repeat', 1)
+    
+    @property
+    def wol_subnets(self) -> list:
+        return self.get('wol', 'subnets', [])
+    
+    @property
+    def wol_packets_per_second(self) -> float:
+        return self.get('wol', 'packets_per_second', 100)
+    
+    @property
+    def wake_verify_initial_interval(self) -> float:
+        return self.get('wake_verify', 'initial_interval_seconds', 1)
+    
+    @property
+    def wake_verify_max_interval(self) -> float:
+        return self.get('wake_verify', 'max_interval_seconds', 5)
+    
+    @property
+    def wake_verify_backoff(self) -> float:
+        return self.get('wake_verify', 'backoff', 1.5)
+    
+    @property
+    def wake_verify_probe_timeout(self) -> float:
+        return self.get('wake_verify', 'probe_timeout_seconds', 1)
+    
+    @property
+    def wake_verify_timeout(self) -> float:
+        return self.get('wake_verify', 'timeout_seconds', 120)
+    
+    @property
+    def wake_verify_resend_after(self) -> float:
+        return self.get('wake_verify', 'resend_after_seconds', 30)
+    
+    @property
+    def wake_verify_max_resends(self) -> int:
+        return self.get('wake_verify', 'max_resends', 2)
+    
     @property
     def local_network(self) -> str:
         return self.get('network', 'local_network', '192.168.1.0/24')
+    
+    @property
+    def discovery_networks(self) -> list:
+        """Networks scanned by discovery: local_networks if set, else local_network"""
+        return self.get('network', 'local_networks', []) or [self.local_network]
+    
+    @property
+    def discovery_workers(self) -> int:
+        return self.get('network', 'discovery_workers', 4)
+    
+    @property
+    def discovery_stale_seconds(self) -> float:
+        """Hosts not seen for this long are re-probed by a refresh scan"""
+        return self.get('network', 'discovery_stale_seconds', 3600)
+    
+    @property
+    def discovery_mode(self) -> str:
+        """'active' probes every address, 'passive' only reads the neighbor table,
+        'hybrid' reads the neighbor table and probes the remaining addresses"""
+        return self.get('network', 'discovery_mode', 'hybrid')
+    
+    @property
+    def network_interface(self) -> str:
+        """Interface for raw ARP scans; empty picks the one facing local_network"""
+        return self.get('network', 'interface', '')
+    
+    @property
+    def scan_rate_per_subnet(self) -> float:
+        """Maximum probes per second sent into each scanned subnet"""
+        return self.get('network', 'scan_rate_per_subnet', 1000)
+    
+    @property
+    def arp_timeout(self) -> float:
+        return self.get('network', 'arp_timeout_seconds', 1)
+    
+    @property
+    def probe_backend(self) -> str:
+        """Either 'native' (in-process ICMP/TCP) or 'subprocess' (ping/arping)"""
+        return self.get('network', 'probe_backend', 'native')
+    
+    @property
+    def tcp_probe_ports(self) -> list:
+        return self.get('network', 'tcp_probe_ports', [22, 80, 443, 445, 3389])
+    
+    @property
+    def probe_concurrency(self) -> int:
+        """Probes in flight at once across monitoring, discovery and wakes"""
+        return self.get('network', 'probe_concurrency', 4096)
+    
+    @property
+    def probe_rate(self) -> float:
+        """Probes started per second across all services; 0 disables the limit"""
+        return self.get('network', 'probe_rate_per_second', 5000)
+    
+    @property
+    def discovery_probe_share(self) -> float:
+        """Fraction of probe_concurrency and probe_rate discovery may use"""
+        return self.get('network', 'discovery_probe_share', 0.5)
+    
+    @property
+    def max_processes(self) -> int:
+        """Child processes (ping, arping, wakeonlan) running at once"""
+        return self.get('network', 'max_processes', 128)
+    
+    @property
+    def resolve_hostnames(self) -> bool:
+        return self.get('network', 'resolve_hostnames', True)
+    
+    @property
+    def hostname_methods(self) -> list:
+        """Lookups tried in order: dns, mdns and/or netbios"""
+        return self.get('network', 'hostname_methods', ['dns', 'mdns', 'netbios'])
+    
+    @property
+    def dns_server(self) -> str:
+        """Server for reverse lookups as host[:port]; empty uses the system resolver"""
+        return self.get('network', 'dns_server', '')
+    
+    @property
+    def hostname_workers(self) -> int:
+        return self.get('network', 'hostname_workers', 8)
+    
+    @property
+    def hostname_timeout(self) -> float:
+        return self.get('network', 'hostname_timeout_seconds', 1)
+    
+    @property
+    def hostname_cache_ttl(self) -> float:
+        return self.get('network', 'hostname_cache_ttl_seconds', 3600)
 
 # Global configuration instance
 config = Config()
@@ -0,0 +1,118 @@
+"""Secondary indexes over the device inventory for paged queries."""
+
+import ipaddress
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+from .models import Device
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+# Accepted sort keys; None keeps inventory order
+SORT_KEYS = ('name', 'ip', 'last_wake', 'created_at')
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class DeviceIndex:
+    """Indexes over one version of the inventory.
+
+    Each structure is built on first use and kept until the inventory
+    changes: a sort order and rank per sort key, the devices sorted by
+    numeric address so a subnet is two bisections, and a trigram index for
+    name substrings. An unfiltered page is a slice of a sort order, and
+    filtered pages only touch the devices matching the filters.
+    """
+
+    def __init__(self, devices: Dict[str, Device]):
+        self._devices = devices
+        self._ids = list(devices)
+        self._orders: Dict[str, List[str]] = {}
+        self._ranks: Dict[str, Dict[str, int]] = {}
+        self._addresses: Optional[List[Tuple[int, int, str]]] = None  # (version, address, id)
+        self._names: Optional[Dict[str, str]] = None  # id -> lowercased name
+        self._postings: Optional[Dict[str, Set[str]]] = None  # trigram -> ids
+
+    def order(self, sort: Optional[str]) -> List[str]:
+        """Device IDs sorted by a key, or in inventory order for None"""
+        if sort is None:
+            return self._ids
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key '{sort}'")
+        order = self._orders.get(sort)
+        if order is None:
+            key = self._ip_key if sort == 'ip' else lambda i: (str(self._devices[i].get(sort) or '').lower(), i)
+            order = self._orders[sort] = sorted(self._ids, key=key)
+        return order
+
+    def _ip_key(self, device_id: str) -> Tuple[int, int, str]:
+        try:
+            address = ipaddress.ip_address(self._devices[device_id].get('ip') or '')
+        except ValueError:
+            return 9, 0, device_id  # devices without a valid address sort last
+        return address.version, int(address), device_id
+
+    def _rank(self, sort: Optional[str]) -> Dict[str, int]:
+        key = sort or ''
+        rank = self._ranks.get(key)
+        if rank is None:
+            rank = self._ranks[key] = {device_id: i for i, device_id in enumerate(self.order(sort))}
+        return rank
+
+    def in_network(self, network: Network) -> List[str]:
+        """IDs of devices whose address lies in network"""
+        if self._addresses is None:
+            self._addresses = sorted(key for key in map(self._ip_key, self._ids) if key[0] != 9)
+        low = (network.version, int(network.network_address), '')
+        high = (network.version, int(network.broadcast_address) + 1, '')
+        return [device_id for _, _, device_id in
+                self._addresses[bisect_left(self._addresses, low):bisect_right(self._addresses, high)]]
+
+    def matching_name(self, text: str) -> Set[str]:
+        """IDs of devices whose name contains text, ignoring case"""
+        text = text.lower()
+        if self._names is None:
+            self._names = {device_id: str(self._devices[device_id].get('name') or '').lower()
+                           for device_id in self._ids}
+        names = self._names
+        if len(text) < 3:
+            return {device_id for device_id, name in names.items() if text in name}
+        if self._postings is None:
+            postings: Dict[str, Set[str]] = {}
+            for device_id, name in names.items():
+                for gram in _trigrams(name):
+                    postings.setdefault(gram, set()).add(device_id)
+            self._postings = postings
+        # Intersect from the rarest trigram, then confirm the whole substring
+        sets = sorted((self._postings.get(gram, set()) for gram in _trigrams(text)), key=len)
+        candidates = set(sets[0]).intersection(*sets[1:])
+        return {device_id for device_id in candidates if text in names[device_id]}
+
+    def select(self, network: Optional[Network] = None, name: Optional[str] = None,
+               predicate: Optional[Callable[[str], bool]] = None, sort: Optional[str] = None,
+               descending: bool = False, offset: int = 0, limit: int = 50) -> Tuple[int, List[str]]:
+        """Return (number of matches, IDs of one page) for the given filters"""
+        order = self.order(sort)
+        candidates: Optional[Iterable[str]] = None
+        if network is not None:
+            candidates = self.in_network(network)
+        if name:
+            matches = self.matching_name(name)
+            candidates = matches if candidates is None else [i for i in candidates if i in matches]
+
+        if candidates is None and predicate is None:
+            total = len(order)
+            if not descending:
+                return total, order[offset:offset + limit]
+            end = max(0, total - offset)
+            return total, order[max(0, end - limit):end][::-1]
+
+        if candidates is None:
+            # Only a predicate: walk the sort order
+            walk = reversed(order) if descending else order
+            matched = [device_id for device_id in walk if predicate(device_id)]  # type: ignore
+        else:
+            matched = [device_id for device_id in candidates if predicate is None or predicate(device_id)]
+            matched.sort(key=self._rank(sort).__getitem__, reverse=descending)
+        return len(matched), matched[offset:offset + limit]
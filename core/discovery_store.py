@@ -0,0 +1,127 @@
+"""Thread-safe in-memory table of discovered hosts."""
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from .models import Device, DiscoveredHost
+from .oui import lookup_vendor
+
+
+class DiscoveryResultStore:
+    """Discovered hosts indexed by MAC and IP address, tagged with their OUI vendor.
+
+    The ``already_imported`` flag is kept up to date incrementally: the store
+    tracks which inventory device IDs use which MAC, so applying a batch of
+    device changes costs O(changes) rather than rescanning both lists.
+    """
+
+    def __init__(self, hosts: Optional[Dict[str, DiscoveredHost]] = None):
+        self._lock = threading.Lock()
+        self._by_mac: Dict[str, DiscoveredHost] = {}
+        self._by_ip: Dict[str, str] = {}
+        self._device_macs: Dict[str, str] = {}  # inventory device id -> MAC
+        self._mac_devices: Dict[str, int] = {}  # MAC -> number of inventory devices using it
+        for mac, host in (hosts or {}).items():
+            host = dict(host)  # type: ignore
+            host.pop('already_imported', None)  # type: ignore
+            if not host.get('vendor'):
+                host['vendor'] = lookup_vendor(mac)
+            self._by_mac[mac.upper()] = host
+            self._by_ip[host['ip']] = mac.upper()
+
+    def __len__(self) -> int:
+        return len(self._by_mac)
+
+    def _view(self, mac: str) -> DiscoveredHost:
+        host = dict(self._by_mac[mac])
+        host['already_imported'] = self._mac_devices.get(mac, 0) > 0
+        return host  # type: ignore
+
+    def upsert(self, mac: str, ip: str, seen_at: str) -> Tuple[DiscoveredHost, bool]:
+        """Record a sighting. Returns (host, changed) where changed means the
+        host is new or its address moved."""
+        mac = mac.upper()
+        with self._lock:
+            host = self._by_mac.get(mac)
+            changed = host is None or host['ip'] != ip
+            if host is None:
+                host = self._by_mac[mac] = {'mac': mac, 'ip': ip, 'first_seen': seen_at, 'last_seen': seen_at,
+                                            'vendor': lookup_vendor(mac), 'hostname': None}
+            else:
+                if host['ip'] != ip and self._by_ip.get(host['ip']) == mac:
+                    del self._by_ip[host['ip']]
+                host['ip'] = ip
+                host['last_seen'] = seen_at
+            self._by_ip[ip] = mac
+            return self._view(mac), changed
+
+    def set_hostname(self, mac: str, ip: str, hostname: str) -> Optional[DiscoveredHost]:
+        """Record the hostname resolved for a host's address. Returns the host if
+        it changed; the name is ignored if the host has moved since."""
+        mac = mac.upper()
+        with self._lock:
+            host = self._by_mac.get(mac)
+            if host is None or host['ip'] != ip or host.get('hostname') == hostname:
+                return None
+            host['hostname'] = hostname
+            return self._view(mac)
+    
+    def get(self, mac: str) -> Optional[DiscoveredHost]:
+        """Get a host by MAC address"""
+        with self._lock:
+            return self._view(mac.upper()) if mac.upper() in self._by_mac else None
+
+    def get_by_ip(self, ip: str) -> Optional[DiscoveredHost]:
+        """Get the host last seen at an IP address"""
+        with self._lock:
+            mac = self._by_ip.get(ip)
+            return self._view(mac) if mac else None
+
+    def list(self, pending_only: bool = False) -> List[DiscoveredHost]:
+        """All hosts in discovery order, or only those not yet imported"""
+        with self._lock:
+            return [self._view(mac) for mac in self._by_mac
+                    if not pending_only or not self._mac_devices.get(mac)]
+
+    def snapshot(self) -> Dict[str, DiscoveredHost]:
+        """Copy of the table for persistence, without import flags"""
+        with self._lock:
+            return {mac: dict(host) for mac, host in self._by_mac.items()}  # type: ignore
+
+    def stale(self, cutoff: str) -> List[str]:
+        """IP addresses of hosts last seen before an ISO timestamp"""
+        with self._lock:
+            return [host['ip'] for host in self._by_mac.values() if host['last_seen'] < cutoff]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_mac.clear()
+            self._by_ip.clear()
+
+    def _link(self, device_id: str, mac: Optional[str]) -> None:
+        """Point an inventory device at a MAC (None to unlink), keeping counts"""
+        old = self._device_macs.pop(device_id, None)
+        if old is not None:
+            remaining = self._mac_devices.get(old, 0) - 1
+            if remaining > 0:
+                self._mac_devices[old] = remaining
+            else:
+                self._mac_devices.pop(old, None)
+        if mac is not None:
+            self._device_macs[device_id] = mac
+            self._mac_devices[mac] = self._mac_devices.get(mac, 0) + 1
+
+    def apply_device_changes(self, changed: Iterable[Device], deleted: Iterable[str]) -> None:
+        """Update import flags from inventory devices added/updated and IDs deleted"""
+        with self._lock:
+            for device in changed:
+                self._link(str(device['id']), device['mac'].upper())
+            for device_id in deleted:
+                self._link(str(device_id), None)
+
+    def reset_devices(self, devices: Iterable[Device]) -> None:
+        """Rebuild import flags from the complete inventory"""
+        with self._lock:
+            self._device_macs = {}
+            self._mac_devices = {}
+            for device in devices:
+                self._link(str(device['id']), device['mac'].upper())
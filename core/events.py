@@ -0,0 +1,66 @@
+"""In-process publish/subscribe bus for pushing state changes to clients."""
+
+import queue
+import threading
+from typing import Any, Dict, List, Tuple
+
+Event = Tuple[str, Dict[str, Any]]
+
+
+class EventBus:
+    """Fans events out to subscriber queues.
+
+    Publishing never blocks: a subscriber that falls too far behind has its
+    backlog dropped and receives a single ``resync`` event instead, telling it
+    to refetch full state.
+    """
+
+    def __init__(self, max_backlog: int = 1000):
+        self.max_backlog = max_backlog
+        self._lock = threading.Lock()
+        self._subscribers: List['queue.Queue[Event]'] = []
+
+    def subscribe(self) -> 'queue.Queue[Event]':
+        """Register a new subscriber and return its queue"""
+        q: 'queue.Queue[Event]' = queue.Queue(maxsize=self.max_backlog)
+        with self._lock:
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q: 'queue.Queue[Event]') -> None:
+        """Remove a subscriber"""
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def publish(self, event: str, data: Dict[str, Any]) -> None:
+        """Send an event to every subscriber"""
+        if not self._subscribers:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait((event, data))
+            except queue.Full:
+                self._reset(q)
+
+    def _reset(self, q: 'queue.Queue[Event]') -> None:
+        """Replace an overflowing backlog with a resync marker"""
+        try:
+            while True:
+                q.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            q.put_nowait(('resync', {}))
+        except queue.Full:
+            pass
+
+
+# Global event bus instance
+event_bus = EventBus()
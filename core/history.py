@@ -0,0 +1,289 @@
+"""Per-device probe history kept in compact ring buffers.
+
+Every monitoring probe is stored as a (timestamp, online, RTT) sample in
+three ``array`` columns of 9 bytes per sample, capped at
+``monitoring.history_samples`` per device. When ``paths.history_dir`` is set,
+samples are also written in zlib-compressed segments of SEGMENT_SAMPLES, which
+back windows longer than the ring and refill it after a restart. Segments
+older than ``monitoring.history_retention_days`` are deleted.
+
+Window statistics only loop in Python once per state change; everything
+else is C-level array slicing, ``bytes.find`` and ``itertools.compress``, so
+summarizing thousands of devices stays cheap.
+"""
+
+import os
+import re
+import shutil
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, compress
+from operator import sub
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .config import config
+
+# Samples per compressed segment file
+SEGMENT_SAMPLES = 1024
+PERCENTILES = (50, 90, 99)
+
+_SEGMENT_MAGIC = b'HST1'
+_SEGMENT_HEADER = struct.Struct('<4sII')  # magic, sample count, first timestamp
+_NO_RTT = -1.0
+_UNSAFE = re.compile(r'[^A-Za-z0-9_.-]')
+
+Columns = Tuple[array, array, array]
+
+
+def _empty() -> Columns:
+    return array('I'), array('B'), array('f')
+
+
+class _Ring:
+    """Fixed-capacity columns of timestamp (s), online flag and RTT (ms)"""
+
+    __slots__ = ('capacity', 'times', 'states', 'rtts', 'start', 'unflushed')
+
+    def __init__(self, capacity: int, columns: Optional[Columns] = None):
+        self.capacity = capacity
+        self.times, self.states, self.rtts = (c[-capacity:] for c in columns) if columns else _empty()
+        self.start = 0
+        self.unflushed = 0
+
+    def last_time(self) -> int:
+        return self.times[self.start - 1] if self.times else 0
+
+    def append(self, timestamp: int, online: bool, rtt: float) -> None:
+        if len(self.times) < self.capacity:
+            self.times.append(timestamp)
+            self.states.append(online)
+            self.rtts.append(rtt)
+        else:
+            i = self.start
+            self.times[i] = timestamp
+            self.states[i] = online
+            self.rtts[i] = rtt
+            self.start = (i + 1) % self.capacity
+        self.unflushed = min(self.unflushed + 1, self.capacity)
+
+    def columns(self, last: Optional[int] = None) -> Columns:
+        """Copies of the columns in time order, optionally only the last n samples"""
+        s = self.start
+        columns = tuple(c[s:] + c[:s] for c in (self.times, self.states, self.rtts))
+        return columns if last is None else tuple(c[len(c) - last:] for c in columns)  # type: ignore
+
+
+def _encode_segment(times: array, states: array, rtts: array) -> bytes:
+    deltas = array('I', [0])
+    deltas.extend(map(sub, times[1:], times[:-1]))
+    rtts = array('f', rtts)
+    if sys.byteorder == 'big':
+        deltas.byteswap()
+        rtts.byteswap()
+    header = _SEGMENT_HEADER.pack(_SEGMENT_MAGIC, len(times), times[0])
+    return zlib.compress(header + deltas.tobytes() + states.tobytes() + rtts.tobytes())
+
+
+def _decode_segment(data: bytes) -> Columns:
+    data = zlib.decompress(data)
+    magic, count, first = _SEGMENT_HEADER.unpack_from(data)
+    if magic != _SEGMENT_MAGIC:
+        raise ValueError('not a history segment')
+    offset = _SEGMENT_HEADER.size
+    deltas, states, rtts = _empty()
+    deltas.frombytes(data[offset:offset + 4 * count])
+    states.frombytes(data[offset + 4 * count:offset + 5 * count])
+    rtts.frombytes(data[offset + 5 * count:offset + 9 * count])
+    if sys.byteorder == 'big':
+        deltas.byteswap()
+        rtts.byteswap()
+    return array('I', accumulate(deltas, initial=first))[1:], states, rtts
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    return values[max(0, -(-len(values) * percent // 100) - 1)]
+
+
+def summarize_samples(columns: Columns, since: float, until: float) -> Optional[Dict[str, Any]]:
+    """Uptime, flaps and RTT percentiles for samples from the one in effect at
+    ``since`` onwards. Time is weighted, so back-off between probes of offline
+    hosts does not skew uptime."""
+    times, states, rtts = columns
+    if not times:
+        return None
+    until = max(until, times[-1])
+    clipped = times[0] < since
+    first = since if clipped else times[0]
+
+    # Walk runs of equal state: each find() jumps straight to the next flap
+    flags = states.tobytes()
+    state = flags[0]
+    run_start = first
+    online = 0.0
+    flaps = 0
+    position = flags.find(b'\x00' if state else b'\x01')
+    while position != -1:
+        if state:
+            online += times[position] - run_start
+        run_start = times[position]
+        state ^= 1
+        flaps += 1
+        position = flags.find(b'\x00' if state else b'\x01', position)
+    if state:
+        online += until - run_start
+
+    covered = until - first
+    rtt_values = sorted(filter((0.0).__le__, compress(rtts[1:] if clipped else rtts,
+                                                      states[1:] if clipped else states)))
+    return {
+        'samples': len(times) - clipped,
+        'covered_seconds': round(covered, 3),
+        'online_seconds': round(online, 3),
+        'offline_seconds': round(covered - online, 3),
+        'uptime_percent': round(100.0 * online / covered, 3) if covered > 0 else None,
+        'flaps': flaps,
+        'current': 'online' if flags[-1] else 'offline',
+        'rtt_ms': {
+            **{f'p{p}': round(_percentile(rtt_values, p), 3) for p in PERCENTILES},
+            'min': round(rtt_values[0], 3),
+            'max': round(rtt_values[-1], 3)
+        } if rtt_values else None
+    }
+
+
+class StatusHistory:
+    """Thread-safe probe history for all monitored devices"""
+
+    def __init__(self, capacity: Optional[int] = None, directory: Optional[str] = None,
+                 retention_days: Optional[float] = None):
+        self.capacity = max(1, capacity or config.history_samples)
+        self.directory = directory if directory is not None else config.history_dir
+        days = retention_days if retention_days is not None else config.history_retention_days
+        self.retention_seconds = days * 86400
+        self._rings: Dict[str, _Ring] = {}
+        self._lock = threading.Lock()
+
+    def record(self, device_id: str, online: bool, rtt: Optional[float] = None,
+               timestamp: Optional[float] = None) -> None:
+        """Add a probe result; rtt is in seconds"""
+        ring = self._ring(device_id)
+        segment = None
+        with self._lock:
+            # Clock steps backwards must not break the time order
+            ring.append(max(int(timestamp if timestamp is not None else time.time()), ring.last_time()),
+                        online, rtt * 1000 if rtt is not None else _NO_RTT)
+            if self.directory and ring.unflushed >= min(SEGMENT_SAMPLES, self.capacity):
+                segment = ring.columns(ring.unflushed)
+                ring.unflushed = 0
+        if segment is not None:
+            self._write_segment(device_id, segment)
+
+    def device_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._rings)
+
+    def samples(self, device_id: str, since: float) -> Columns:
+        """Columns from the sample in effect at ``since`` onwards, reading
+        persisted segments for the part of the window older than the ring"""
+        with self._lock:
+            ring = self._rings.get(device_id)
+            columns = ring.columns() if ring is not None else _empty()
+        if self.directory and (not columns[0] or columns[0][0] > since):
+            older = self._read_segments(device_id, since, columns[0][0] if columns[0] else None)
+            columns = tuple(a + b for a, b in zip(older, columns))  # type: ignore
+        start = max(bisect_right(columns[0], since) - 1, 0)
+        return tuple(c[start:] for c in columns)  # type: ignore
+
+    def summarize(self, device_id: str, since: float, until: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        return summarize_samples(self.samples(device_id, since), since, until if until is not None else time.time())
+
+    def remove(self, device_ids: Iterable[str]) -> None:
+        """Forget deleted devices, including their segments"""
+        with self._lock:
+            for device_id in device_ids:
+                self._rings.pop(device_id, None)
+                if self.directory:
+                    shutil.rmtree(self._device_dir(device_id), ignore_errors=True)
+
+    def flush(self) -> None:
+        """Write samples not yet in a segment, e.g. before shutting down"""
+        if not self.directory:
+            return
+        pending = []
+        with self._lock:
+            for device_id, ring in self._rings.items():
+                if ring.unflushed:
+                    pending.append((device_id, ring.columns(ring.unflushed)))
+                    ring.unflushed = 0
+        for device_id, segment in pending:
+            self._write_segment(device_id, segment)
+
+    def _ring(self, device_id: str) -> _Ring:
+        with self._lock:
+            ring = self._rings.get(device_id)
+        if ring is not None:
+            return ring
+        # Refill from the newest segments outside the lock
+        columns = self._read_segments(device_id, newest=self.capacity) if self.directory else None
+        with self._lock:
+            return self._rings.setdefault(device_id, _Ring(self.capacity, columns))
+
+    def _device_dir(self, device_id: str) -> str:
+        return os.path.join(self.directory, _UNSAFE.sub('_', device_id))
+
+    def _segment_files(self, device_id: str) -> List[Tuple[int, int, str]]:
+        """(first, last, path) of a device's segments, oldest first"""
+        directory = self._device_dir(device_id)
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return []
+        files = []
+        for name in names:
+            match = re.fullmatch(r'(\d+)-(\d+)\.seg', name)
+            if match:
+                files.append((int(match.group(1)), int(match.group(2)), os.path.join(directory, name)))
+        return sorted(files)
+
+    def _read_segments(self, device_id: str, since: float = 0, before: Optional[int] = None,
+                       newest: Optional[int] = None) -> Columns:
+        """Samples from segments overlapping [since, before), or the newest n samples"""
+        files = [f for f in self._segment_files(device_id)
+                 if f[1] >= since and (before is None or f[0] < before)]
+        if newest is not None:
+            # Segments are at most SEGMENT_SAMPLES long, so this many cover n samples
+            files = files[-(-newest // SEGMENT_SAMPLES) - 1:]
+        columns = _empty()
+        for _, _, path in files:
+            try:
+                with open(path, 'rb') as f:
+                    segment = _decode_segment(f.read())
+            except (OSError, ValueError, zlib.error, struct.error) as e:
+                print(f"Warning: skipping unreadable history segment {path}: {e}")
+                continue
+            for column, values in zip(columns, segment):
+                column.extend(values)
+        if before is not None:
+            end = bisect_right(columns[0], before - 1)
+            columns = tuple(c[:end] for c in columns)  # type: ignore
+        return columns
+
+    def _write_segment(self, device_id: str, segment: Columns) -> None:
+        from .storage import atomic_write_bytes
+
+        times = segment[0]
+        directory = self._device_dir(device_id)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            atomic_write_bytes(os.path.join(directory, f'{times[0]}-{times[-1]}.seg'), _encode_segment(*segment))
+            cutoff = time.time() - self.retention_seconds
+            for _, last, path in self._segment_files(device_id):
+                if last < cutoff:
+                    os.remove(path)
+        except OSError as e:
+            print(f"Error: failed to write history segment for {device_id}: {e}")
@@ -0,0 +1,256 @@
+"""Background hostname resolution for discovered hosts.
+
+Names are looked up, in the order of ``network.hostname_methods``, by:
+
+- ``dns``: a reverse (PTR) query to ``network.dns_server``, or the system
+  resolver when no server is configured
+- ``mdns``: the same PTR query sent as a legacy unicast mDNS query to the
+  host's port 5353, answered by Avahi, Bonjour and recent Windows
+- ``netbios``: a NetBIOS node status request to the host's port 137
+
+Lookups run on a small thread pool, so callers never wait for them, and
+results (including failures) are cached for ``network.hostname_cache_ttl_seconds``.
+"""
+
+import ipaddress
+import os
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from .config import config
+
+MDNS_PORT = 5353
+NETBIOS_PORT = 137
+# Cached results kept before expired and then oldest entries are dropped
+MAX_CACHE_ENTRIES = 65536
+
+_TYPE_PTR = 12
+_TYPE_NBSTAT = 0x21
+_CLASS_IN = 1
+_HEADER = struct.Struct('!HHHHHH')
+# NetBIOS wildcard name '*', first-level encoded
+_NBSTAT_NAME = b'\x20' + b'CK' + b'AA' * 15 + b'\x00'
+
+
+def parse_server(server: str, default_port: int = 53) -> Tuple[str, int]:
+    """Split 'host', 'host:port' or '[v6]:port' into an address tuple"""
+    if server.startswith('['):
+        host, _, port = server[1:].partition(']')
+        return host, int(port.lstrip(':') or default_port)
+    if server.count(':') == 1:
+        host, port = server.split(':')
+        return host, int(port)
+    return server, default_port
+
+
+def _query_id() -> int:
+    return struct.unpack('!H', os.urandom(2))[0]
+
+
+def build_ptr_query(ip: str, query_id: int, recursion: bool = True) -> bytes:
+    """DNS query for the PTR record of an address"""
+    question = b''.join(bytes([len(label)]) + label.encode('ascii')
+                        for label in ipaddress.ip_address(ip).reverse_pointer.split('.'))
+    return (_HEADER.pack(query_id, 0x0100 if recursion else 0, 1, 0, 0, 0)
+            + question + b'\x00' + struct.pack('!HH', _TYPE_PTR, _CLASS_IN))
+
+
+def _read_name(data: bytes, offset: int) -> Tuple[str, int]:
+    """Decode a possibly compressed domain name. Returns (name, next offset)."""
+    labels: List[str] = []
+    end = None
+    for _ in range(128):
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            return '.'.join(labels), end if end is not None else offset
+        labels.append(data[offset:offset + length].decode('utf-8', 'replace'))
+        offset += length
+    raise ValueError('compression loop')
+
+
+def parse_ptr_response(data: bytes) -> Optional[str]:
+    """Return the first PTR name in a DNS response, or None"""
+    try:
+        if data[3] & 0x0F:  # rcode
+            return None
+        questions, answers = struct.unpack_from('!HH', data, 4)
+        offset = _HEADER.size
+        for _ in range(questions):
+            offset = _read_name(data, offset)[1] + 4
+        for _ in range(answers):
+            offset = _read_name(data, offset)[1]
+            rtype, _, _, length = struct.unpack_from('!HHIH', data, offset)
+            offset += 10
+            if rtype == _TYPE_PTR:
+                return _read_name(data, offset)[0] or None
+            offset += length
+    except (IndexError, ValueError, struct.error):
+        pass
+    return None
+
+
+def build_nbstat_query(query_id: int) -> bytes:
+    """NetBIOS node status request for the wildcard name"""
+    return _HEADER.pack(query_id, 0, 1, 0, 0, 0) + _NBSTAT_NAME + struct.pack('!HH', _TYPE_NBSTAT, _CLASS_IN)
+
+
+def parse_nbstat_response(data: bytes) -> Optional[str]:
+    """Return the unique workstation name from a node status response, or None"""
+    try:
+        offset = _HEADER.size + len(_NBSTAT_NAME) + 10
+        for i in range(data[offset]):
+            entry = offset + 1 + i * 18
+            name = data[entry:entry + 15].rstrip(b' \x00').decode('ascii', 'replace')
+            suffix = data[entry + 15]
+            flags, = struct.unpack_from('!H', data, entry + 16)
+            if suffix == 0x00 and not flags & 0x8000 and name:
+                return name
+    except (IndexError, struct.error):
+        pass
+    return None
+
+
+def _exchange(address: Tuple[str, int], packet: bytes, timeout: float) -> Optional[bytes]:
+    """Send one UDP datagram and wait for the reply carrying the same ID"""
+    family = socket.AF_INET6 if ':' in address[0] else socket.AF_INET
+    deadline = time.monotonic() + timeout
+    try:
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.send(packet)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                sock.settimeout(remaining)
+                data = sock.recv(4096)
+                if data[:2] == packet[:2]:
+                    return data
+    except OSError:
+        return None
+
+
+class HostnameResolver:
+    """Resolves hostnames on a bounded thread pool with a TTL cache."""
+
+    def __init__(self, methods: Optional[List[str]] = None, workers: Optional[int] = None,
+                 timeout: Optional[float] = None, ttl: Optional[float] = None,
+                 dns_server: Optional[str] = None):
+        self.methods = methods if methods is not None else config.hostname_methods
+        self.workers = workers or config.hostname_workers
+        self.timeout = timeout if timeout is not None else config.hostname_timeout
+        self.ttl = ttl if ttl is not None else config.hostname_cache_ttl
+        server = dns_server if dns_server is not None else config.dns_server
+        self.dns_server = parse_server(server) if server else None
+        self._cache: Dict[str, Tuple[Optional[str], float]] = {}
+        self._pending: Dict[str, List[Callable[[str, Optional[str]], None]]] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def cached(self, ip: str) -> Tuple[bool, Optional[str]]:
+        """Return (hit, hostname) from the cache"""
+        with self._lock:
+            entry = self._cache.get(ip)
+        if entry is None or entry[1] < time.monotonic():
+            return False, None
+        return True, entry[0]
+
+    def resolve(self, ip: str) -> Optional[str]:
+        """Look up a hostname now, using the cache"""
+        hit, name = self.cached(ip)
+        if hit:
+            return name
+        name = self._lookup(ip)
+        self._store(ip, name)
+        return name
+
+    def submit(self, ip: str, callback: Callable[[str, Optional[str]], None]) -> None:
+        """Resolve in the background and call callback(ip, hostname). Never blocks;
+        concurrent requests for the same address share one lookup."""
+        hit, name = self.cached(ip)
+        if hit:
+            callback(ip, name)
+            return
+        with self._lock:
+            if ip in self._pending:
+                self._pending[ip].append(callback)
+                return
+            self._pending[ip] = [callback]
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='hostname')
+            executor = self._executor
+        executor.submit(self._run, ip)
+
+    def pending(self) -> int:
+        """Number of addresses waiting to be resolved"""
+        with self._lock:
+            return len(self._pending)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _run(self, ip: str) -> None:
+        name = None
+        try:
+            name = self._lookup(ip)
+        except Exception as e:
+            print(f"Error resolving hostname for {ip}: {e}")
+        self._store(ip, name)
+        with self._lock:
+            callbacks = self._pending.pop(ip, [])
+        for callback in callbacks:
+            try:
+                callback(ip, name)
+            except Exception as e:
+                print(f"Error handling hostname for {ip}: {e}")
+
+    def _store(self, ip: str, name: Optional[str]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._cache) >= MAX_CACHE_ENTRIES:
+                for key in [key for key, (_, expires) in self._cache.items() if expires < now]:
+                    del self._cache[key]
+                while len(self._cache) >= MAX_CACHE_ENTRIES:
+                    del self._cache[next(iter(self._cache))]
+            self._cache.pop(ip, None)
+            self._cache[ip] = (name, now + self.ttl)
+
+    def _lookup(self, ip: str) -> Optional[str]:
+        for method in self.methods:
+            if method == 'dns':
+                name = self._lookup_dns(ip)
+            elif method == 'mdns':
+                name = self._lookup_ptr((ip, MDNS_PORT), ip, recursion=False)
+            elif method == 'netbios' and ipaddress.ip_address(ip).version == 4:
+                name = self._lookup_netbios(ip)
+            else:
+                continue
+            if name:
+                return name.rstrip('.')
+        return None
+
+    def _lookup_dns(self, ip: str) -> Optional[str]:
+        if self.dns_server is not None:
+            return self._lookup_ptr(self.dns_server, ip)
+        try:
+            return socket.gethostbyaddr(ip)[0]
+        except OSError:
+            return None
+
+    def _lookup_ptr(self, server: Tuple[str, int], ip: str, recursion: bool = True) -> Optional[str]:
+        response = _exchange(server, build_ptr_query(ip, _query_id(), recursion), self.timeout)
+        return parse_ptr_response(response) if response else None
+
+    def _lookup_netbios(self, ip: str) -> Optional[str]:
+        response = _exchange((ip, NETBIOS_PORT), build_nbstat_query(_query_id()), self.timeout)
+        return parse_nbstat_response(response) if response else None
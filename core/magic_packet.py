@@ -0,0 +1,123 @@
+"""In-process Wake-on-LAN magic packet construction and sending."""
+
+import ipaddress
+import re
+import socket
+import threading
+import time
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from .config import config
+from .models import Device
+
+_NON_HEX = re.compile(r'[^0-9a-fA-F]')
+
+
+def parse_mac(mac: str) -> bytes:
+    """Convert a MAC address in any common notation to 6 bytes"""
+    digits = _NON_HEX.sub('', mac)
+    if len(digits) != 12:
+        raise ValueError(f'Invalid MAC address: {mac}')
+    return bytes.fromhex(digits)
+
+
+def parse_secureon_password(password: str) -> bytes:
+    """Convert a SecureOn password (6 bytes as a MAC, or 4 bytes as an IPv4 address) to bytes"""
+    try:
+        return ipaddress.IPv4Address(password).packed
+    except ValueError:
+        pass
+    try:
+        return parse_mac(password)
+    except ValueError:
+        raise ValueError(f'Invalid SecureOn password: {password}')
+
+
+@lru_cache(maxsize=4096)
+def build_magic_packet(mac: str, password: Optional[str] = None) -> bytes:
+    """Build the 102-byte magic packet: 6 x 0xFF followed by the MAC 16 times,
+    plus the optional SecureOn password. Packets are cached per MAC."""
+    packet = b'\xff' * 6 + parse_mac(mac) * 16
+    if password:
+        packet += parse_secureon_password(password)
+    return packet
+
+
+class MagicPacketSender:
+    """Sends magic packets from a single reusable UDP broadcast socket.
+
+    Each device goes to its own ``broadcast_address`` if set, otherwise to the
+    directed broadcast address of the first ``wol.subnets`` entry containing its
+    IP (so routed VLANs can be reached), otherwise to ``wol.broadcast_address``.
+    """
+
+    def __init__(self, broadcast_address: str | None = None, port: int | None = None,
+                 repeat: int | None = None):
+        self.broadcast_address = broadcast_address or config.wol_broadcast_address
+        self.port = port or config.wol_port
+        self.repeat = max(1, repeat if repeat is not None else config.wol_repeat)
+        self.subnets = []
+        for cidr in config.wol_subnets:
+            try:
+                self.subnets.append(ipaddress.ip_network(cidr, strict=False))
+            except ValueError:
+                print(f"Warning: ignoring invalid wol subnet '{cidr}'")
+        self._lock = threading.Lock()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+
+    def target_for(self, device: Device) -> Tuple[str, int]:
+        """Return the (address, port) a device's magic packet should be sent to"""
+        port = self.port
+        if device.get('broadcast_address'):
+            return device['broadcast_address'], port
+        if device.get('ip') and self.subnets:
+            try:
+                ip = ipaddress.ip_address(device['ip'])
+            except ValueError:
+                ip = None
+            for subnet in self.subnets:
+                if ip is not None and ip in subnet:
+                    return str(subnet.broadcast_address), port
+        return self.broadcast_address, port
+
+    def send(self, mac: str, address: str | None = None, port: int | None = None,
+             password: str | None = None) -> None:
+        """Send a magic packet for a MAC address, repeated wol.repeat times"""
+        packet = build_magic_packet(mac.upper(), password or None)
+        target = (address or self.broadcast_address, port or self.port)
+        with self._lock:
+            for _ in range(self.repeat):
+                self._sock.sendto(packet, target)
+
+    def send_device(self, device: Device) -> None:
+        """Send a magic packet to a device's resolved target"""
+        address, port = self.target_for(device)
+        self.send(device['mac'], address, port, device.get('secureon_password'))
+
+    def send_many(self, devices: List[Device], packets_per_second: float | None = None) -> List[Optional[str]]:
+        """Send packets to many devices, paced per packet (every wol.repeat copy
+        counts) to avoid flooding switches.
+        Returns one error message per device, None on success."""
+        rate = packets_per_second if packets_per_second is not None else config.wol_packets_per_second
+        gap = 1.0 / rate if rate and rate > 0 else 0.0
+        errors: List[Optional[str]] = []
+        next_send = time.monotonic()
+        for device in devices:
+            try:
+                packet = build_magic_packet(device['mac'].upper(), device.get('secureon_password') or None)
+                target = self.target_for(device)
+                for _ in range(self.repeat):
+                    delay = next_send - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    with self._lock:
+                        self._sock.sendto(packet, target)
+                    next_send = max(next_send, time.monotonic() - gap) + gap
+                errors.append(None)
+            except (ValueError, OSError) as e:
+                errors.append(str(e))
+        return errors
+
+    def close(self) -> None:
+        self._sock.close()
@@ -0,0 +1,241 @@
+"""In-process metrics exposed in the Prometheus text format.
+
+Counters, gauges and histograms keep plain Python numbers, so recording an
+event is a bisect plus two additions under an uncontended lock and nothing
+is formatted until ``/metrics`` is scraped. Gauges that mirror service state
+are set by the scrape handler rather than on every change.
+
+Every series has its own lock, since request threads update the same
+counters concurrently and ``+=`` on a shared number can lose increments.
+
+Metrics are kept per process. Registry.render can add constant labels, such
+as the worker pid in multi-worker mode, so that series from different
+processes are not mistaken for one another.
+
+Label values should come from small fixed sets (route templates, operation
+names) since every combination is kept for the life of the process.
+"""
+
+import threading
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; covers sub-millisecond probes up to slow subprocess calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """Consistent (bucket counts, sum)"""
+        with self._lock:
+            return list(self.counts), self.sum
+
+    def time(self) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """Decorator observing the duration of every call"""
+        def decorator(function: Callable[..., Any]) -> Callable[..., Any]:
+            @wraps(function)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                start = perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.observe(perf_counter() - start)
+            return wrapper
+        return decorator
+
+
+class _Metric:
+    """A named metric with optional labels"""
+
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional['Registry'] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # inc/set/observe on an unlabelled metric are its only child's bound methods
+            child = self._children[()] = self._new_child()
+            for method in ('inc', 'dec', 'set', 'observe', 'time'):
+                if hasattr(child, method):
+                    setattr(self, method, getattr(child, method))
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        """Child for a combination of label values, created on first use"""
+        child = self._children.get(values)
+        if child is not None:
+            return child
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}')
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> Iterator[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        """(sample name, label names, label values, value) for every sample"""
+        for values, child in list(self._children.items()):
+            yield self.name, self.labelnames, values, child.value
+
+    def render(self, const_labels: Sequence[Tuple[str, str]] = ()) -> List[str]:
+        """Text format lines, with const_labels (name, value) pairs added to every sample"""
+        const_names = tuple(name for name, _ in const_labels)
+        const_values = tuple(value for _, value in const_labels)
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(f'{name}{_format_labels(const_names + names, const_values + values)} {_format_value(value)}'
+                     for name, names, values, value in self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional['Registry'] = None):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.upper_bounds)
+
+    def _samples(self) -> Iterator[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        for values, child in list(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (float('inf'),), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', self.labelnames + ('le',), values + (_format_value(bound),), cumulative
+            yield f'{self.name}_sum', self.labelnames, values, total
+            yield f'{self.name}_count', self.labelnames, values, cumulative
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Metric {metric.name} is already registered')
+            self._metrics[metric.name] = metric
+
+    def render(self, const_labels: Sequence[Tuple[str, str]] = ()) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render(const_labels))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# Application metrics
+HTTP_REQUESTS = Counter('wol_http_requests_total', 'HTTP requests by route template, method and status',
+                        ('route', 'method', 'status'))
+HTTP_REQUEST_SECONDS = Histogram('wol_http_request_duration_seconds', 'HTTP request latency',
+                                 ('route', 'method'))
+PROBE_SECONDS = Histogram('wol_probe_duration_seconds', 'Duration of single-host reachability probes',
+                          ('backend',))
+PROBE_RTT_SECONDS = Histogram('wol_probe_rtt_seconds', 'Round-trip time measured by monitoring probes')
+MONITORING_BATCH_SECONDS = Histogram('wol_monitoring_batch_duration_seconds',
+                                     'Duration of a monitoring dispatch batch, from handing its due probes '
+                                     'to the engine until the last one answers')
+MONITORING_LAG_SECONDS = Gauge('wol_monitoring_lag_seconds',
+                               'Smoothed delay of probes behind their scheduled time')
+MONITORING_IN_FLIGHT = Gauge('wol_monitoring_in_flight', 'Probes currently running')
+DEVICES = Gauge('wol_devices', 'Monitored devices by last known status', ('status',))
+DISCOVERY_PROBE_SECONDS = Histogram('wol_discovery_probe_duration_seconds',
+                                    'Duration of single-address arping discovery probes')
+DISCOVERY_SCAN_SECONDS = Histogram('wol_discovery_scan_duration_seconds', 'Duration of discovery scans',
+                                   buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600))
+DISCOVERY_ADDRESSES = Counter('wol_discovery_addresses_scanned_total', 'Addresses swept by discovery')
+DISCOVERY_HOSTS = Counter('wol_discovery_hosts_found_total', 'Host sightings reported by discovery')
+STORAGE_SECONDS = Histogram('wol_storage_operation_duration_seconds', 'Device store read and write latency',
+                            ('operation',))
+WAKE_SECONDS = Histogram('wol_wake_duration_seconds', 'Duration of single-device wake requests')
+WAKES = Counter('wol_wakes_total', 'Single-device wake requests by result', ('result',))
@@ -1,7 +1,7 @@
 """Data models and type definitions for the WoL application."""
 
 from enum import Enum
-from typing import Optional, TypedDict
+from typing import List, Optional, TypedDict
 
 
 class Device(TypedDict):
@@ -12,17 +12,51 @@ class Device(TypedDict):
     description: str
     created_at: str
     last_wake: Optional[str]
+    tags: List[str]
+    broadcast_address: str
+    secureon_password: str
+    last_wake_latency: Optional[float]
+    monitor_interval: Optional[float]
+    vendor: Optional[str]
 
 
 class DeviceWithStatus(Device):
     status: str
 
 
+class WakeResult(TypedDict):
+    id: str
+    name: str
+    mac: str
+    success: bool
+    message: str
+
+
 class DiscoveredDevice(TypedDict):
     mac: str
     ip: str
 
 
+class DiscoveredHost(DiscoveredDevice):
+    first_seen: str
+    last_seen: str
+    vendor: Optional[str]
+    hostname: Optional[str]
+
+
+class WakeJob(TypedDict):
+    id: str
+    device_id: str
+    device_name: str
+    state: str  # waiting, online, timeout, failed or unverifiable
+    created_at: str
+    sent_at: str
+    online_at: Optional[str]
+    latency_seconds: Optional[float]
+    probes: int
+    resends: int
+
+
 class DeviceStatus(Enum):
     ONLINE = "online"
     OFFLINE = "offline"
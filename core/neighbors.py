@@ -0,0 +1,165 @@
+"""Helpers for reading the kernel neighbor (ARP / NDP) table."""
+
+import ipaddress
+import os
+import socket
+import struct
+import time
+from typing import Dict, Optional
+
+PROC_NET_ARP = '/proc/net/arp'
+
+# ATF_COM: the entry holds a resolved hardware address
+_ATF_COM = 0x2
+
+# rtnetlink constants (linux/rtnetlink.h, linux/neighbour.h)
+_RTM_NEWNEIGH = 28
+_RTM_GETNEIGH = 30
+_NLMSG_ERROR = 2
+_NLMSG_DONE = 3
+_NLM_F_REQUEST = 0x1
+_NLM_F_DUMP = 0x300
+_NDA_DST = 1
+_NDA_LLADDR = 2
+_NUD_INCOMPLETE = 0x01
+_NUD_FAILED = 0x20
+_NUD_NOARP = 0x40
+
+_NLMSG_HEADER = struct.Struct('=LHHLL')
+_NDMSG = struct.Struct('=BxxxiHBB')
+_RTATTR = struct.Struct('=HH')
+
+
+def neighbor_table_available() -> bool:
+    """Return True if the kernel neighbor table can be read on this platform"""
+    return os.path.exists(PROC_NET_ARP) or hasattr(socket, 'AF_NETLINK')
+
+
+def read_arp_table() -> Dict[str, str]:
+    """Return resolved IPv4 neighbors as ip -> upper-case MAC address"""
+    table: Dict[str, str] = {}
+    try:
+        with open(PROC_NET_ARP, 'r') as f:
+            next(f, None)  # header line
+            for line in f:
+                fields = line.split()
+                if len(fields) < 4:
+                    continue
+                ip, _, flags, mac = fields[:4]
+                if not int(flags, 16) & _ATF_COM or mac == '00:00:00:00:00:00':
+                    continue
+                table[ip] = mac.upper()
+    except (OSError, ValueError):
+        return {}
+    return table
+
+
+def _align(length: int) -> int:
+    return (length + 3) & ~3
+
+
+def _dump_netlink_neighbors() -> Optional[Dict[str, str]]:
+    """Dump IPv4 and IPv6 neighbors over rtnetlink. Returns None if unavailable."""
+    if not hasattr(socket, 'AF_NETLINK'):
+        return None
+    table: Dict[str, str] = {}
+    try:
+        with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE) as sock:
+            sock.settimeout(2)
+            body = _NDMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)
+            sock.send(_NLMSG_HEADER.pack(_NLMSG_HEADER.size + len(body), _RTM_GETNEIGH,
+                                         _NLM_F_REQUEST | _NLM_F_DUMP, 1, 0) + body)
+            while True:
+                data = sock.recv(65536)
+                offset = 0
+                while offset + _NLMSG_HEADER.size <= len(data):
+                    length, msg_type, _, _, _ = _NLMSG_HEADER.unpack_from(data, offset)
+                    if length < _NLMSG_HEADER.size:
+                        return table
+                    if msg_type == _NLMSG_DONE:
+                        return table
+                    if msg_type == _NLMSG_ERROR:
+                        return None
+                    if msg_type == _RTM_NEWNEIGH:
+                        _parse_neighbor(data[offset + _NLMSG_HEADER.size:offset + length], table)
+                    offset += _align(length)
+    except (OSError, struct.error):
+        return None
+
+
+def _parse_neighbor(message: bytes, table: Dict[str, str]) -> None:
+    """Add one RTM_NEWNEIGH message to the table if it holds a resolved MAC"""
+    family, _, state, _, _ = _NDMSG.unpack_from(message)
+    if family not in (socket.AF_INET, socket.AF_INET6):
+        return
+    if not state or state & (_NUD_INCOMPLETE | _NUD_FAILED | _NUD_NOARP):
+        return
+    dst = lladdr = None
+    offset = _NDMSG.size
+    while offset + _RTATTR.size <= len(message):
+        length, attr_type = _RTATTR.unpack_from(message, offset)
+        if length < _RTATTR.size:
+            break
+        value = message[offset + _RTATTR.size:offset + length]
+        if attr_type == _NDA_DST:
+            dst = value
+        elif attr_type == _NDA_LLADDR:
+            lladdr = value
+        offset += _align(length)
+    if dst is None or lladdr is None or len(lladdr) != 6 or not any(lladdr):
+        return
+    ip = ipaddress.ip_address(dst)
+    if not ip.is_multicast:
+        table[str(ip)] = ':'.join(f'{b:02X}' for b in lladdr)
+
+
+def read_neighbor_table() -> Dict[str, str]:
+    """Return resolved IPv4 and IPv6 neighbors as ip -> upper-case MAC address.
+
+    Uses an rtnetlink dump where available (which also covers IPv6 NDP
+    entries and reachable/stale/delay states), otherwise /proc/net/arp.
+    """
+    table = _dump_netlink_neighbors()
+    if table is None:
+        return read_arp_table()
+    return table
+
+
+def solicit_ipv6_neighbors(timeout: float = 1.0) -> int:
+    """Ping the all-nodes multicast group (ff02::1) on every interface so that
+    IPv6 hosts answer and land in the neighbor table. Returns the reply count,
+    or 0 if ICMPv6 sockets are not permitted."""
+    for sock_type in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            sock = socket.socket(socket.AF_INET6, sock_type, socket.IPPROTO_ICMPV6)
+            break
+        except OSError:
+            continue
+    else:
+        return 0
+
+    replies = 0
+    with sock:
+        # ICMPv6 echo request; the kernel fills in the checksum
+        request = struct.pack('!BBHHH', 128, 0, 0, os.getpid() & 0xffff, 1) + b'wol-app'
+        for index, name in socket.if_nameindex():
+            if name == 'lo':
+                continue
+            try:
+                sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_IF, index)
+                sock.sendto(request, ('ff02::1', 0, 0, index))
+            except OSError:
+                continue
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                data = sock.recv(1500)
+            except OSError:
+                break
+            if data and data[0] == 129:  # echo reply
+                replies += 1
+    return replies
@@ -0,0 +1,178 @@
+"""Memory-mapped IEEE OUI (MAC prefix) vendor database.
+
+The database is a compact binary file built from the IEEE registry
+(``oui.csv`` or ``oui.txt``) or a Wireshark ``manuf`` file::
+
+    python -m core.oui build oui.csv --output oui.bin
+
+Layout (little endian)::
+
+    header   4s magic 'OUI1', uint32 record count
+    index    65537 x uint32: first record of each 16-bit prefix bucket
+    records  count x (uint32 24-bit OUI, uint32 name offset), sorted by OUI
+    names    uint8 length + UTF-8 bytes each, deduplicated
+
+The file is mapped read-only, so every worker process shares the same page
+cache pages, and a lookup touches two index slots and, on average, less than
+one record.
+"""
+
+import csv
+import mmap
+import os
+import re
+import struct
+import threading
+from functools import lru_cache
+from typing import Dict, Optional
+from .config import config
+
+MAGIC = b'OUI1'
+_HEADER = struct.Struct('<4sI')
+_INDEX_SLOTS = 65536
+_INDEX = struct.Struct('<II')  # two adjacent bucket boundaries
+_RECORD = struct.Struct('<II')
+_INDEX_OFFSET = _HEADER.size
+_RECORDS_OFFSET = _INDEX_OFFSET + (_INDEX_SLOTS + 1) * 4
+
+_NON_HEX = re.compile(r'[^0-9A-Fa-f]')
+_TEXT_LINE = re.compile(r'^([0-9A-Fa-f]{2})[-:]([0-9A-Fa-f]{2})[-:]([0-9A-Fa-f]{2})\s+(?:\(hex\)\s+)?(.+?)\s*$')
+
+
+class OuiDatabase:
+    """Read-only view of a built OUI database file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f'{path} is not an OUI database')
+
+    def lookup(self, mac: str) -> Optional[str]:
+        """Return the vendor registered for a MAC address, or None"""
+        digits = _NON_HEX.sub('', mac)
+        if len(digits) < 6:
+            return None
+        return self.lookup_prefix(int(digits[:6], 16))
+
+    def lookup_prefix(self, oui: int) -> Optional[str]:
+        mm = self._mm
+        start, end = _INDEX.unpack_from(mm, _INDEX_OFFSET + (oui >> 8) * 4)
+        for i in range(start, end):
+            prefix, name_offset = _RECORD.unpack_from(mm, _RECORDS_OFFSET + i * _RECORD.size)
+            if prefix == oui:
+                length = mm[name_offset]
+                return mm[name_offset + 1:name_offset + 1 + length].decode('utf-8', 'replace')
+        return None
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def parse_registry(path: str) -> Dict[int, str]:
+    """Read OUI -> vendor entries from an IEEE oui.csv/oui.txt or Wireshark manuf file"""
+    entries: Dict[int, str] = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        if path.lower().endswith('.csv'):
+            for row in csv.DictReader(f):
+                assignment = _NON_HEX.sub('', row.get('Assignment') or '')
+                name = (row.get('Organization Name') or '').strip()
+                if len(assignment) == 6 and name:
+                    entries[int(assignment, 16)] = name
+            return entries
+        for line in f:
+            match = _TEXT_LINE.match(line)
+            if not match:
+                continue
+            name = match.group(4).split('\t')[-1].strip()
+            if name:
+                entries.setdefault(int(''.join(match.groups()[:3]), 16), name)
+    return entries
+
+
+def build_database(entries: Dict[int, str], output: str) -> int:
+    """Write a database file from OUI -> vendor entries. Returns the record count."""
+    from .storage import atomic_write_bytes
+
+    prefixes = sorted(entries)
+    names_offset = _RECORDS_OFFSET + len(prefixes) * _RECORD.size
+    names = bytearray()
+    name_offsets: Dict[str, int] = {}
+    records = bytearray()
+    index = [0] * (_INDEX_SLOTS + 1)
+    for i, prefix in enumerate(prefixes):
+        name = entries[prefix]
+        if name not in name_offsets:
+            encoded = name.encode('utf-8')[:255]
+            name_offsets[name] = names_offset + len(names)
+            names += bytes([len(encoded)]) + encoded
+        records += _RECORD.pack(prefix, name_offsets[name])
+        index[(prefix >> 8) + 1] = i + 1
+    # Empty buckets start where the previous bucket ended
+    for slot in range(1, _INDEX_SLOTS + 1):
+        index[slot] = max(index[slot], index[slot - 1])
+
+    data = _HEADER.pack(MAGIC, len(prefixes)) + struct.pack(f'<{_INDEX_SLOTS + 1}I', *index) + records + names
+    atomic_write_bytes(output, data)
+    return len(prefixes)
+
+
+_database: Optional[OuiDatabase] = None
+_database_missing = False
+_database_lock = threading.Lock()
+
+
+def _get_database() -> Optional[OuiDatabase]:
+    """Open paths.oui_file on first use; None if it is not available"""
+    global _database, _database_missing
+    if _database is None and not _database_missing:
+        with _database_lock:
+            if _database is None and not _database_missing:
+                try:
+                    _database = OuiDatabase(config.oui_file)
+                except (OSError, ValueError) as e:
+                    if not isinstance(e, FileNotFoundError):
+                        print(f"Warning: cannot open OUI database {config.oui_file}: {e}")
+                    _database_missing = True
+    return _database
+
+
+@lru_cache(maxsize=4096)
+def _lookup_prefix(prefix: str) -> Optional[str]:
+    database = _get_database()
+    if database is None:
+        return None
+    try:
+        return database.lookup_prefix(int(prefix, 16))
+    except ValueError:
+        return None
+
+
+def lookup_vendor(mac: str) -> Optional[str]:
+    """Return the vendor for a MAC address, or None if unknown or no database is installed"""
+    prefix = mac.replace(':', '').replace('-', '').replace('.', '')[:6].upper()
+    return _lookup_prefix(prefix) if len(prefix) == 6 else None
+
+
+def short_vendor(vendor: str) -> str:
+    """First word of a vendor name, for use in generated device names"""
+    words = re.findall(r'[A-Za-z0-9]+', vendor)
+    return words[0] if words else vendor
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='OUI vendor database maintenance')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='build the database from an IEEE registry or manuf file')
+    build.add_argument('source', help='oui.csv, oui.txt or manuf file')
+    build.add_argument('--output', default=config.oui_file, help='database file to write')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        count = build_database(parse_registry(args.source), args.output)
+        print(f"Wrote {count} vendor prefixes to {args.output} ({os.path.getsize(args.output)} bytes)")
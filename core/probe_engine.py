@@ -0,0 +1,477 @@
+"""Shared asyncio engine running every probe of the application.
+
+One event loop in a background thread runs the reachability probes of
+monitoring and wake verification, discovery's ARP lookups and the wake
+command. A probe in flight is a small coroutine rather than a thread:
+native ICMP probes share one datagram socket whose replies are matched to
+waiting futures, TCP fallbacks are non-blocking connects and the subprocess
+backend awaits its ``ping``/``arping`` children through pidfds.
+
+Every probe is charged to a budget. All budgets share
+``network.probe_concurrency`` slots and the ``network.probe_rate_per_second``
+token bucket; monitoring may hold at most ``monitoring.max_workers`` slots
+and discovery at most ``network.discovery_probe_share`` of the slots and of
+the rate, so a scan cannot starve status monitoring. Child processes are
+further capped by ``network.max_processes``.
+
+Threads call the plain methods, which return ``concurrent.futures.Future``;
+coroutines on the engine loop await the ``*_async`` variants.
+"""
+
+import asyncio
+import ipaddress
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Iterable, List, Optional, Tuple, TypeVar
+from .config import config
+from .metrics import DISCOVERY_PROBE_SECONDS, PROBE_SECONDS
+from .prober import (
+    TCP_ALIVE_ERRORS, TCP_PENDING_ERRORS, build_echo_request, icmp_available, parse_echo_reply
+)
+from .ratelimit import RateLimiter
+
+T = TypeVar('T')
+
+MONITORING = 'monitoring'
+DISCOVERY = 'discovery'
+WAKE = 'wake'
+
+_MAC_PATTERN = re.compile(r'([0-9a-fA-F]{2}[:-]){5}[0-9a-fA-F]{2}')
+_RTT_PATTERN = re.compile(r'time[=<]([\d.]+) ?ms')
+
+
+def _expire(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+async def _wait_until(loop: asyncio.AbstractEventLoop, future: asyncio.Future, deadline: float) -> Any:
+    """Result of future, or None once the loop clock passes deadline. Cheaper
+    than asyncio.wait_for: one timer and no wrapper task or future."""
+    timer = loop.call_at(deadline, _expire, future)
+    try:
+        return await future
+    finally:
+        timer.cancel()
+
+
+class _Budget:
+    """Concurrency slots and rate allowance for one class of probes"""
+
+    def __init__(self, concurrency: int, rate: float):
+        self.concurrency = max(1, int(concurrency))
+        self.slots = asyncio.Semaphore(self.concurrency)
+        self.limiter = RateLimiter(rate) if rate > 0 else None
+        self.in_flight = 0
+        self.waiting = 0
+        self.started = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'concurrency': self.concurrency, 'in_flight': self.in_flight,
+                'waiting': self.waiting, 'started_total': self.started}
+
+
+class _IcmpChannel:
+    """One ICMP datagram socket shared by every native probe on the loop.
+    Replies are matched to waiting futures by address and sequence number."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.token = os.urandom(8)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.sock.setblocking(False)
+        self._seq = 0
+        self._waiters: Dict[Tuple[str, int], Tuple[asyncio.Future, float]] = {}
+        loop.add_reader(self.sock.fileno(), self._drain)
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except OSError:
+                return
+            received = time.monotonic()
+            seq = parse_echo_reply(data, self.token)
+            waiter = self._waiters.pop((addr[0], seq), None) if seq is not None else None
+            if waiter is not None and not waiter[0].done():
+                waiter[0].set_result(received - waiter[1])
+
+    async def ping(self, address: str, timeout: float, attempts: int) -> Optional[float]:
+        """Round-trip seconds to an IPv4 address, None without a reply. Attempts
+        are spread over the timeout and a late reply to any of them counts."""
+        attempts = max(1, attempts)
+        future = self.loop.create_future()
+        keys = []
+        started = self.loop.time()
+        try:
+            for attempt in range(attempts):
+                self._seq = (self._seq + 1) & 0xffff
+                key = (address, self._seq)
+                self._waiters[key] = (future, time.monotonic())
+                keys.append(key)
+                try:
+                    self.sock.sendto(build_echo_request(self._seq, self.token), (address, 0))
+                except BlockingIOError:
+                    pass  # send buffer full: this attempt is lost
+                except OSError:
+                    return None
+                deadline = started + timeout * (attempt + 1) / attempts
+                rtt = await _wait_until(self.loop, future, deadline)
+                if rtt is not None:
+                    return rtt
+                # Late replies to earlier attempts still count: point them at a fresh future
+                future = self.loop.create_future()
+                for previous in keys:
+                    waiter = self._waiters.get(previous)
+                    if waiter is not None:
+                        self._waiters[previous] = (future, waiter[1])
+            return None
+        finally:
+            for key in keys:
+                self._waiters.pop(key, None)
+
+
+class ProbeEngine:
+    """Runs probes for every service on one background event loop"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pid: Optional[int] = None
+        self._total: Optional[_Budget] = None
+        self._budgets: Dict[str, _Budget] = {}
+        self._processes: Optional[asyncio.Semaphore] = None
+        self._icmp: Optional[_IcmpChannel] = None
+        self._icmp_failed = False
+
+    # Loop management
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the loop thread on first use, and again in a forked child"""
+        loop = self._loop
+        if loop is not None and self._pid == os.getpid():
+            return loop
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                total = max(1, config.probe_concurrency)
+                share = min(1.0, max(0.0, config.discovery_probe_share))
+                self._total = _Budget(total, config.probe_rate)
+                self._budgets = {
+                    MONITORING: _Budget(min(total, config.monitoring_workers), 0),
+                    DISCOVERY: _Budget(total * share, config.probe_rate * share),
+                    WAKE: _Budget(total, 0),
+                }
+                self._processes = asyncio.Semaphore(max(1, config.max_processes))
+                self._icmp = None
+                self._icmp_failed = False
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=self._run, args=(loop,), name='probe-engine', daemon=True).start()
+                self._loop = loop
+                self._pid = os.getpid()
+        return self._loop
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        if sys.version_info < (3, 12) and hasattr(os, 'pidfd_open'):
+            # The default child watcher of older Pythons parks a thread per child
+            # process; pidfds let the loop itself wait for them (3.12 does this anyway)
+            try:
+                os.close(os.pidfd_open(os.getpid()))
+                watcher = asyncio.PidfdChildWatcher()
+                watcher.attach_loop(loop)
+                asyncio.get_event_loop_policy().set_child_watcher(watcher)
+            except OSError:
+                pass
+        loop.run_forever()
+
+    def submit(self, coroutine: Coroutine[Any, Any, T]) -> 'Future[T]':
+        """Schedule a coroutine on the engine loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Slot usage overall and per budget"""
+        if self._total is None:
+            return {'running': False}
+        return {
+            'running': True,
+            'rate_per_second': config.probe_rate,
+            **self._total.stats(),
+            'budgets': {name: budget.stats() for name, budget in self._budgets.items()}
+        }
+
+    # Submit API for threads
+
+    def ping(self, host: str, timeout: Optional[float] = None, budget: str = MONITORING) -> 'Future[Optional[float]]':
+        """Probe one host with the configured backend. The future resolves to the
+        round-trip seconds, or None when the host did not answer."""
+        return self.submit(self.ping_async(host, timeout, budget))
+
+    def ping_many(self, hosts: Iterable[str], timeout: Optional[float] = None, budget: str = MONITORING,
+                  limiter: Optional[RateLimiter] = None,
+                  on_result: Optional[Callable[[str, Optional[float]], None]] = None
+                  ) -> 'Future[Dict[str, Optional[float]]]':
+        """Probe hosts concurrently; resolves to host -> round-trip seconds or None.
+        on_result is called on the engine loop as each host finishes."""
+        return self.submit(self.ping_many_async(hosts, timeout, budget, limiter, on_result))
+
+    def arping_many(self, ips: Iterable[str], budget: str = DISCOVERY, limiter: Optional[RateLimiter] = None,
+                    should_continue: Optional[Callable[[], bool]] = None) -> 'Future[Dict[str, Optional[str]]]':
+        """Resolve MAC addresses with arping; resolves to ip -> MAC or None.
+        Addresses not yet started when should_continue turns false are skipped."""
+        return self.submit(self.arping_many_async(ips, budget, limiter, should_continue))
+
+    def run_command(self, argv: List[str], timeout: Optional[float] = None,
+                    budget: str = WAKE) -> 'Future[subprocess.CompletedProcess]':
+        """Run a command as a budgeted child process, capturing its output"""
+        return self.submit(self._run_one(budget, argv, timeout))
+
+    # Coroutine API for the engine loop
+
+    async def ping_async(self, host: str, timeout: Optional[float] = None,
+                         budget: str = MONITORING) -> Optional[float]:
+        return (await self.ping_many_async([host], timeout, budget))[host]
+
+    async def ping_many_async(self, hosts: Iterable[str], timeout: Optional[float] = None,
+                              budget: str = MONITORING, limiter: Optional[RateLimiter] = None,
+                              on_result: Optional[Callable[[str, Optional[float]], None]] = None
+                              ) -> Dict[str, Optional[float]]:
+        timeout = timeout if timeout is not None else config.probe_timeout
+        return await self._charged(budget, hosts, lambda host: self._ping(host, timeout),
+                                   limiter=limiter, on_result=on_result)
+
+    async def arping_many_async(self, ips: Iterable[str], budget: str = DISCOVERY,
+                                limiter: Optional[RateLimiter] = None,
+                                should_continue: Optional[Callable[[], bool]] = None) -> Dict[str, Optional[str]]:
+        return await self._charged(budget, ips, self._arping, limiter=limiter, should_continue=should_continue)
+
+    async def run_command_async(self, argv: List[str], timeout: Optional[float] = None,
+                                budget: str = WAKE) -> subprocess.CompletedProcess:
+        return await self._run_one(budget, argv, timeout)
+
+    # Budgeting
+
+    async def _acquire(self, budget: _Budget, limiter: Optional[RateLimiter]) -> None:
+        budget.waiting += 1
+        try:
+            await budget.slots.acquire()
+            try:
+                await self._total.slots.acquire()
+            except BaseException:
+                budget.slots.release()
+                raise
+        finally:
+            budget.waiting -= 1
+        delay = max(self._total.limiter.reserve() if self._total.limiter else 0.0,
+                    budget.limiter.reserve() if budget.limiter else 0.0,
+                    limiter.reserve() if limiter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        budget.in_flight += 1
+        budget.started += 1
+        self._total.in_flight += 1
+        self._total.started += 1
+
+    def _release(self, budget: _Budget) -> None:
+        budget.in_flight -= 1
+        self._total.in_flight -= 1
+        self._total.slots.release()
+        budget.slots.release()
+
+    async def _charged(self, budget_name: str, items: Iterable[Any], probe: Callable[[Any], Awaitable[T]],
+                       limiter: Optional[RateLimiter] = None,
+                       should_continue: Optional[Callable[[], bool]] = None,
+                       on_result: Optional[Callable[[Any, Optional[T]], None]] = None) -> Dict[Any, Optional[T]]:
+        """Run probe for every item within the budget. A task only exists while
+        its probe holds a slot, so a queued item costs nothing but its list entry."""
+        budget = self._budgets[budget_name]
+        results: Dict[Any, Optional[T]] = {}
+        tasks: set = set()
+
+        async def run(item: Any) -> None:
+            try:
+                result = await probe(item)
+            except Exception as e:
+                print(f"Probe of {item} failed: {e}")
+                result = None
+            finally:
+                self._release(budget)
+            results[item] = result
+            if on_result is not None:
+                try:
+                    on_result(item, result)
+                except Exception as e:
+                    print(f"Probe result handler failed: {e}")
+
+        started = []
+        for item in dict.fromkeys(items):
+            if should_continue is not None and not should_continue():
+                break
+            await self._acquire(budget, limiter)
+            started.append(item)
+            task = asyncio.ensure_future(run(item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+        return {item: results.get(item) for item in started}
+
+    async def _run_one(self, budget_name: str, argv: List[str], timeout: Optional[float]) -> subprocess.CompletedProcess:
+        budget = self._budgets[budget_name]
+        await self._acquire(budget, None)
+        try:
+            return await self._run_process(argv, timeout)
+        finally:
+            self._release(budget)
+
+    # Probes
+
+    async def _run_process(self, argv: List[str], timeout: Optional[float]) -> subprocess.CompletedProcess:
+        """Run a child process without a thread per child. Raises FileNotFoundError
+        for a missing command and subprocess.TimeoutExpired after timeout."""
+        async with self._processes:
+            process = await asyncio.create_subprocess_exec(*argv, stdin=subprocess.DEVNULL,
+                                                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                raise subprocess.TimeoutExpired(argv, timeout)
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+        return subprocess.CompletedProcess(argv, process.returncode, stdout.decode(errors='replace'),
+                                           stderr.decode(errors='replace'))
+
+    async def _ping(self, host: str, timeout: float) -> Optional[float]:
+        backend = config.probe_backend
+        started = time.perf_counter()
+        try:
+            if backend == 'native':
+                return await self._native_ping(host, timeout)
+            return await self._command_ping(host, timeout)
+        finally:
+            PROBE_SECONDS.labels(backend).observe(time.perf_counter() - started)
+
+    async def _native_ping(self, host: str, timeout: float) -> Optional[float]:
+        """ICMP echo where permitted, TCP connect otherwise"""
+        loop = asyncio.get_running_loop()
+        channel = self._icmp_channel(loop)
+        if channel is not None:
+            address = await self._resolve(host, socket.AF_INET)
+            if address is not None:
+                return await channel.ping(address[1], timeout, config.ping_count)
+        return await self._tcp_ping(host, config.tcp_probe_ports, timeout)
+
+    def _icmp_channel(self, loop: asyncio.AbstractEventLoop) -> Optional[_IcmpChannel]:
+        if self._icmp is None and not self._icmp_failed:
+            try:
+                self._icmp = _IcmpChannel(loop) if icmp_available() else None
+            except OSError as e:
+                print(f"ICMP socket unavailable, probing with TCP connects: {e}")
+            self._icmp_failed = self._icmp is None
+        return self._icmp
+
+    @staticmethod
+    async def _resolve(host: str, family: int = socket.AF_UNSPEC) -> Optional[Tuple[int, str]]:
+        """(family, address) for a literal or hostname, None if it does not resolve
+        within the family. Literals never leave the loop thread."""
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            pass
+        else:
+            found = socket.AF_INET if address.version == 4 else socket.AF_INET6
+            return (found, str(address)) if family in (socket.AF_UNSPEC, found) else None
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, None, family=family,
+                                                                  type=socket.SOCK_STREAM)
+        except OSError:
+            return None
+        return (infos[0][0], infos[0][4][0]) if infos else None
+
+    async def _tcp_ping(self, host: str, ports: List[int], timeout: float) -> Optional[float]:
+        """Connect to every port at once; a handshake or a reset proves the host is up.
+        Sockets are watched with plain writer callbacks settling one future per host."""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        resolved = await self._resolve(host)
+        if resolved is None or not ports:
+            return None
+        family, address = resolved
+        future = loop.create_future()
+        watched: List[socket.socket] = []
+        opened: List[socket.socket] = []
+
+        def writable(sock: socket.socket) -> None:
+            loop.remove_writer(sock.fileno())
+            watched.remove(sock)
+            alive = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) in TCP_ALIVE_ERRORS
+            if not future.done() and (alive or not watched):
+                future.set_result(alive)
+
+        try:
+            for port in ports:
+                sock = socket.socket(family, socket.SOCK_STREAM)
+                opened.append(sock)
+                sock.setblocking(False)
+                err = sock.connect_ex((address, port))
+                if err in TCP_ALIVE_ERRORS:
+                    return time.monotonic() - started
+                if err in TCP_PENDING_ERRORS:
+                    watched.append(sock)
+                    # Plain descriptors: asyncio formats the repr of socket objects on every call
+                    loop.add_writer(sock.fileno(), writable, sock)
+            if not watched:
+                return None
+            alive = await _wait_until(loop, future, loop.time() + timeout - (time.monotonic() - started))
+            return time.monotonic() - started if alive else None
+        except OSError:
+            return None
+        finally:
+            for sock in watched:
+                loop.remove_writer(sock.fileno())
+            for sock in opened:
+                sock.close()
+
+    async def _command_ping(self, host: str, timeout: float) -> Optional[float]:
+        """Run the ping command. The round trip is read from its output, or taken
+        as the command's run time when the output shows none."""
+        started = time.monotonic()
+        try:
+            result = await self._run_process([config.ping_command, '-c', str(config.ping_count), host], timeout)
+        except FileNotFoundError:
+            print(f"Ping command not found: {config.ping_command}")
+            return None
+        except (subprocess.TimeoutExpired, OSError):
+            return None
+        if result.returncode != 0:
+            return None
+        match = _RTT_PATTERN.search(result.stdout)
+        return float(match.group(1)) / 1000 if match else time.monotonic() - started
+
+    async def _arping(self, ip: str) -> Optional[str]:
+        """MAC address of ip from one arping request"""
+        started = time.perf_counter()
+        try:
+            result = await self._run_process([config.arping_command, '-c', '1', '-w', '1', ip], 3)
+        except FileNotFoundError:
+            print(f"Error: 'arping' command not found at {config.arping_command}. Please install arping utility or update the arping_command path in config.json.")
+            return None
+        except (subprocess.TimeoutExpired, OSError):
+            return None
+        finally:
+            DISCOVERY_PROBE_SECONDS.observe(time.perf_counter() - started)
+        match = _MAC_PATTERN.search(result.stdout) if result.returncode == 0 else None
+        return match.group(0).upper().replace('-', ':') if match else None
+
+
+# Global probe engine instance
+probe_engine = ProbeEngine()
@@ -0,0 +1,63 @@
+"""ICMP and TCP probe primitives shared by the probe engine."""
+
+import errno
+import os
+import socket
+import struct
+import time
+from typing import Optional
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+# Connect results that prove a host is up: it accepted, or answered the SYN with a reset
+TCP_ALIVE_ERRORS = (0, errno.ECONNREFUSED)
+# Non-blocking connect results that mean the handshake is still in progress
+TCP_PENDING_ERRORS = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+_icmp_available: Optional[bool] = None
+
+
+def _checksum(data: bytes) -> int:
+    """Compute the RFC 1071 internet checksum"""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def icmp_available() -> bool:
+    """Return True if this process may open unprivileged ICMP datagram sockets"""
+    global _icmp_available
+    if _icmp_available is None:
+        try:
+            socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP).close()
+            _icmp_available = True
+        except OSError:
+            _icmp_available = False
+    return _icmp_available
+
+
+def build_echo_request(seq: int, token: bytes) -> bytes:
+    """ICMP echo request carrying token and the send time. The identifier is
+    left to the kernel, which owns it for datagram ICMP sockets on Linux."""
+    payload = token + struct.pack('!d', time.monotonic())
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, os.getpid() & 0xffff, seq)
+    checksum = _checksum(header + payload)
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, os.getpid() & 0xffff, seq)
+    return header + payload
+
+
+def parse_echo_reply(data: bytes, token: bytes) -> Optional[int]:
+    """Sequence number of an echo reply carrying token, None for anything else"""
+    # BSD-style ICMP datagram sockets deliver the IP header as well
+    if data and data[0] >> 4 == 4:
+        data = data[(data[0] & 0x0f) * 4:]
+    if len(data) < 16:
+        return None
+    icmp_type, _, _, _, seq = struct.unpack('!BBHHH', data[:8])
+    if icmp_type != ICMP_ECHO_REPLY or data[8:16] != token:
+        return None
+    return seq
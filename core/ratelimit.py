@@ -0,0 +1,39 @@
+"""Thread-safe pacing for outgoing probes."""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """Token bucket shared by any number of threads.
+
+    ``acquire(n)`` blocks until n more events fit within ``rate`` per second,
+    allowing bursts of up to ``burst`` events (by default 50 ms worth). A rate
+    of 0 or less disables limiting. ``reserve(n)`` takes the same tokens
+    without sleeping and returns the delay, for callers that wait on an
+    event loop instead.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = float(rate)
+        self.burst = burst if burst is not None else max(1.0, self.rate / 20)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n: int = 1) -> float:
+        """Take n tokens and return how many seconds the caller must wait before using them"""
+        if self.rate <= 0:
+            return 0.0
+        # Tokens may go negative: later callers inherit the debt, which keeps them in order
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= n
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self, n: int = 1) -> None:
+        delay = self.reserve(n)
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,311 @@
+"""State shared between worker processes in multi-worker mode."""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Seconds between checks for the leader's answer to a forwarded call
+CALL_POLL_SECONDS = 0.01
+# Events kept for followers that fall behind
+EVENT_BACKLOG = 10000
+# Removed statuses kept for deltas; beyond this older versions get full state
+MAX_TOMBSTONES = 10000
+
+
+class LeaderUnavailable(RuntimeError):
+    """No leader process answered a forwarded call in time"""
+
+
+class SharedState:
+    """SQLite database (WAL mode) shared by every worker process.
+
+    The leader publishes device statuses and relays its events here; the
+    other workers read statuses from it and forward calls that need the
+    leader's in-memory state through the ``calls`` table. Every worker
+    records the devices it changed in the device store.
+
+    Statuses and devices each carry one version counter for all processes,
+    so ETags and ``since`` deltas mean the same whichever worker answers. Each process
+    keeps a cached copy of the status map that is brought up to date
+    incrementally once another connection has committed.
+    """
+
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value
+        );
+        CREATE TABLE IF NOT EXISTS statuses (
+            device_id TEXT PRIMARY KEY,
+            status TEXT,
+            version INTEGER NOT NULL,
+            removed INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_statuses_version ON statuses (version);
+        CREATE TABLE IF NOT EXISTS device_versions (
+            device_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            removed INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_device_versions_version ON device_versions (version);
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            method TEXT NOT NULL,
+            args TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            done INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT
+        );
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.reopen()
+
+    def reopen(self) -> None:
+        """Open a fresh connection, e.g. in a child after fork; SQLite
+        connections must not be shared across processes"""
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self._SCHEMA)
+        # Versions start at the current time in milliseconds, like ChangeTracker
+        start = int(time.time() * 1000)
+        with self._conn:
+            self._conn.executemany('INSERT OR IGNORE INTO meta VALUES (?, ?)',
+                                   [('status_version', start), ('status_floor', start),
+                                    ('device_version', start), ('device_floor', start)])
+        self._statuses: Dict[str, str] = {}
+        self._version = 0
+        self._floor = 0
+        self._data_version: Optional[int] = None
+
+    def _get_meta(self, key: str, default: Any = None) -> Any:
+        row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        self._conn.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, value))
+
+    def data_version(self) -> int:
+        """Token that changes whenever another connection commits"""
+        with self._lock:
+            return self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    # Statuses
+
+    def _refresh(self) -> None:
+        """Bring the cached status map up to date. Caller holds _lock."""
+        data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        version = self._get_meta('status_version', 0)
+        floor = self._get_meta('status_floor', 0)
+        if version == self._version:
+            return
+        if self._version < floor:
+            # Tombstones we have not seen were pruned: reload everything
+            self._statuses = {}
+            rows = self._conn.execute('SELECT device_id, status, removed FROM statuses').fetchall()
+        else:
+            rows = self._conn.execute('SELECT device_id, status, removed FROM statuses WHERE version > ?',
+                                      (self._version,)).fetchall()
+        for device_id, status, removed in rows:
+            if removed:
+                self._statuses.pop(device_id, None)
+            else:
+                self._statuses[device_id] = status
+        self._version = version
+        self._floor = floor
+
+    def publish_statuses(self, statuses: Dict[str, str], removed: Iterable[str] = ()) -> int:
+        """Store changed statuses and removed device IDs as one new version"""
+        removed = list(removed)
+        with self._lock, self._conn:
+            version = self._get_meta('status_version', 0) + 1
+            self._conn.executemany('''
+                INSERT INTO statuses (device_id, status, version, removed) VALUES (?, ?, ?, 0)
+                ON CONFLICT (device_id) DO UPDATE SET
+                    status = excluded.status, version = excluded.version, removed = 0
+            ''', [(device_id, status, version) for device_id, status in statuses.items()])
+            self._conn.executemany(
+                'UPDATE statuses SET status = NULL, version = ?, removed = 1 WHERE device_id = ? AND removed = 0',
+                [(version, device_id) for device_id in removed])
+            self._set_meta('status_version', version)
+            if removed:
+                tombstones = self._conn.execute('SELECT COUNT(*) FROM statuses WHERE removed = 1').fetchone()[0]
+                if tombstones > MAX_TOMBSTONES:
+                    self._conn.execute('DELETE FROM statuses WHERE removed = 1')
+                    self._set_meta('status_floor', version)
+            # Our own commits do not change data_version
+            self._data_version = None
+        return version
+
+    def retain_statuses(self, device_ids: Iterable[str]) -> None:
+        """Remove the statuses of every device not in device_ids"""
+        keep = set(device_ids)
+        with self._lock:
+            self._refresh()
+            removed = [device_id for device_id in self._statuses if device_id not in keep]
+        if removed:
+            self.publish_statuses({}, removed)
+
+    def status_version(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._version
+
+    def get_status(self, device_id: str) -> Optional[str]:
+        with self._lock:
+            self._refresh()
+            return self._statuses.get(device_id)
+
+    def all_statuses(self) -> Dict[str, str]:
+        with self._lock:
+            self._refresh()
+            return dict(self._statuses)
+
+    def statuses_since(self, since: int) -> Tuple[int, Optional[Dict[str, str]], List[str]]:
+        """Get (version, changed statuses, removed IDs) since a version.
+        Changed statuses is None when since is too old or unknown for a delta."""
+        with self._lock:
+            self._refresh()
+            version = self._version
+            if since < self._floor or since > version:
+                return version, None, []
+            rows = self._conn.execute(
+                'SELECT device_id, status, removed FROM statuses WHERE version > ? AND version <= ?',
+                (since, version)).fetchall()
+        changed = {device_id: status for device_id, status, removed in rows if not removed}
+        return version, changed, [device_id for device_id, _, removed in rows if removed]
+
+    # Device versions
+
+    def record_device_changes(self, changed: Iterable[str], deleted: Iterable[str]) -> int:
+        """Record devices written to (or deleted from) the store as one new version"""
+        deleted = list(deleted)
+        with self._lock, self._conn:
+            version = self._get_meta('device_version', 0) + 1
+            self._conn.executemany('INSERT OR REPLACE INTO device_versions VALUES (?, ?, 0)',
+                                   [(device_id, version) for device_id in changed])
+            self._conn.executemany('INSERT OR REPLACE INTO device_versions VALUES (?, ?, 1)',
+                                   [(device_id, version) for device_id in deleted])
+            self._set_meta('device_version', version)
+            if deleted:
+                tombstones = self._conn.execute(
+                    'SELECT COUNT(*) FROM device_versions WHERE removed = 1').fetchone()[0]
+                if tombstones > MAX_TOMBSTONES:
+                    self._conn.execute('DELETE FROM device_versions WHERE removed = 1')
+                    self._set_meta('device_floor', version)
+        return version
+
+    def device_version(self) -> int:
+        with self._lock:
+            return self._get_meta('device_version', 0)
+
+    def device_changes_since(self, since: int) -> Tuple[int, Optional[Tuple[List[str], List[str]]]]:
+        """Return (version, (changed, deleted)) like ChangeTracker.changes_since"""
+        with self._lock:
+            version = self._get_meta('device_version', 0)
+            if since < self._get_meta('device_floor', 0) or since > version:
+                return version, None
+            rows = self._conn.execute(
+                'SELECT device_id, removed FROM device_versions WHERE version > ? AND version <= ?',
+                (since, version)).fetchall()
+        return version, ([device_id for device_id, removed in rows if not removed],
+                         [device_id for device_id, removed in rows if removed])
+
+    # Events relayed from the leader
+
+    def append_events(self, events: List[Tuple[str, Dict[str, Any]]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT INTO events (event, data) VALUES (?, ?)',
+                                   [(event, json.dumps(data)) for event, data in events])
+            self._conn.execute('DELETE FROM events WHERE id <= (SELECT MAX(id) FROM events) - ?',
+                               (EVENT_BACKLOG,))
+
+    def last_event_id(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+
+    def events_after(self, event_id: int) -> Tuple[List[Tuple[int, str, Dict[str, Any]]], bool]:
+        """Events newer than event_id, and whether some were already pruned"""
+        with self._lock:
+            rows = self._conn.execute('SELECT id, event, data FROM events WHERE id > ? ORDER BY id',
+                                      (event_id,)).fetchall()
+        missed = bool(rows) and rows[0][0] > event_id + 1
+        return [(row_id, event, json.loads(data)) for row_id, event, data in rows], missed
+
+    # Calls forwarded to the leader
+
+    def call(self, method: str, args: List[Any], kwargs: Dict[str, Any], timeout: float) -> Any:
+        """Ask the leader to run method and wait for its answer. Raises
+        LeaderUnavailable on timeout, and ValueError or RuntimeError for an
+        exception raised by the leader."""
+        with self._lock, self._conn:
+            call_id = self._conn.execute(
+                'INSERT INTO calls (method, args, created_at) VALUES (?, ?, ?)',
+                (method, json.dumps({'args': args, 'kwargs': kwargs}), time.time())).lastrowid
+        deadline = time.monotonic() + timeout
+        while True:
+            time.sleep(CALL_POLL_SECONDS)
+            with self._lock:
+                row = self._conn.execute('SELECT done, result, error FROM calls WHERE id = ?',
+                                         (call_id,)).fetchone()
+            if (row is not None and row[0]) or time.monotonic() >= deadline:
+                break
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM calls WHERE id = ?', (call_id,))
+        if row is None or not row[0]:
+            raise LeaderUnavailable(f"No leader answered {method} within {timeout:g}s")
+        if row[2] is not None:
+            kind, message = json.loads(row[2])
+            raise (ValueError if kind == 'ValueError' else RuntimeError)(message)
+        return json.loads(row[1])
+
+    def pending_calls(self, max_age: float) -> List[Tuple[int, str, List[Any], Dict[str, Any]]]:
+        """Unanswered calls younger than max_age seconds; older ones are dropped"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM calls WHERE done = 0 AND created_at < ?', (time.time() - max_age,))
+            rows = self._conn.execute('SELECT id, method, args FROM calls WHERE done = 0 ORDER BY id').fetchall()
+        calls = []
+        for call_id, method, args in rows:
+            payload = json.loads(args)
+            calls.append((call_id, method, payload['args'], payload['kwargs']))
+        return calls
+
+    def answer(self, call_id: int, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """Store the result of a forwarded call, or the exception it raised"""
+        encoded = error_json = None
+        if error is None:
+            try:
+                encoded = json.dumps(result)
+            except (TypeError, ValueError) as e:
+                error = e
+        if error is not None:
+            encoded, error_json = None, json.dumps([type(error).__name__, str(error)])
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE calls SET done = 1, result = ?, error = ? WHERE id = ?',
+                               (encoded, error_json, call_id))
+
+    # Leader bookkeeping
+
+    def set_leader(self, pid: int) -> None:
+        with self._lock, self._conn:
+            self._set_meta('leader_pid', pid)
+            self._set_meta('leader_since', datetime.now().isoformat())
+
+    def leader(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'pid': self._get_meta('leader_pid'), 'since': self._get_meta('leader_since')}
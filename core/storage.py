@@ -0,0 +1,331 @@
+"""Device persistence backends and crash-safe file helpers."""
+
+import fcntl
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+from .config import config
+from .models import Device
+
+_file_locks: Dict[str, threading.RLock] = {}
+_file_locks_guard = threading.Lock()
+
+
+def file_lock(path: str) -> threading.RLock:
+    """Return the process-wide lock guarding read-modify-write cycles on a file"""
+    key = os.path.abspath(path)
+    with _file_locks_guard:
+        lock = _file_locks.get(key)
+        if lock is None:
+            lock = _file_locks[key] = threading.RLock()
+        return lock
+
+
+@contextmanager
+def process_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive ``flock`` on ``<path>.lock`` so read-modify-write
+    cycles on path from other processes wait for this one"""
+    fd = os.open(f'{path}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # closing the descriptor releases the lock
+
+
+def atomic_write_json(path: str, data: Any, indent: int | None = 2) -> None:
+    """Write JSON to a temporary file, fsync it and rename it over the target,
+    so readers and crashes only ever see the old or the new complete file"""
+    atomic_write_bytes(path, json.dumps(data, indent=indent).encode('utf-8'))
+
+
+def atomic_write_bytes(path: str, data: bytes) -> None:
+    """Write bytes to a file with the same crash safety as atomic_write_json"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    # Persist the rename itself
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+class DeviceStore:
+    """Interface implemented by device persistence backends.
+
+    ``DeviceService`` keeps the working set in memory and hands every flush
+    to a store, together with the IDs changed or deleted since the last one,
+    so row-oriented backends only write what changed.
+    """
+
+    def signature(self) -> Optional[Hashable]:
+        """Return a token that changes whenever another writer modifies the store"""
+        raise NotImplementedError
+
+    def load(self) -> List[Device]:
+        """Load every device"""
+        raise NotImplementedError
+
+    def write(self, devices: List[Device], changed: Set[str],
+              deleted: Set[str]) -> Tuple[Optional[List[Device]], Optional[Hashable]]:
+        """Persist the devices named in ``changed`` and remove those in
+        ``deleted``, keeping whatever other writers stored meanwhile.
+
+        Returns (devices, signature): the full list now stored if the store
+        merged it with other writers' changes, otherwise None, and the
+        signature of the store after the write.
+        """
+        raise NotImplementedError
+
+    def record_wake(self, device_id: str, timestamp: str, success: bool, message: str) -> None:
+        """Append a wake event. Backends without an event log ignore it."""
+
+    def record_wakes(self, events: List[Tuple[str, str, bool, str]]) -> None:
+        """Append many (device_id, timestamp, success, message) wake events"""
+        for event in events:
+            self.record_wake(*event)
+
+    def record_status(self, device_id: str, timestamp: str, status: str) -> None:
+        """Append a status transition. Backends without a history ignore it."""
+
+    def get_wake_events(self, device_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return the most recent wake events for a device"""
+        return []
+
+    def get_status_history(self, device_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return the most recent status transitions for a device"""
+        return []
+
+
+class JsonDeviceStore(DeviceStore):
+    """Stores the device list as a single JSON document"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def signature(self) -> Optional[Hashable]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def load(self) -> List[Device]:
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, FileNotFoundError):
+                return []
+        return []
+
+    def write(self, devices: List[Device], changed: Set[str],
+              deleted: Set[str]) -> Tuple[Optional[List[Device]], Optional[Hashable]]:
+        # Re-read under a cross-process lock so devices other processes
+        # wrote since our last load are kept rather than overwritten
+        with process_lock(self.path):
+            ours = {str(d['id']): d for d in devices if str(d['id']) in changed}
+            merged: List[Device] = []
+            for device in self.load():
+                device_id = str(device['id'])
+                if device_id not in deleted:
+                    merged.append(ours.pop(device_id, device))
+            merged.extend(ours.values())
+            atomic_write_json(self.path, merged)
+            return merged, self.signature()
+
+
+class SqliteDeviceStore(DeviceStore):
+    """Stores devices, wake events and status history in an SQLite database (WAL mode)"""
+
+    _COLUMNS = ('id', 'name', 'mac', 'ip', 'description', 'created_at', 'last_wake')
+
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS devices (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            mac TEXT NOT NULL,
+            ip TEXT NOT NULL DEFAULT '',
+            description TEXT NOT NULL DEFAULT '',
+            created_at TEXT,
+            last_wake TEXT,
+            extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_devices_mac ON devices (mac);
+        CREATE INDEX IF NOT EXISTS idx_devices_ip ON devices (ip);
+        CREATE TABLE IF NOT EXISTS wake_events (
+            device_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            success INTEGER NOT NULL,
+            message TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_wake_events_device ON wake_events (device_id, timestamp);
+        CREATE TABLE IF NOT EXISTS status_history (
+            device_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            status TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_status_history_device ON status_history (device_id, timestamp);
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self._SCHEMA)
+        self._conn.commit()
+
+    def signature(self) -> Optional[Hashable]:
+        # data_version only changes when *another* connection commits
+        with self._lock:
+            return self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _row_to_device(self, row: sqlite3.Row) -> Device:
+        device = {column: row[column] for column in self._COLUMNS}
+        if row['extra']:
+            device.update(json.loads(row['extra']))
+        return device  # type: ignore
+
+    def _device_to_row(self, device: Device) -> tuple:
+        extra = {k: v for k, v in device.items() if k not in self._COLUMNS}
+        return (str(device['id']), device['name'], device['mac'], device.get('ip') or '',
+                device.get('description') or '', device.get('created_at'), device.get('last_wake'),
+                json.dumps(extra) if extra else None)
+
+    def load(self) -> List[Device]:
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM devices ORDER BY rowid').fetchall()
+        return [self._row_to_device(row) for row in rows]
+
+    def write(self, devices: List[Device], changed: Set[str],
+              deleted: Set[str]) -> Tuple[Optional[List[Device]], Optional[Hashable]]:
+        # Row-level upserts and deletes leave other writers' rows alone
+        rows = [self._device_to_row(d) for d in devices if str(d['id']) in changed]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany('DELETE FROM devices WHERE id = ?', [(i,) for i in deleted])
+                self._conn.executemany('''
+                    INSERT INTO devices (id, name, mac, ip, description, created_at, last_wake, extra)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        name = excluded.name, mac = excluded.mac, ip = excluded.ip,
+                        description = excluded.description, created_at = excluded.created_at,
+                        last_wake = excluded.last_wake, extra = excluded.extra
+                ''', rows)
+            return None, self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def record_wake(self, device_id: str, timestamp: str, success: bool, message: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute('INSERT INTO wake_events VALUES (?, ?, ?, ?)',
+                               (device_id, timestamp, int(success), message))
+
+    def record_wakes(self, events: List[Tuple[str, str, bool, str]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT INTO wake_events VALUES (?, ?, ?, ?)',
+                                   [(d, t, int(ok), m) for d, t, ok, m in events])
+
+    def record_status(self, device_id: str, timestamp: str, status: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute('INSERT INTO status_history VALUES (?, ?, ?)',
+                               (device_id, timestamp, status))
+
+    def get_wake_events(self, device_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT timestamp, success, message FROM wake_events WHERE device_id = ? '
+                'ORDER BY timestamp DESC LIMIT ?', (device_id, limit)).fetchall()
+        return [{'timestamp': r['timestamp'], 'success': bool(r['success']), 'message': r['message']}
+                for r in rows]
+
+    def get_status_history(self, device_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT timestamp, status FROM status_history WHERE device_id = ? '
+                'ORDER BY timestamp DESC LIMIT ?', (device_id, limit)).fetchall()
+        return [{'timestamp': r['timestamp'], 'status': r['status']} for r in rows]
+
+
+class DiscoveryStore:
+    """Persists the discovery host table and scan cursor as one JSON document"""
+
+    def __init__(self, path: str | None = None):
+        self.path = path or config.discovery_file
+        self._lock = file_lock(self.path)
+
+    def load(self) -> Dict[str, Any]:
+        """Return {'hosts': {mac: host}, 'scan': cursor or None}"""
+        with self._lock:
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                return {'hosts': {}, 'scan': None}
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Warning: ignoring unreadable discovery state {self.path}: {e}")
+                return {'hosts': {}, 'scan': None}
+        return {'hosts': data.get('hosts') or {}, 'scan': data.get('scan')}
+
+    def save(self, hosts: Dict[str, Any], scan: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            atomic_write_json(self.path, {'hosts': hosts, 'scan': scan}, indent=None)
+
+
+def create_device_store() -> DeviceStore:
+    """Create the device store selected by ``paths.storage_backend``"""
+    backend = config.storage_backend
+    if backend == 'sqlite':
+        return SqliteDeviceStore(config.database_file)
+    if backend != 'json':
+        print(f"Warning: unknown storage backend '{backend}', using json")
+    return JsonDeviceStore(config.devices_file)
+
+
+def migrate_json_to_sqlite(json_path: str, db_path: str) -> int:
+    """Import every device from a devices.json file into an SQLite database.
+    Existing rows with the same ID are overwritten. Returns the number imported."""
+    devices = JsonDeviceStore(json_path).load()
+    store = SqliteDeviceStore(db_path)
+    store.write(devices, {str(d['id']) for d in devices}, set())
+    return len(devices)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Device storage maintenance')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate = subparsers.add_parser('migrate', help='import devices.json into the SQLite database')
+    migrate.add_argument('--json', default=config.devices_file, help='source devices.json')
+    migrate.add_argument('--db', default=config.database_file, help='target SQLite database')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        count = migrate_json_to_sqlite(args.json, args.db)
+        print(f"Imported {count} devices from {args.json} into {args.db}")
@@ -1,8 +1,8 @@
 """Utility functions for the WoL application."""
 
 import hashlib
-import subprocess
-from .config import config
+from typing import Any, Dict, Iterable, List
+from .probe_engine import MONITORING, probe_engine
 
 
 def generate_device_id(name: str, mac: str) -> str:
@@ -16,15 +16,22 @@ def generate_device_id(name: str, mac: str) -> str:
     return device_id
 
 
-def ping_device(ip_address: str) -> bool:
-    """Ping a device and return True if all packets are successful"""
-    cmd = [config.ping_command, '-c', str(config.ping_count), ip_address]
-    try:
-        result = subprocess.run(cmd, 
-                              capture_output=True, text=True)
-        return result.returncode == 0
-    except FileNotFoundError:
-        print(f"Ping command not found: {config.ping_command}")
-        return False
-    except Exception:
-        return False
+def parse_tags(value: Any) -> List[str]:
+    """Normalize tags given as a list or a comma-separated string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return sorted({str(tag).strip().lower() for tag in value if str(tag).strip()})
+
+
+def ping_device(ip_address: str, timeout: float | None = None, budget: str = MONITORING) -> bool:
+    """Probe a device through the probe engine and return True if it answered"""
+    return probe_engine.ping(ip_address, timeout, budget).result() is not None
+
+
+def ping_devices(ip_addresses: Iterable[str], timeout: float | None = None,
+                 budget: str = MONITORING) -> Dict[str, bool]:
+    """Probe many devices concurrently and return ip -> reachable"""
+    replies = probe_engine.ping_many(ip_addresses, timeout, budget).result()
+    return {ip: rtt is not None for ip, rtt in replies.items()}
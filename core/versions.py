@@ -0,0 +1,71 @@
+"""Version counters for keyed collections, used for ETags and delta responses."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+
+class ChangeTracker:
+    """Records the version at which each key last changed.
+
+    The version starts at the current time in milliseconds, so it keeps
+    increasing across restarts and a stale ``since`` from a client never
+    matches a newer process by accident. Keys are kept in change order, so a
+    delta only walks the entries changed after ``since``. Deleted keys are
+    remembered as tombstones; once more than ``max_tombstones`` pile up they
+    are dropped and older versions can only be answered with full state.
+    """
+
+    def __init__(self, max_tombstones: int = 10000):
+        self.max_tombstones = max_tombstones
+        self._lock = threading.Lock()
+        self._version = int(time.time() * 1000)
+        self._floor = self._version
+        self._entries: 'OrderedDict[str, Tuple[int, bool]]' = OrderedDict()  # key -> (version, deleted)
+        self._tombstones = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def touch(self, keys: Iterable[str]) -> None:
+        """Mark keys as changed in a single new version"""
+        self._record(keys, False)
+
+    def remove(self, keys: Iterable[str]) -> None:
+        """Mark keys as deleted in a single new version"""
+        self._record(keys, True)
+
+    def _record(self, keys: Iterable[str], deleted: bool) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+        with self._lock:
+            self._version += 1
+            for key in keys:
+                previous = self._entries.pop(key, None)
+                if previous is not None and previous[1]:
+                    self._tombstones -= 1
+                self._entries[key] = (self._version, deleted)
+                if deleted:
+                    self._tombstones += 1
+            if self._tombstones > self.max_tombstones:
+                self._entries = OrderedDict((k, v) for k, v in self._entries.items() if not v[1])
+                self._tombstones = 0
+                self._floor = self._version
+
+    def changes_since(self, since: int) -> Tuple[int, Optional[Tuple[List[str], List[str]]]]:
+        """Return (version, (changed, deleted)) for keys changed after since,
+        or (version, None) when since is too old or unknown for a delta"""
+        with self._lock:
+            if since < self._floor or since > self._version:
+                return self._version, None
+            changed: List[str] = []
+            deleted: List[str] = []
+            for key in reversed(self._entries):
+                version, is_deleted = self._entries[key]
+                if version <= since:
+                    break
+                (deleted if is_deleted else changed).append(key)
+            return self._version, (changed, deleted)
@@ -5,6 +5,8 @@ from .devices import devices_bp, init_device_routes
 from .status import status_bp, init_status_routes
 from .wol import wol_bp, init_wol_routes
 from .discovery import discovery_bp, init_discovery_routes
+from .events import events_bp
+from .metrics import metrics_bp, init_metrics_routes
 
 __all__ = [
     'main_bp',
@@ -12,9 +14,12 @@ __all__ = [
     'status_bp',
     'wol_bp',
     'discovery_bp',
+    'events_bp',
+    'metrics_bp',
     'init_main_routes',
     'init_device_routes',
     'init_status_routes', 
     'init_wol_routes',
-    'init_discovery_routes'
+    'init_discovery_routes',
+    'init_metrics_routes'
 ]
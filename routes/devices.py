@@ -1,25 +1,144 @@
 """API routes for device management."""
 
+import ipaddress
+import math
+import zlib
 from flask import Blueprint, request, jsonify, redirect, url_for, flash, Response
 from datetime import datetime
-from typing import Union, Tuple, TYPE_CHECKING
-from core.models import Device
-from core.utils import generate_device_id
+from typing import Any, Dict, Optional, Union, Tuple, TYPE_CHECKING
+from core.device_index import SORT_KEYS
+from core.magic_packet import parse_secureon_password
+from core.models import Device, DeviceStatus
+from core.oui import lookup_vendor
+from core.utils import generate_device_id, parse_tags
+from .responses import parse_page, parse_since, public_device, versioned_json
 
 if TYPE_CHECKING:
-    from services import DeviceService
+    from services import DeviceService, MonitoringService
 
 devices_bp = Blueprint('devices', __name__, url_prefix='/devices')
 
-# Service will be injected by the app factory
+# Services will be injected by the app factory
 device_service: 'DeviceService' = None  # type: ignore
+monitoring_service: 'MonitoringService' = None  # type: ignore
+
+# Query parameters that turn GET /devices into a paged query
+PAGE_PARAMS = ('q', 'status', 'subnet', 'sort', 'order', 'page', 'per_page')
+
+
+def validate_device_fields(data: Dict[str, Any]) -> None:
+    """Check the optional fields of an added or updated device. Raises
+    ValueError with a message for the client when one is invalid."""
+    if data.get('secureon_password'):
+        try:
+            parse_secureon_password(str(data['secureon_password']))
+        except ValueError:
+            raise ValueError('secureon_password must be 6 bytes as AA:BB:CC:DD:EE:FF '
+                             '(or plain hex), or 4 bytes as a.b.c.d')
+    if data.get('monitor_interval') not in (None, ''):
+        try:
+            interval = float(data['monitor_interval'])
+        except (TypeError, ValueError):
+            interval = math.nan
+        if not (math.isfinite(interval) and interval > 0):
+            raise ValueError('monitor_interval must be a positive number of seconds')
+
+
+def _invalid_device(message: str) -> Union[Response, Tuple[Response, int]]:
+    """Reject an add or update request, as JSON or as a flash message"""
+    if request.is_json:
+        return jsonify({'error': message}), 400
+    flash(message, 'error')
+    return redirect(url_for('main.index'))
+
+
+def parse_device_query(default_per_page: int = 50) -> Dict[str, Any]:
+    """Read the filter, sort and page query parameters. Raises ValueError
+    with a message for the client when one is invalid."""
+    status = request.args.get('status', '').strip().lower()
+    if status and status not in {s.value for s in DeviceStatus}:
+        raise ValueError(f"status must be one of {', '.join(s.value for s in DeviceStatus)}")
+    subnet = request.args.get('subnet', '').strip()
+    if subnet:
+        try:
+            ipaddress.ip_network(subnet, strict=False)
+        except ValueError:
+            raise ValueError('subnet must be a network such as 192.168.1.0/24')
+    sort = request.args.get('sort', '').strip().lower()
+    if sort and sort not in SORT_KEYS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+    order = request.args.get('order', 'asc').strip().lower() or 'asc'
+    if order not in ('asc', 'desc'):
+        raise ValueError('order must be asc or desc')
+    page, per_page = parse_page(default_per_page)
+    return {'q': request.args.get('q', '').strip(), 'status': status, 'subnet': subnet,
+            'sort': sort, 'order': order, 'page': page, 'per_page': per_page}
+
+
+def query_device_page(ds: 'DeviceService', ms: 'MonitoringService', query: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a query from parse_device_query and add the status of each device
+    on the page. Only the status filter looks at the whole status map."""
+    statuses: Optional[Dict[str, str]] = None
+    if query['status']:
+        statuses = ms.get_all_statuses()
+
+    def has_status(device_id: str) -> bool:
+        return statuses.get(device_id, DeviceStatus.UNKNOWN.value) == query['status']  # type: ignore
+
+    per_page = query['per_page']
+    total, devices = ds.query_devices(
+        name=query['q'] or None, subnet=query['subnet'] or None,
+        predicate=has_status if statuses is not None else None,
+        sort=query['sort'] or None, descending=query['order'] == 'desc',
+        offset=(query['page'] - 1) * per_page, limit=per_page)
+    devices = [public_device(device) for device in devices]
+    for device in devices:
+        device_id = str(device['id'])
+        status = statuses.get(device_id) if statuses is not None else ms.get_device_status(device_id).value
+        device['status'] = status or DeviceStatus.UNKNOWN.value  # type: ignore
+    return {
+        'devices': devices,
+        'total': total,
+        'page': query['page'],
+        'per_page': per_page,
+        'pages': max(1, -(-total // per_page))
+    }
 
 
 @devices_bp.route('', methods=['GET'])
-def get_devices() -> Response:
-    """API endpoint to get all devices"""
-    devices = device_service.load_devices()
-    return jsonify(devices)
+def get_devices() -> Union[Response, Tuple[Response, int]]:
+    """API endpoint to get all devices.
+
+    With since=<version>, returns only the devices changed after that version.
+    With any of the PAGE_PARAMS, returns one page of a filtered and sorted
+    query, each device with its status.
+    """
+    if any(name in request.args for name in PAGE_PARAMS):
+        try:
+            query = parse_device_query()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        # Page bodies include statuses, so the ETag covers both versions
+        key = zlib.crc32(repr(sorted(query.items())).encode())
+        return versioned_json(device_service.get_version(),
+                              lambda: query_device_page(device_service, monitoring_service, query),
+                              variant=f'-page-{monitoring_service.get_status_version()}-{key:08x}')
+
+    since, error = parse_since()
+    if error:
+        return error
+    if since is None:
+        return versioned_json(device_service.get_version(),
+                              lambda: [public_device(d) for d in device_service.load_devices()])
+
+    version, devices, deleted = device_service.get_changes_since(since)
+    full = devices is None
+    return versioned_json(version, lambda: {
+        'version': version,
+        'full': full,
+        'devices': [public_device(d) for d in (device_service.load_devices() if full else devices)],
+        'deleted': deleted
+    }, variant=f'-since-{since}')
 
 
 @devices_bp.route('', methods=['POST'])
@@ -32,7 +151,8 @@ def add_device() -> Union[Response, Tuple[Response, int]]:
             'name': request.form.get('name'),
             'mac': request.form.get('mac'),
             'ip': request.form.get('ip', ''),
-            'description': request.form.get('description', '')
+            'description': request.form.get('description', ''),
+            'tags': request.form.get('tags', '')
         }
     
     name = data.get('name')
@@ -43,6 +163,10 @@ def add_device() -> Union[Response, Tuple[Response, int]]:
         else:
             flash('Name and MAC address are required', 'error')
             return redirect(url_for('main.index'))
+    try:
+        validate_device_fields(data)
+    except ValueError as e:
+        return _invalid_device(str(e))
     
     new_device: Device = {
         'id': generate_device_id(str(name), str(mac)),
@@ -51,13 +175,22 @@ def add_device() -> Union[Response, Tuple[Response, int]]:
         'ip': str(data.get('ip', '')),
         'description': str(data.get('description', '')),
         'created_at': datetime.now().isoformat(),
-        'last_wake': None
+        'last_wake': None,
+        'tags': parse_tags(data.get('tags'))
     }
+    for key in ('broadcast_address', 'secureon_password'):
+        if data.get(key):
+            new_device[key] = str(data[key])
+    if data.get('monitor_interval'):
+        new_device['monitor_interval'] = float(data['monitor_interval'])
+    vendor = data.get('vendor') or lookup_vendor(new_device['mac'])
+    if vendor:
+        new_device['vendor'] = str(vendor)
     
     device_service.add_device(new_device)
     
     if request.is_json:
-        return jsonify(new_device), 201
+        return jsonify(public_device(new_device)), 201
     else:
         flash(f'Device "{new_device["name"]}" added successfully!', 'success')
         return redirect(url_for('main.index'))
@@ -123,6 +256,10 @@ def update_device(device_id: str) -> Union[Response, Tuple[Response, int]]:
         else:
             flash('Name and MAC address are required', 'error')
             return redirect(url_for('main.index'))
+    try:
+        validate_device_fields(data)
+    except ValueError as e:
+        return _invalid_device(str(e))
     
     # Prepare updates
     updates = {
@@ -131,13 +268,20 @@ def update_device(device_id: str) -> Union[Response, Tuple[Response, int]]:
         'ip': str(data.get('ip', '')),
         'description': str(data.get('description', ''))
     }
+    if data.get('tags') is not None:
+        updates['tags'] = parse_tags(data.get('tags'))
+    for key in ('broadcast_address', 'secureon_password'):
+        if data.get(key) is not None:
+            updates[key] = str(data[key])
+    if 'monitor_interval' in data:
+        updates['monitor_interval'] = float(data['monitor_interval']) if data['monitor_interval'] else None
     
     success = device_service.update_device(device_id, updates)
     
     if success:
         if request.is_json:
             updated_device = device_service.get_device_by_id(device_id)
-            return jsonify(updated_device)
+            return jsonify(public_device(updated_device) if updated_device else None)
         else:
             flash(f'Device "{updates["name"]}" updated successfully!', 'success')
             return redirect(url_for('main.index'))
@@ -149,7 +293,17 @@ def update_device(device_id: str) -> Union[Response, Tuple[Response, int]]:
             return redirect(url_for('main.index'))
 
 
-def init_device_routes(ds: 'DeviceService') -> None:
+@devices_bp.route('/<device_id>/events', methods=['GET'])
+def get_device_events(device_id: str) -> Union[Response, Tuple[Response, int]]:
+    """Get recent wake events and status transitions for a device"""
+    if not device_service.get_device_by_id(device_id):
+        return jsonify({'error': 'Device not found'}), 404
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify(device_service.get_device_events(device_id, limit))
+
+
+def init_device_routes(ds: 'DeviceService', ms: 'MonitoringService') -> None:
     """Initialize device routes with service dependencies."""
-    global device_service
+    global device_service, monitoring_service
     device_service = ds
+    monitoring_service = ms
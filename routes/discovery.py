@@ -1,9 +1,10 @@
 """Discovery routes for network device discovery."""
 
-from flask import Blueprint, jsonify, Response
+from flask import Blueprint, jsonify, request, Response
 from datetime import datetime
-from typing import Union, Tuple, TYPE_CHECKING
+from typing import Any, Dict, Union, Tuple, TYPE_CHECKING
 from core.models import Device
+from core.oui import lookup_vendor, short_vendor
 from core.utils import generate_device_id
 
 if TYPE_CHECKING:
@@ -18,8 +19,16 @@ device_service: 'DeviceService' = None  # type: ignore
 
 @discovery_bp.route('/start', methods=['POST'])
 def start_discovery() -> Union[Response, Tuple[Response, int]]:
-    """Start network device discovery"""
-    success = discovery_service.start_discovery()
+    """Start network device discovery.
+
+    Optional mode (JSON body or query string): auto, full, resume or refresh.
+    """
+    data = request.get_json(silent=True) or {}
+    mode = data.get('mode') or request.args.get('mode', 'auto')
+    try:
+        success = discovery_service.start_discovery(mode)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     if not success:
         return jsonify({'error': 'Discovery already in progress'}), 400
@@ -29,22 +38,8 @@ def start_discovery() -> Union[Response, Tuple[Response, int]]:
 
 @discovery_bp.route('/status', methods=['GET'])
 def discovery_status() -> Response:
-    """Get current discovery status and results"""
-    status = discovery_service.get_discovery_status()
-    
-    # Load existing devices to check for duplicates
-    existing_devices = device_service.load_devices()
-    existing_macs = {device['mac'].lower() for device in existing_devices}
-    
-    # Mark discovered devices as imported if they already exist
-    devices_with_status = []
-    for device in status['devices']:
-        device_copy = device.copy()
-        device_copy['already_imported'] = device['mac'].lower() in existing_macs
-        devices_with_status.append(device_copy)
-    
-    status['devices'] = devices_with_status
-    return jsonify(status)
+    """Get current discovery status and results, optionally filtered by ?vendor="""
+    return jsonify(discovery_service.get_discovery_status(request.args.get('vendor')))
 
 
 @discovery_bp.route('/stop', methods=['POST'])
@@ -54,78 +49,82 @@ def stop_discovery() -> Response:
     return jsonify({'message': 'Discovery stopped', 'status': 'stopped'})
 
 
+def _device_from_host(host: Dict[str, Any]) -> Device:
+    """Build an inventory device for a discovered host, named after its
+    resolved hostname, else its vendor"""
+    id = generate_device_id(host['ip'], host['mac'])
+    vendor = host.get('vendor') or lookup_vendor(host['mac'])
+    if host.get('hostname'):
+        name = host['hostname'].split('.')[0]
+    elif vendor:
+        name = f"{short_vendor(vendor)}-{id}"
+    else:
+        name = f"Device-{id}"
+    return {
+        'id': id,
+        'name': name,
+        'mac': host['mac'],
+        'ip': host['ip'],
+        'description': f"Auto-discovered {vendor} device" if vendor else "Auto-discovered device",
+        'created_at': datetime.now().isoformat(),
+        'last_wake': None,
+        'vendor': vendor
+    }
+
+
 @discovery_bp.route('/import', methods=['POST'])
-def import_discovered_devices() -> Response:
-    """Import all discovered devices"""
-    status = discovery_service.get_discovery_status()
-    devices = device_service.load_devices()
-    existing_macs = {device['mac'].upper() for device in devices}
+def import_discovered_devices() -> Union[Response, Tuple[Response, int]]:
+    """Import discovered devices in one batch.
+
+    Optional JSON body: subnets (list), vendor, mac_prefix and dry_run.
+    """
+    data = request.get_json(silent=True) or {}
+    subnets = data.get('subnets') or ([data['subnet']] if data.get('subnet') else [])
+    if not isinstance(subnets, list) or not all(isinstance(subnet, str) for subnet in subnets):
+        return jsonify({'error': 'subnets must be a list of CIDR strings'}), 400
+    try:
+        hosts = discovery_service.select_hosts(subnets, data.get('vendor'), data.get('mac_prefix'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    imported_count = 0
-    for discovered in status['devices']:
-        # Skip if MAC already exists
-        if discovered['mac'].upper() in existing_macs:
-            continue
-        
-        # Create device name from IP
-        id = generate_device_id(discovered['ip'], discovered['mac'])
-        device_name = f"Device-{id}"
-        
-        new_device: Device = {
-            'id': id,
-            'name': device_name,
-            'mac': discovered['mac'],
-            'ip': discovered['ip'],
-            'description': f"Auto-discovered device",
-            'created_at': datetime.now().isoformat(),
-            'last_wake': None
-        }
-        
-        device_service.add_device(new_device)
-        existing_macs.add(discovered['mac'].upper())
-        imported_count += 1
+    dry_run = bool(data.get('dry_run'))
+    imported = device_service.add_devices([_device_from_host(host) for host in hosts], dry_run=dry_run)
+    if dry_run:
+        return jsonify({
+            'message': f'Would import {len(imported)} devices',
+            'imported_count': 0,
+            'dry_run': True,
+            'devices': imported
+        })
+    discovery_service.mark_imported(imported)
     
     return jsonify({
-        'message': f'Imported {imported_count} devices',
-        'imported_count': imported_count
+        'message': f'Imported {len(imported)} devices',
+        'imported_count': len(imported),
+        'devices': imported
     })
 
 
 @discovery_bp.route('/import/<device_mac>', methods=['POST'])
 def import_single_device(device_mac: str) -> Union[Response, Tuple[Response, int]]:
     """Import a single discovered device by MAC address"""
-    status = discovery_service.get_discovery_status()
-    
-    # Find the device in discovery results
-    discovered_device = next((d for d in status['devices'] if d['mac'].upper() == device_mac.upper()), None)
+    discovered_device = discovery_service.get_host(device_mac)
     
     if not discovered_device:
         return jsonify({'error': 'Device not found in discovery results'}), 404
     
-    devices = device_service.load_devices()
-    existing_macs = {device['mac'].upper() for device in devices}
-    
     # Check if device already exists
-    if discovered_device['mac'].upper() in existing_macs:
+    if discovered_device['already_imported']:
         return jsonify({'error': 'Device already exists'}), 400
     
-    id = generate_device_id(discovered_device['ip'], discovered_device['mac'])
-    device_name = f"Device-{id}"
-    
-    new_device: Device = {
-        'id': id,
-        'name': device_name,
-        'mac': discovered_device['mac'],
-        'ip': discovered_device['ip'],
-        'description': f"Auto-discovered device",
-        'created_at': datetime.now().isoformat(),
-        'last_wake': None
-    }
-    
-    device_service.add_device(new_device)
+    added = device_service.add_devices([_device_from_host(discovered_device)])
+    if not added:
+        return jsonify({'error': 'Device already exists'}), 400
+    new_device = added[0]
+    discovery_service.mark_imported(added)
     
     return jsonify({
-        'message': f'Device "{device_name}" imported successfully',
+        'message': f'Device "{new_device["name"]}" imported successfully',
         'device': new_device
     })
 
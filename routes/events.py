@@ -0,0 +1,57 @@
+"""Server-Sent Events stream of status and discovery changes."""
+
+import json
+import queue
+from flask import Blueprint, Response, stream_with_context
+from typing import Any, Dict, Iterator
+from core.events import event_bus
+
+events_bp = Blueprint('events', __name__)
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_SECONDS = 15
+
+
+def _format(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@events_bp.route('/events')
+def stream_events() -> Response:
+    """Stream status changes and discovery progress as Server-Sent Events"""
+    subscription = event_bus.subscribe()
+
+    def generate() -> Iterator[str]:
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event, data = subscription.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+
+                # Coalesce a backlog of status deltas into one message
+                if event == 'status':
+                    merged = dict(data)
+                    pending = []
+                    while True:
+                        try:
+                            next_event = subscription.get_nowait()
+                        except queue.Empty:
+                            break
+                        if next_event[0] == 'status':
+                            merged.update(next_event[1])
+                        else:
+                            pending.append(next_event)
+                    yield _format('status', merged)
+                    for other, other_data in pending:
+                        yield _format(other, other_data)
+                else:
+                    yield _format(event, data)
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
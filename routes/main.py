@@ -1,7 +1,10 @@
 """Main routes for device management."""
 
-from flask import Blueprint, render_template
+from flask import Blueprint, flash, render_template
 from typing import TYPE_CHECKING
+from core.device_index import SORT_KEYS
+from core.models import DeviceStatus
+from .devices import parse_device_query, query_device_page
 
 if TYPE_CHECKING:
     from services import DeviceService, MonitoringService
@@ -12,19 +15,28 @@ main_bp = Blueprint('main', __name__)
 device_service: 'DeviceService' = None  # type: ignore
 monitoring_service: 'MonitoringService' = None  # type: ignore
 
+# Devices shown per page unless per_page is given
+DEVICES_PER_PAGE = 50
+
 
 @main_bp.route('/')
 def index() -> str:
-    """Main page showing all devices"""
-    devices = device_service.load_devices()
-    # Add status to each device
-    devices_with_status = []
-    for device in devices:
-        device_id = str(device['id'])  # Convert to string for consistency
-        status = monitoring_service.get_device_status(device_id)
-        device_with_status = {**device, 'status': status.value}
-        devices_with_status.append(device_with_status)
-    return render_template('index.html', devices=devices_with_status)
+    """Main page showing one page of devices, filtered and sorted by the query parameters"""
+    try:
+        query = parse_device_query(DEVICES_PER_PAGE)
+    except ValueError as e:
+        flash(str(e), 'error')
+        query = {'q': '', 'status': '', 'subnet': '', 'sort': '', 'order': 'asc',
+                 'page': 1, 'per_page': DEVICES_PER_PAGE}
+    result = query_device_page(device_service, monitoring_service, query)
+    # Filters carried over by the pagination links
+    filters = {key: query[key] for key in ('q', 'status', 'subnet', 'sort') if query[key]}
+    if query['order'] == 'desc':
+        filters['order'] = 'desc'
+    if query['per_page'] != DEVICES_PER_PAGE:
+        filters['per_page'] = query['per_page']
+    return render_template('index.html', query=query, filters=filters,
+                           sort_keys=SORT_KEYS, statuses=[s.value for s in DeviceStatus], **result)
 
 
 def init_main_routes(ds: 'DeviceService', ms: 'MonitoringService') -> None:
@@ -0,0 +1,63 @@
+"""Prometheus metrics endpoint and per-route request instrumentation."""
+
+import os
+import time
+from flask import Blueprint, Response, g, request
+from typing import TYPE_CHECKING
+from core.metrics import (
+    CONTENT_TYPE, DEVICES, HTTP_REQUESTS, HTTP_REQUEST_SECONDS, MONITORING_IN_FLIGHT,
+    MONITORING_LAG_SECONDS, REGISTRY
+)
+from core.config import config
+from core.models import DeviceStatus
+
+if TYPE_CHECKING:
+    from services import MonitoringService
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Service will be injected by the app factory
+monitoring_service: 'MonitoringService' = None  # type: ignore
+
+
+@metrics_bp.before_app_request
+def start_request_timer() -> None:
+    g.metrics_started = time.perf_counter()
+
+
+@metrics_bp.after_app_request
+def record_request(response: Response) -> Response:
+    """Count every request and observe its latency, labelled by route template"""
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUEST_SECONDS.labels(route, request.method).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(route, request.method, str(response.status_code)).inc()
+    return response
+
+
+@metrics_bp.route('/metrics')
+def metrics() -> Response:
+    """Prometheus scrape endpoint. Metrics are per process, so in multi-worker
+    mode every sample is labelled with the pid of the worker that answered."""
+    if monitoring_service is not None:
+        # State gauges are read from the services only when scraped
+        counts = {status.value: 0 for status in DeviceStatus}
+        for status in monitoring_service.get_all_statuses().values():
+            counts[status] += 1
+        for status, count in counts.items():
+            DEVICES.labels(status).set(count)
+        cluster = monitoring_service.cluster
+        if cluster is None or cluster.is_leader:
+            # Only the leader probes; followers must not ask it on every scrape
+            lag, in_flight = monitoring_service.get_scheduler_load()
+            MONITORING_LAG_SECONDS.set(lag)
+            MONITORING_IN_FLIGHT.set(in_flight)
+    const_labels = [('worker', str(os.getpid()))] if config.multi_worker else []
+    return Response(REGISTRY.render(const_labels), content_type=CONTENT_TYPE)
+
+
+def init_metrics_routes(ms: 'MonitoringService') -> None:
+    """Initialize metrics routes with service dependencies."""
+    global monitoring_service
+    monitoring_service = ms
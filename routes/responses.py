@@ -0,0 +1,97 @@
+"""Shared helpers for conditional and compressed JSON responses."""
+
+import gzip
+import math
+from flask import Response, current_app, jsonify, request
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+# Upper bound for the per_page query parameter
+MAX_PER_PAGE = 500
+
+_WINDOW_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def public_device(device: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a device for API responses: the SecureOn password is replaced
+    by a has_secureon_password flag"""
+    device = dict(device)
+    if device.pop('secureon_password', None):
+        device['has_secureon_password'] = True
+    return device
+
+
+def parse_since() -> Tuple[Optional[int], Optional[Tuple[Response, int]]]:
+    """Read the optional since=<version> query parameter. Returns (since, error response)."""
+    value = request.args.get('since')
+    if value is None or value == '':
+        return None, None
+    try:
+        return int(value), None
+    except ValueError:
+        return None, (jsonify({'error': 'since must be an integer version'}), 400)
+
+
+def parse_window(default: str = '24h') -> Tuple[Optional[float], Optional[Tuple[Response, int]]]:
+    """Read the window query parameter (seconds, or a number with an s/m/h/d/w
+    suffix such as 90m or 7d). Returns (seconds, error response)."""
+    value = request.args.get('window', default).strip().lower()
+    multiplier = _WINDOW_UNITS.get(value[-1:], None)
+    try:
+        seconds = float(value[:-1] if multiplier else value) * (multiplier or 1)
+    except ValueError:
+        seconds = 0
+    if not (seconds > 0 and math.isfinite(seconds)):
+        return None, (jsonify({'error': 'window must be a positive duration such as 3600, 90m, 24h or 7d'}), 400)
+    return seconds, None
+
+
+def parse_page(default_per_page: int = 50) -> Tuple[int, int]:
+    """Read the page and per_page query parameters. Returns (page, per_page);
+    page numbers start at 1. Raises ValueError with a message for the client
+    when one is not an integer in range."""
+    page = _parse_int('page', 1)
+    if page is None or page < 1:
+        raise ValueError('page must be a positive integer')
+    per_page = _parse_int('per_page', default_per_page)
+    if per_page is None or not 1 <= per_page <= MAX_PER_PAGE:
+        raise ValueError(f'per_page must be an integer from 1 to {MAX_PER_PAGE}')
+    return page, per_page
+
+
+def _parse_int(name: str, default: int) -> Optional[int]:
+    """Read an integer query parameter, None when it is not an integer"""
+    value = request.args.get(name, '').strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def versioned_json(version: int, build: Callable[[], Any], variant: str = '') -> Response:
+    """JSON response with a strong ETag for a version of the data.
+
+    Answers 304 without calling ``build`` when the client already holds this
+    version, and gzips large bodies for clients that accept it.
+    """
+    etag = f'{version}{variant}'
+    gzip_etag = f'{etag}-gzip'
+    headers = {'X-Version': str(version), 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+
+    for tag in (etag, gzip_etag):
+        if request.if_none_match.contains(tag):
+            response = Response(status=304, headers=headers)
+            response.set_etag(tag)
+            return response
+
+    body = current_app.json.dumps(build()).encode('utf-8')
+    response = Response(body, mimetype='application/json', headers=headers)
+    if len(body) >= GZIP_MIN_BYTES and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+        etag = gzip_etag
+    response.set_etag(etag)
+    return response
@@ -1,7 +1,8 @@
 """Status and monitoring routes."""
 
 from flask import Blueprint, jsonify, Response
-from typing import TYPE_CHECKING
+from typing import Tuple, Union, TYPE_CHECKING
+from .responses import parse_since, parse_window, versioned_json
 
 if TYPE_CHECKING:
     from services import MonitoringService
@@ -13,10 +14,58 @@ monitoring_service: 'MonitoringService' = None  # type: ignore
 
 
 @status_bp.route('/status')
-def get_status() -> Response:
-    """API endpoint to get device status"""
-    status_dict = monitoring_service.get_all_statuses()
-    return jsonify(status_dict)
+def get_status() -> Union[Response, Tuple[Response, int]]:
+    """API endpoint to get device status.
+
+    With since=<version>, returns only the statuses changed after that version.
+    """
+    since, error = parse_since()
+    if error:
+        return error
+    if since is None:
+        return versioned_json(monitoring_service.get_status_version(),
+                              monitoring_service.get_all_statuses)
+
+    version, statuses, removed = monitoring_service.get_statuses_since(since)
+    full = statuses is None
+    return versioned_json(version, lambda: {
+        'version': version,
+        'full': full,
+        'statuses': monitoring_service.get_all_statuses() if full else statuses,
+        'removed': removed
+    }, variant=f'-since-{since}')
+
+
+@status_bp.route('/status/history')
+def get_uptime_summary() -> Union[Response, Tuple[Response, int]]:
+    """API endpoint to get uptime, flaps and RTT percentiles of every device
+    over ?window= (default 24h)"""
+    window, error = parse_window()
+    if error:
+        return error
+    return jsonify({
+        'window_seconds': window,
+        'devices': monitoring_service.get_uptime_summary(window)
+    })
+
+
+@status_bp.route('/status/history/<device_id>')
+def get_device_uptime(device_id: str) -> Union[Response, Tuple[Response, int]]:
+    """API endpoint to get uptime, flaps and RTT percentiles of one device
+    over ?window= (default 24h)"""
+    window, error = parse_window()
+    if error:
+        return error
+    uptime = monitoring_service.get_uptime(device_id, window)
+    if uptime is None:
+        return jsonify({'error': 'No history for this device'}), 404
+    return jsonify({'device_id': device_id, 'window_seconds': window, **uptime})
+
+
+@status_bp.route('/status/monitoring')
+def get_monitoring_stats() -> Response:
+    """API endpoint to get monitoring sweep metrics"""
+    return jsonify(monitoring_service.get_monitoring_stats())
 
 
 def init_status_routes(ms: 'MonitoringService') -> None:
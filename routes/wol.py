@@ -2,24 +2,42 @@
 
 from flask import Blueprint, request, jsonify, redirect, url_for, flash, Response
 from typing import Union, Tuple, TYPE_CHECKING
+from .responses import public_device
 
 if TYPE_CHECKING:
-    from services import WakeOnLanService
+    from services import WakeOnLanService, WakeJobService
 
 wol_bp = Blueprint('wol', __name__)
 
 # Service will be injected by the app factory
 wol_service: 'WakeOnLanService' = None  # type: ignore
+wake_job_service: 'WakeJobService' = None  # type: ignore
+
+
+def _verify_requested() -> bool:
+    """Whether the caller asked for a wake-and-verify job"""
+    if request.args.get('verify', '').lower() in ('1', 'true', 'yes'):
+        return True
+    data = request.get_json(silent=True) if request.is_json else None
+    return bool(data and data.get('verify'))
 
 
 @wol_bp.route('/wake/<device_id>', methods=['POST'])
 def wake_device(device_id: str) -> Union[Response, Tuple[Response, int]]:
-    """Wake up a device by ID"""
+    """Wake up a device by ID, optionally tracking it until it comes online"""
+    if request.is_json and _verify_requested():
+        job, message = wake_job_service.start_job(device_id)
+        if job is None:
+            return jsonify({'error': message}), 404
+        if job['state'] == 'failed':
+            return jsonify({'error': message, 'job': job}), 500
+        return jsonify({'message': message, 'job': job}), 202
+    
     success, message, device = wol_service.wake_device(device_id)
     
     if success:
         if request.is_json:
-            return jsonify({'message': message, 'device': device})
+            return jsonify({'message': message, 'device': public_device(device) if device else None})
         else:
             flash(message, 'success')
             return redirect(url_for('main.index'))
@@ -32,6 +50,56 @@ def wake_device(device_id: str) -> Union[Response, Tuple[Response, int]]:
             return redirect(url_for('main.index'))
 
 
+@wol_bp.route('/wake', methods=['POST'])
+def wake_devices() -> Union[Response, Tuple[Response, int]]:
+    """Wake many devices selected by ID, tag and/or current offline status"""
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids') or []
+    tags = data.get('tags') or []
+    all_offline = bool(data.get('all_offline'))
+    
+    if not all(isinstance(values, list) and all(isinstance(v, str) for v in values) for values in (ids, tags)):
+        return jsonify({'error': 'ids and tags must be lists of strings'}), 400
+    if not ids and not tags and not all_offline:
+        return jsonify({'error': 'Provide ids, tags or all_offline'}), 400
+    
+    devices = wol_service.select_devices(ids, tags, all_offline)
+    results = wol_service.wake_devices(devices)
+    # Report requested IDs that matched no device instead of dropping them
+    found = {str(d['id']) for d in devices}
+    results.extend({'id': device_id, 'name': None, 'mac': None, 'success': False, 'message': 'not found'}  # type: ignore
+                   for device_id in dict.fromkeys(ids) if device_id not in found)
+    woken = sum(1 for r in results if r['success'])
+    
+    if data.get('verify'):
+        by_id = {str(d['id']): d for d in devices}
+        for result in results:
+            if result['success']:
+                result['job'] = wake_job_service.track(by_id[result['id']])
+    
+    return jsonify({
+        'message': f'Sent wake packets to {woken} of {len(results)} devices',
+        'requested': len(results),
+        'woken': woken,
+        'results': results
+    })
+
+
+@wol_bp.route('/wake/jobs', methods=['GET'])
+def list_wake_jobs() -> Response:
+    """List wake-and-verify jobs, newest first"""
+    return jsonify(wake_job_service.list_jobs())
+
+
+@wol_bp.route('/wake/jobs/<job_id>', methods=['GET'])
+def get_wake_job(job_id: str) -> Union[Response, Tuple[Response, int]]:
+    """Get the state of a wake-and-verify job"""
+    job = wake_job_service.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+
 # Route for form-based deletion (since HTML forms don't support DELETE)
 @wol_bp.route('/delete/<device_id>', methods=['POST'])  
 def delete_device_form(device_id: str) -> Response:
@@ -95,7 +163,8 @@ def update_device_form(device_id: str) -> Response:
     return redirect(url_for('main.index'))
 
 
-def init_wol_routes(ws: 'WakeOnLanService') -> None:
+def init_wol_routes(ws: 'WakeOnLanService', wjs: 'WakeJobService') -> None:
     """Initialize WoL routes with service dependencies."""
-    global wol_service
+    global wol_service, wake_job_service
     wol_service = ws
+    wake_job_service = wjs
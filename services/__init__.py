@@ -4,10 +4,14 @@ from .device_service import DeviceService
 from .monitoring_service import MonitoringService
 from .discovery_service import DiscoveryService
 from .wol_service import WakeOnLanService
+from .wake_job_service import WakeJobService
+from .cluster_service import ClusterService
 
 __all__ = [
     'DeviceService',
     'MonitoringService', 
     'DiscoveryService',
-    'WakeOnLanService'
+    'WakeOnLanService',
+    'WakeJobService',
+    'ClusterService'
 ]
@@ -0,0 +1,204 @@
+"""Service coordinating the worker processes of a multi-worker deployment."""
+
+import functools
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar, TYPE_CHECKING
+from core.config import config
+from core.events import Event, event_bus
+from core.leader import LeaderLock
+from core.shared_state import SharedState
+
+if TYPE_CHECKING:
+    from services.monitoring_service import MonitoringService
+
+# Seconds between rounds of publishing (leader) or catching up (followers)
+TICK_SECONDS = 0.05
+# Seconds between a follower's attempts to take the leader lock
+ELECTION_INTERVAL_SECONDS = 1.0
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+def on_leader(method: F) -> F:
+    """Run a service method in the leader process. Other workers forward the
+    call through the shared state and return the leader's answer, decoded
+    from JSON (tuples come back as lists)."""
+    @functools.wraps(method)
+    def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        cluster = self.cluster
+        if cluster is not None and not cluster.is_leader:
+            return cluster.call(f'{type(self).__name__}.{method.__name__}', list(args), kwargs)
+        return method(self, *args, **kwargs)
+    wrapper.on_leader = True  # type: ignore
+    return wrapper  # type: ignore
+
+
+class ClusterService:
+    """Elects one leader among the worker processes serving the app.
+
+    Every process that creates the app with ``app.multi_worker`` enabled
+    competes for ``paths.leader_lock_file``. The holder alone runs monitoring,
+    discovery and wake verification; it publishes status changes and relays
+    its events to ``paths.shared_state_file`` and answers the calls other
+    workers forward to it (see ``on_leader``). The other workers serve status
+    reads from the shared state, replay the relayed events to their own
+    ``/events`` clients and retry the lock every ELECTION_INTERVAL_SECONDS,
+    so one of them takes over about a second after the leader exits.
+    """
+
+    def __init__(self, state: Optional[SharedState] = None, lock: Optional[LeaderLock] = None):
+        if config.storage_backend != 'sqlite':
+            # A JSON document rewritten by several processes is not coordinated
+            # beyond its file lock, and every flush would rewrite the whole file
+            raise RuntimeError("app.multi_worker requires paths.storage_backend 'sqlite'")
+        self.state = state or SharedState(config.shared_state_file)
+        self.lock = lock or LeaderLock(config.leader_lock_file)
+        self.monitoring_service: Optional['MonitoringService'] = None
+        self._services: Dict[str, Any] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._subscription: Optional['queue.Queue[Event]'] = None
+        self._last_event_id = 0
+        self._data_version: Optional[int] = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lock.held
+
+    def start(self, monitoring_service: 'MonitoringService', *services: Any) -> None:
+        """Take part in the election. The services' ``on_leader`` methods
+        can be called from other workers while this process leads."""
+        self.monitoring_service = monitoring_service
+        self._services = {type(s).__name__: s for s in (monitoring_service,) + services}
+        self._last_event_id = self.state.last_event_id()
+        # Elect right away so the first requests already know this process's role
+        self._elect()
+        self._start_thread()
+
+    def stop(self) -> None:
+        """Leave the cluster, stopping leader work if this process leads."""
+        self._stop_event.set()
+        if self.is_leader:
+            for service in self._services.values():
+                for name in ('stop_monitoring', 'stop_discovery'):
+                    if hasattr(service, name):
+                        getattr(service, name)()
+            self.lock.release()
+        if self._subscription is not None:
+            event_bus.unsubscribe(self._subscription)
+            self._subscription = None
+
+    def call(self, method: str, args: List[Any], kwargs: Dict[str, Any]) -> Any:
+        """Forward a call to the leader and return its answer"""
+        return self.state.call(method, args, kwargs, config.leader_call_timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Role of this process and the current leader"""
+        return {
+            'role': 'leader' if self.is_leader else 'follower',
+            'pid': os.getpid(),
+            'leader': self.state.leader(),
+            'status_version': self.state.status_version()
+        }
+
+    def _start_thread(self) -> None:
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='cluster')
+        self._thread.start()
+
+    def _after_fork(self) -> None:
+        """In a child forked after start (e.g. gunicorn --preload) the lock,
+        the database connection and the thread all belong to the parent"""
+        self.lock.forget()
+        self.state.reopen()
+        self._subscription = None
+        self._data_version = None
+        if self._thread is not None:
+            self._stop_event = threading.Event()
+            self._start_thread()
+
+    def _elect(self) -> None:
+        if self.lock.try_acquire():
+            self._become_leader()
+
+    def _become_leader(self) -> None:
+        assert self.monitoring_service is not None
+        print(f"Process {os.getpid()} is now the leader")
+        self.state.set_leader(os.getpid())
+        self._subscription = event_bus.subscribe()
+        # Forget statuses of devices deleted while no process was leading
+        devices = self.monitoring_service.device_service.load_devices()
+        self.state.retain_statuses(str(device['id']) for device in devices)
+        self.monitoring_service.start_monitoring()
+
+    def _run(self) -> None:
+        """Publish as the leader, otherwise follow and stand for election"""
+        next_election = time.monotonic() + ELECTION_INTERVAL_SECONDS
+        while not self._stop_event.wait(TICK_SECONDS):
+            try:
+                if self.is_leader:
+                    self._lead()
+                else:
+                    self._follow()
+                    if time.monotonic() >= next_election:
+                        next_election = time.monotonic() + ELECTION_INTERVAL_SECONDS
+                        self._elect()
+            except Exception as e:
+                print(f"Cluster error: {e}")
+
+    def _lead(self) -> None:
+        assert self.monitoring_service is not None
+        self.monitoring_service.publish_statuses(self.state)
+        self._relay_events()
+        data_version = self.state.data_version()
+        if data_version != self._data_version:
+            # Another worker committed: maybe a forwarded call
+            self._data_version = data_version
+            self._answer_calls()
+
+    def _relay_events(self) -> None:
+        """Copy the leader's events to the shared state"""
+        if self._subscription is None:
+            return
+        events: List[Tuple[str, Dict[str, Any]]] = []
+        try:
+            while True:
+                events.append(self._subscription.get_nowait())
+        except queue.Empty:
+            pass
+        if events:
+            self.state.append_events(events)
+
+    def _answer_calls(self) -> None:
+        for call_id, method, args, kwargs in self.state.pending_calls(config.leader_call_timeout):
+            service_name, _, name = method.partition('.')
+            function = getattr(type(self._services.get(service_name)), name, None)
+            if not getattr(function, 'on_leader', False):
+                self.state.answer(call_id, error=ValueError(f"Unknown call {method}"))
+                continue
+            try:
+                result = function(self._services[service_name], *args, **kwargs)
+            except Exception as e:
+                self.state.answer(call_id, error=e)
+            else:
+                self.state.answer(call_id, result)
+
+    def _follow(self) -> None:
+        """Replay events the leader relayed since the last round"""
+        data_version = self.state.data_version()
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        if not event_bus.has_subscribers:
+            self._last_event_id = self.state.last_event_id()
+            return
+        events, missed = self.state.events_after(self._last_event_id)
+        if missed:
+            event_bus.publish('resync', {})
+        for event_id, event, data in events:
+            event_bus.publish(event, data)
+            self._last_event_id = event_id
@@ -1,64 +1,324 @@
 """Service for managing device data persistence."""
 
-import json
-import os
-from typing import List, Dict, Any
+import atexit
+import ipaddress
+import threading
+import time
+import weakref
+from typing import Callable, List, Dict, Any, Optional, Hashable, Set, Tuple, TYPE_CHECKING
 from core.models import Device
 from core.config import config
+from core.device_index import DeviceIndex
+from core.storage import DeviceStore, create_device_store, file_lock
+from core.versions import ChangeTracker
+from core.metrics import STORAGE_SECONDS
+
+if TYPE_CHECKING:
+    from services.cluster_service import ClusterService
+
+# Delay before retrying a failed flush, doubled after every failure up to the maximum
+FLUSH_RETRY_SECONDS = 1.0
+FLUSH_RETRY_MAX_SECONDS = 60.0
+
+_instances: 'weakref.WeakSet[DeviceService]' = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all() -> None:
+    """Write the pending changes of every live DeviceService at exit"""
+    for service in list(_instances):
+        service.flush()
 
 
 class DeviceService:
-    """Service class for handling device CRUD operations."""
-    
-    def __init__(self):
+    """Service class for handling device CRUD operations.
+
+    Devices are held in memory, indexed by ID and MAC address, and written
+    through to the configured store after every change. Bursts of changes
+    within ``paths.flush_delay_ms`` are coalesced into a single flush, which
+    only writes the devices changed or deleted here and keeps what other
+    processes stored meanwhile. Edits made to the store by other processes
+    are picked up via its signature (file modification time for JSON, data
+    version for SQLite).
+
+    Every change bumps a version counter, which backs the ``/devices`` ETag
+    and lets clients fetch only the devices changed since a version. Paged
+    queries use a DeviceIndex built for the current version. With a cluster
+    every change is flushed right away and its version recorded in the
+    shared state after the write, so all workers report the same versions
+    and a version is never ahead of the data a worker can load.
+    """
+
+    def __init__(self, store: Optional[DeviceStore] = None, cluster: Optional['ClusterService'] = None):
         self.devices_file = config.devices_file
-    
-    def load_devices(self) -> List[Device]:
-        """Load devices from JSON file"""
-        if os.path.exists(self.devices_file):
+        self.store = store or create_device_store()
+        self._lock = file_lock(getattr(self.store, 'path', self.devices_file))
+        self._devices: Dict[str, Device] = {}
+        self._by_mac: Dict[str, str] = {}
+        self._store_signature: Optional[Hashable] = None
+        self._loaded = False
+        self._dirty = False
+        self._changed: Set[str] = set()
+        self._deleted: Set[str] = set()
+        self.cluster = cluster
+        self._flush_timer: Optional[threading.Timer] = None
+        self._retry_delay = 0.0
+        self._versions = ChangeTracker()
+        self._device_index: Optional[Tuple[int, DeviceIndex]] = None  # (version, index)
+        _instances.add(self)
+
+    def _index(self, devices: List[Device]) -> None:
+        """Rebuild the in-memory indexes from a device list"""
+        devices_by_id = {str(d['id']): d for d in devices}
+        self._versions.remove(device_id for device_id in self._devices if device_id not in devices_by_id)
+        self._versions.touch(device_id for device_id, d in devices_by_id.items()
+                             if self._devices.get(device_id) != d)
+        self._devices = devices_by_id
+        self._by_mac = {d['mac'].upper(): device_id for device_id, d in self._devices.items()}
+
+    def _refresh(self) -> None:
+        """Reload the devices if the store changed since it was last read"""
+        if self._dirty:
+            # Unflushed in-memory changes are newer than anything on disk
+            return
+        signature = self.store.signature()
+        if self._loaded and signature == self._store_signature:
+            return
+        started = time.perf_counter()
+        devices = self.store.load()
+        STORAGE_SECONDS.labels('load').observe(time.perf_counter() - started)
+        self._index(devices)
+        self._store_signature = signature
+        self._loaded = True
+
+    def _persist(self, changed: Set[str] = frozenset(), deleted: Set[str] = frozenset()) -> None:
+        """Mark the store dirty and schedule a coalesced flush"""
+        self._dirty = True
+        self._changed |= changed
+        self._changed -= deleted
+        self._deleted |= deleted
+        delay = config.flush_delay_ms / 1000 if self.cluster is None else 0
+        if delay <= 0:
+            self.flush()
+        elif self._flush_timer is None:
+            self._schedule_flush(delay)
+
+    def _schedule_flush(self, delay: float) -> None:
+        self._flush_timer = threading.Timer(delay, self.flush)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def flush(self) -> None:
+        """Write pending changes to the store now"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            started = time.perf_counter()
+            previous = self._store_signature
             try:
-                with open(self.devices_file, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                return []
-        return []
-    
+                merged, signature = self.store.write(list(self._devices.values()), self._changed, self._deleted)
+            except Exception as e:
+                # Keep the changes pending and try again later
+                self._retry_delay = min(self._retry_delay * 2 or FLUSH_RETRY_SECONDS, FLUSH_RETRY_MAX_SECONDS)
+                print(f"Error: failed to save devices, retrying in {self._retry_delay:g}s: {e}")
+                self._schedule_flush(self._retry_delay)
+                return
+            STORAGE_SECONDS.labels('write').observe(time.perf_counter() - started)
+            self._retry_delay = 0.0
+            if self.cluster is not None:
+                self.cluster.state.record_device_changes(self._changed, self._deleted)
+            self._dirty = False
+            self._changed = set()
+            self._deleted = set()
+            if merged is not None:
+                # Pick up devices other processes stored since our last load
+                self._index(merged)
+                self._store_signature = signature
+            elif signature != previous:
+                # Another writer committed since our last load (an SQLite
+                # commit of our own leaves the signature unchanged): reload
+                # on the next read instead of taking its version as ours
+                self._store_signature = None
+
+    def load_devices(self) -> List[Device]:
+        """Load all devices"""
+        with self._lock:
+            self._refresh()
+            return [dict(d) for d in self._devices.values()]  # type: ignore
+
+    def get_version(self) -> int:
+        """Current version of the device list"""
+        if self.cluster is not None:
+            return self.cluster.state.device_version()
+        with self._lock:
+            self._refresh()
+            return self._versions.version
+
+    def get_changes_since(self, since: int) -> Tuple[int, Optional[List[Device]], List[str]]:
+        """Get (version, changed devices, deleted IDs) since a version.
+        Changed devices is None when since is too old for a delta."""
+        if self.cluster is not None:
+            # Read the version before the devices, which can only be newer
+            version, changes = self.cluster.state.device_changes_since(since)
+        with self._lock:
+            self._refresh()
+            if self.cluster is None:
+                version, changes = self._versions.changes_since(since)
+            if changes is None:
+                return version, None, []
+            changed, deleted = changes
+            return version, [dict(self._devices[i]) for i in changed if i in self._devices], deleted  # type: ignore
+
+    def query_devices(self, name: Optional[str] = None, subnet: Optional[str] = None,
+                      predicate: Optional[Callable[[str], bool]] = None, sort: Optional[str] = None,
+                      descending: bool = False, offset: int = 0, limit: int = 50) -> Tuple[int, List[Device]]:
+        """Get (number of matches, one page of devices) for a filtered and sorted query.
+
+        name matches a substring of the name, ignoring case; subnet is a CIDR
+        such as 192.168.1.0/24; predicate receives device IDs. sort is one of
+        core.device_index.SORT_KEYS, or None for inventory order. Raises
+        ValueError for an invalid subnet or sort key.
+        """
+        network = ipaddress.ip_network(subnet, strict=False) if subnet else None
+        with self._lock:
+            self._refresh()
+            version = self._versions.version
+            if self._device_index is None or self._device_index[0] != version:
+                self._device_index = (version, DeviceIndex(self._devices))
+            total, ids = self._device_index[1].select(network, name, predicate, sort, descending,
+                                                      max(0, offset), max(0, limit))
+            return total, [dict(self._devices[i]) for i in ids]  # type: ignore
+
     def save_devices(self, devices: List[Device]) -> None:
-        """Save devices to JSON file"""
-        with open(self.devices_file, 'w') as f:
-            json.dump(devices, f, indent=2)
-    
+        """Replace all devices and save them immediately"""
+        with self._lock:
+            self._refresh()
+            previous = set(self._devices)
+            self._index([dict(d) for d in devices])  # type: ignore
+            self._loaded = True
+            self._dirty = True
+            self._changed = set(self._devices)
+            self._deleted = previous - self._changed
+            self.flush()
+
     def get_device_by_id(self, device_id: str) -> Device | None:
         """Get a device by its ID"""
-        devices = self.load_devices()
-        return next((d for d in devices if str(d['id']) == device_id), None)
-    
+        with self._lock:
+            self._refresh()
+            device = self._devices.get(str(device_id))
+            return dict(device) if device else None  # type: ignore
+
+    def get_device_by_mac(self, mac: str) -> Device | None:
+        """Get a device by its MAC address"""
+        with self._lock:
+            self._refresh()
+            device_id = self._by_mac.get(mac.upper())
+            return dict(self._devices[device_id]) if device_id else None  # type: ignore
+
     def add_device(self, device: Device) -> None:
         """Add a new device"""
-        devices = self.load_devices()
-        devices.append(device)
-        self.save_devices(devices)
-    
+        with self._lock:
+            self._refresh()
+            device = dict(device)  # type: ignore
+            self._devices[str(device['id'])] = device
+            self._by_mac[device['mac'].upper()] = str(device['id'])
+            self._versions.touch([str(device['id'])])
+            self._persist(changed={str(device['id'])})
+
+    def add_devices(self, devices: List[Device], dry_run: bool = False) -> List[Device]:
+        """Add many devices with a single persisted write, skipping any whose MAC
+        is already known (or repeated in the batch). Returns the devices added,
+        or with dry_run the devices that would be added without changing anything."""
+        with self._lock:
+            self._refresh()
+            added: List[Device] = []
+            seen: Set[str] = set()
+            for device in devices:
+                mac = device['mac'].upper()
+                if mac in self._by_mac or mac in seen:
+                    continue
+                seen.add(mac)
+                added.append(dict(device))  # type: ignore
+            if dry_run or not added:
+                return added
+            for device in added:
+                self._devices[str(device['id'])] = device
+                self._by_mac[device['mac'].upper()] = str(device['id'])
+            changed = {str(d['id']) for d in added}
+            self._versions.touch(changed)
+            self._persist(changed=changed)
+            return [dict(d) for d in added]  # type: ignore
+
     def delete_device(self, device_id: str) -> bool:
         """Delete a device by ID. Returns True if device was found and deleted."""
-        devices = self.load_devices()
-        original_length = len(devices)
-        devices = [d for d in devices if d['id'] != device_id]
-        
-        if len(devices) < original_length:
-            self.save_devices(devices)
+        with self._lock:
+            self._refresh()
+            device = self._devices.pop(str(device_id), None)
+            if device is None:
+                return False
+            if self._by_mac.get(device['mac'].upper()) == str(device_id):
+                del self._by_mac[device['mac'].upper()]
+            self._versions.remove([str(device_id)])
+            self._persist(deleted={str(device_id)})
             return True
-        return False
-    
+
     def update_device(self, device_id: str, updates: Dict[str, Any]) -> bool:
         """Update a device. Returns True if device was found and updated."""
-        devices = self.load_devices()
-        
-        for device in devices:
-            if str(device['id']) == device_id:
-                for key, value in updates.items():
-                    if key in device:
-                        device[key] = value  # type: ignore
-                self.save_devices(devices)
-                return True
-        return False
+        with self._lock:
+            self._refresh()
+            device = self._devices.get(str(device_id))
+            if device is None:
+                return False
+
+            self._apply_updates(str(device_id), device, updates)
+            self._versions.touch([str(device_id)])
+            self._persist(changed={str(device_id)})
+            return True
+
+    def update_devices(self, updates_by_id: Dict[str, Dict[str, Any]]) -> int:
+        """Update many devices with a single persisted write. Returns the number updated."""
+        with self._lock:
+            self._refresh()
+            changed = set()
+            for device_id, updates in updates_by_id.items():
+                device = self._devices.get(str(device_id))
+                if device is not None:
+                    self._apply_updates(str(device_id), device, updates)
+                    changed.add(str(device_id))
+            if changed:
+                self._versions.touch(changed)
+                self._persist(changed=changed)
+            return len(changed)
+
+    def _apply_updates(self, device_id: str, device: Device, updates: Dict[str, Any]) -> None:
+        """Apply known fields to a cached device and keep the MAC index in sync"""
+        old_mac = device['mac'].upper()
+        for key, value in updates.items():
+            if key in device or key in Device.__annotations__:
+                device[key] = value  # type: ignore
+        if device['mac'].upper() != old_mac:
+            if self._by_mac.get(old_mac) == device_id:
+                del self._by_mac[old_mac]
+            self._by_mac[device['mac'].upper()] = device_id
+
+    def record_wake_event(self, device_id: str, timestamp: str, success: bool, message: str) -> None:
+        """Append a wake attempt to the store's event log"""
+        self.store.record_wake(str(device_id), timestamp, success, message)
+
+    def record_wake_events(self, events: List[tuple]) -> None:
+        """Append many (device_id, timestamp, success, message) wake attempts in one write"""
+        self.store.record_wakes(events)
+
+    def record_status_change(self, device_id: str, timestamp: str, status: str) -> None:
+        """Append a status transition to the store's history"""
+        self.store.record_status(str(device_id), timestamp, status)
+
+    def get_device_events(self, device_id: str, limit: int = 100) -> Dict[str, List[Dict[str, Any]]]:
+        """Get recent wake events and status transitions for a device"""
+        return {
+            'wake_events': self.store.get_wake_events(str(device_id), limit),
+            'status_history': self.store.get_status_history(str(device_id), limit)
+        }
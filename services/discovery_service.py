@@ -1,112 +1,516 @@
 """Service for network discovery functionality."""
 
 import re
-import subprocess
 import threading
 import time
 import ipaddress
-from typing import List, Optional, Dict, Any
-from core.models import DiscoveredDevice
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Set, Tuple, Union, TYPE_CHECKING
+from core.models import Device, DiscoveredDevice, DiscoveredHost
 from core.config import config
+from core.neighbors import neighbor_table_available, read_arp_table, read_neighbor_table, solicit_ipv6_neighbors
+from core.probe_engine import DISCOVERY, probe_engine
+from core.arp_scanner import ArpScanner, arp_socket_available
+from core.ratelimit import RateLimiter
+from core.storage import DiscoveryStore
+from core.discovery_store import DiscoveryResultStore
+from core.hostnames import HostnameResolver
+from core.events import event_bus
+from core.metrics import DISCOVERY_ADDRESSES, DISCOVERY_HOSTS, DISCOVERY_SCAN_SECONDS
+from services.cluster_service import on_leader
+
+if TYPE_CHECKING:
+    from services.cluster_service import ClusterService
+    from services.device_service import DeviceService
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+# Addresses handed to a discovery worker at a time
+SHARD_SIZE = 256
+# arping runs one process per address, so its shards stay small
+ARPING_SHARD_SIZE = 20
+# Minimum seconds between writes of the discovery state during a scan
+SAVE_INTERVAL_SECONDS = 2
+
+DISCOVERY_MODES = ('auto', 'full', 'resume', 'refresh')
 
 
 class DiscoveryService:
-    """Service class for network device discovery."""
+    """Service class for network device discovery.
+
+    Depending on ``network.discovery_mode``, hosts already present in the
+    kernel neighbor table are reported straight away and only the remaining
+    addresses are actively probed: by a raw-socket ARP sweep when the process
+    has CAP_NET_RAW, otherwise by ICMP probes or ``arping`` subprocesses.
+    Addresses are generated lazily and scanned in shards by a bounded worker
+    pool, with each subnet paced by its own rate limiter. ICMP and arping
+    probes run on the shared probe engine under its discovery budget, so a
+    scan cannot crowd out status monitoring.
+
+    Discovered hosts are kept in a table keyed by MAC with first/last seen
+    times, persisted with the scan cursor to ``paths.discovery_file``. A scan
+    can be started as ``full`` (sweep everything), ``resume`` (continue an
+    interrupted sweep from its cursor), ``refresh`` (re-probe only hosts not
+    seen for ``network.discovery_stale_seconds``) or ``auto`` (resume if an
+    interrupted sweep of the same networks exists, otherwise full).
+
+    Each host's ``already_imported`` flag follows the inventory incrementally,
+    using the device service's change versions. With ``network.resolve_hostnames``
+    new hosts are handed to a background resolver, so name lookups never hold
+    up the sweep; names are added to the table as they arrive.
+
+    In a multi-worker deployment scans run in the leader process and the
+    other workers forward every call to it.
+    """
     
-    def __init__(self):
+    def __init__(self, device_service: Optional['DeviceService'] = None,
+                 store: Optional[DiscoveryStore] = None,
+                 resolver: Optional[HostnameResolver] = None,
+                 cluster: Optional['ClusterService'] = None):
+        self.device_service = device_service
+        self.cluster = cluster
+        self.resolver = resolver or (HostnameResolver() if config.resolve_hostnames else None)
         self.discovery_active: bool = False
-        self.discovery_results: List[DiscoveredDevice] = []
         self.discovery_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()  # guards starting a scan
+        self.store = store or DiscoveryStore()
+        state = self.store.load()
+        self.results = DiscoveryResultStore(state['hosts'])
+        self._device_version: Optional[int] = None
+        self._sync_lock = threading.Lock()
+        self._scan: Optional[Dict[str, Any]] = state['scan']
+        self._completed: Dict[str, Dict[int, int]] = {}  # network -> shard start -> end
+        self._awaiting_replies: List[Tuple[float, str, int, int]] = []  # (deadline, network, start, end)
+        self._last_save = 0.0
+        self._mode: Optional[str] = None
+        self._progress: Dict[str, Dict[str, Any]] = {}
+        self._progress_lock = threading.Lock()
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
     
-    def start_discovery(self) -> bool:
+    @on_leader
+    def start_discovery(self, mode: str = 'auto') -> bool:
         """Start network device discovery. Returns True if started successfully."""
-        if self.discovery_active:
-            return False
-        
-        # Start discovery in background thread
-        self.discovery_thread = threading.Thread(target=self._network_discovery_worker, daemon=True)
-        self.discovery_thread.start()
+        if mode not in DISCOVERY_MODES:
+            raise ValueError(f"Unknown discovery mode '{mode}'")
+        with self._lock:
+            if self.discovery_active:
+                return False
+            self.discovery_active = True
+            
+            # Start discovery in background thread
+            self.discovery_thread = threading.Thread(target=self._network_discovery_worker, args=(mode,), daemon=True)
+            self.discovery_thread.start()
         return True
     
+    @on_leader
     def stop_discovery(self) -> None:
         """Stop network device discovery."""
         self.discovery_active = False
+        self._publish_state()
     
-    def get_discovery_status(self) -> Dict[str, Any]:
-        """Get current discovery status and results."""
+    @on_leader
+    def get_discovery_status(self, vendor: Optional[str] = None) -> Dict[str, Any]:
+        """Get current discovery status and results, optionally only the hosts
+        whose vendor name contains a string (case-insensitive)."""
+        self._sync_imported()
+        hosts = self.results.list()
+        if vendor:
+            hosts = [host for host in hosts if self._vendor_matches(host, vendor.lower())]
+        scan = self._scan
         return {
             'active': self.discovery_active,
-            'count': len(self.discovery_results),
-            'devices': self.discovery_results.copy()
+            'mode': self._mode,
+            'count': len(hosts),
+            'devices': hosts,
+            'progress': self._get_progress(),
+            'resumable': bool(scan and not scan.get('finished'))
         }
     
+    @on_leader
+    def get_host(self, mac: str) -> Optional[DiscoveredHost]:
+        """Get a discovered host by MAC address."""
+        self._sync_imported()
+        return self.results.get(mac)
+    
+    @on_leader
+    def get_pending_hosts(self) -> List[DiscoveredHost]:
+        """Get discovered hosts that are not in the inventory yet."""
+        self._sync_imported()
+        return self.results.list(pending_only=True)
+    
+    @on_leader
+    def select_hosts(self, subnets: Iterable[str] = (), vendor: Optional[str] = None,
+                     mac_prefix: Optional[str] = None) -> List[DiscoveredHost]:
+        """Get hosts not in the inventory yet, optionally limited to subnets, a
+        vendor name (case-insensitive substring) and/or a MAC prefix.
+        Raises ValueError for an invalid subnet."""
+        networks = [ipaddress.ip_network(cidr, strict=False) for cidr in subnets]
+        prefix = re.sub(r'[^0-9A-F]', '', mac_prefix.upper()) if mac_prefix else ''
+        vendor = vendor.lower() if vendor else None
+        selected = []
+        for host in self.get_pending_hosts():
+            if prefix and not host['mac'].replace(':', '').startswith(prefix):
+                continue
+            if vendor and not self._vendor_matches(host, vendor):
+                continue
+            if networks:
+                try:
+                    address = ipaddress.ip_address(host['ip'])
+                except ValueError:
+                    continue
+                if not any(address.version == n.version and address in n for n in networks):
+                    continue
+            selected.append(host)
+        return selected
+    
+    @on_leader
+    def mark_imported(self, devices: List[Device]) -> None:
+        """Flag hosts as imported right after devices were added for them."""
+        self.results.apply_device_changes(devices, [])
+    
+    @on_leader
     def clear_results(self) -> None:
         """Clear discovery results."""
-        self.discovery_results.clear()
+        self.results.clear()
+        self._scan = None
+        self._save(force=True)
+    
+    @staticmethod
+    def _vendor_matches(host: DiscoveredHost, vendor: str) -> bool:
+        return vendor in (host.get('vendor') or '').lower()
     
-    def _discover_device_by_ip(self, ip: str) -> Optional[DiscoveredDevice]:
-        """Discover a single device by IP address using arping to find MAC address"""
+    @staticmethod
+    def _ip_sort_key(ip: str) -> Tuple[int, int]:
         try:
-            arping_result = subprocess.run([config.arping_command, '-c', '1', '-w', '1', ip], 
-                                         capture_output=True, text=True, timeout=3)
-            
-            if arping_result.returncode == 0 and arping_result.stdout:
-                mac_match = re.search(r'([0-9a-fA-F]{2}[:-]){5}[0-9a-fA-F]{2}', arping_result.stdout)
-                if mac_match:
-                    mac = mac_match.group(0).upper().replace('-', ':')
-                    return {
-                        'mac': mac,
-                        'ip': ip
-                    }
-            
-            return None
-            
-        except FileNotFoundError:
-            print(f"Error: 'arping' command not found at {config.arping_command}. Please install arping utility or update the arping_command path in config.json.")
+            address = ipaddress.ip_address(ip)
+            return address.version, int(address)
+        except ValueError:
+            return 0, 0
+    
+    def _publish_state(self) -> None:
+        """Push the discovery state to event stream subscribers."""
+        event_bus.publish('discovery', {
+            'active': self.discovery_active,
+            'count': len(self.results),
+            'progress': self._get_progress()
+        })
+    
+    def _add_result(self, device: DiscoveredDevice) -> None:
+        """Record a discovered device in the host table. Event stream subscribers
+        are sent the host when it is new or its address changed."""
+        DISCOVERY_HOSTS.inc()
+        host, changed = self.results.upsert(device['mac'], device['ip'], datetime.now().isoformat())
+        if changed:
+            self._publish_host(host)
+        if self.resolver is not None and (changed or not host.get('hostname')):
+            mac = host['mac']
+            self.resolver.submit(host['ip'], lambda ip, name: self._set_hostname(mac, ip, name))
+    
+    def _set_hostname(self, mac: str, ip: str, hostname: Optional[str]) -> None:
+        """Resolver callback: store a resolved name and publish the host"""
+        host = self.results.set_hostname(mac, ip, hostname) if hostname else None
+        if host is not None:
+            self._publish_host(host)
+        if host is not None or not self.resolver.pending():
+            # The last lookup after a scan flushes names that a throttled save skipped
+            self._save(force=not self.discovery_active and not self.resolver.pending())
+    
+    def _publish_host(self, host: DiscoveredHost) -> None:
+        event_bus.publish('discovery', {
+            'active': self.discovery_active,
+            'count': len(self.results),
+            'device': host
+        })
+    
+    def _sync_imported(self) -> None:
+        """Bring already_imported flags up to date with inventory changes"""
+        if self.device_service is None:
+            return
+        with self._sync_lock:
+            if self._device_version is None:
+                version = self.device_service.get_version()
+                self.results.reset_devices(self.device_service.load_devices())
+            else:
+                version, changed, deleted = self.device_service.get_changes_since(self._device_version)
+                if version == self._device_version:
+                    return
+                if changed is None:
+                    self.results.reset_devices(self.device_service.load_devices())
+                else:
+                    self.results.apply_device_changes(changed, deleted)
+            self._device_version = version
+    
+    def _save(self, force: bool = False) -> None:
+        """Persist the host table and scan cursor, at most every SAVE_INTERVAL_SECONDS"""
+        now = time.monotonic()
+        if not force and now - self._last_save < SAVE_INTERVAL_SECONDS:
+            return
+        self._last_save = now
+        try:
+            self.store.save(self.results.snapshot(), self._scan)
+        except OSError as e:
+            print(f"Error: failed to save discovery state: {e}")
+    
+    def _discover_batch_native(self, ips: List[str], limiter: RateLimiter) -> List[DiscoveredDevice]:
+        """Discover a batch of IPs in-process: one multiplexed probe sweep makes the
+        kernel resolve every live neighbor, then MACs are read from the ARP table"""
+        probe_engine.ping_many(ips, 1, DISCOVERY, limiter=limiter).result()
+        arp_table = read_arp_table()
+        return [{'mac': arp_table[ip], 'ip': ip} for ip in ips if ip in arp_table]
+    
+    def _discover_batch_arping(self, ips: List[str], limiter: RateLimiter) -> List[DiscoveredDevice]:
+        """Discover a batch of IPs with one arping process per address, run by the probe engine"""
+        macs = probe_engine.arping_many(ips, DISCOVERY, limiter=limiter,
+                                        should_continue=lambda: self.discovery_active).result()
+        return [{'mac': mac, 'ip': ip} for ip, mac in macs.items() if mac]
+    
+    def _harvest_neighbors(self, networks: List[Network]) -> List[DiscoveredDevice]:
+        """Read already-resolved hosts in the networks from the kernel neighbor table"""
+        found = []
+        for ip, mac in read_neighbor_table().items():
+            address = ipaddress.ip_address(ip)
+            if any(address.version == n.version and address in n for n in networks):
+                found.append((address.version, address, {'mac': mac, 'ip': ip}))
+        return [device for _, _, device in sorted(found, key=lambda item: item[:2])]
+    
+    @staticmethod
+    def _parse_networks() -> List[Network]:
+        networks = []
+        for cidr in config.discovery_networks:
+            try:
+                networks.append(ipaddress.ip_network(cidr, strict=False))
+            except ValueError:
+                print(f"Warning: ignoring invalid discovery network '{cidr}'")
+        return networks
+    
+    @staticmethod
+    def _host_count(network: ipaddress.IPv4Network) -> int:
+        """Number of addresses network.hosts() yields"""
+        return network.num_addresses - 2 if network.prefixlen < 31 else network.num_addresses
+    
+    @staticmethod
+    def _shards(addresses: Iterable[str], start: int, size: int,
+                resolved: Set[str]) -> Iterator[Tuple[int, int, List[str]]]:
+        """Lazily cut addresses into (start, end, shard) chunks of size positions,
+        leaving out resolved addresses. Positions count from start."""
+        iterator = iter(addresses)
+        while True:
+            chunk = list(islice(iterator, size))
+            if not chunk:
+                return
+            yield start, start + len(chunk), [ip for ip in chunk if ip not in resolved]
+            start += len(chunk)
+    
+    def _advance(self, network: str, start: int, end: int, reply_deadline: Optional[float] = None) -> None:
+        """Record a finished shard for progress reporting and the scan cursor.
+        With a reply_deadline the requests are sent but replies still arrive,
+        so the cursor only moves past the shard once the deadline passed."""
+        DISCOVERY_ADDRESSES.inc(end - start)
+        with self._progress_lock:
+            if network in self._progress:
+                self._progress[network]['scanned'] += end - start
+            if reply_deadline is not None:
+                self._awaiting_replies.append((reply_deadline, network, start, end))
+                return
+            self._move_cursor(network, start, end)
+    
+    def _advance_answered(self) -> None:
+        """Move the scan cursor past ARP shards whose reply deadline has passed"""
+        now = time.monotonic()
+        with self._progress_lock:
+            waiting = []
+            for deadline, network, start, end in self._awaiting_replies:
+                if deadline <= now:
+                    self._move_cursor(network, start, end)
+                else:
+                    waiting.append((deadline, network, start, end))
+            self._awaiting_replies = waiting
+    
+    def _move_cursor(self, network: str, start: int, end: int) -> None:
+        """Mark a shard finished in the scan cursor; called with _progress_lock held"""
+        scan = self._scan
+        if scan is None or self._mode == 'refresh' or network not in scan['cursors']:
+            return
+        # The cursor only moves past a contiguous run of finished shards
+        completed = self._completed.setdefault(network, {})
+        completed[start] = end
+        cursor = scan['cursors'][network]
+        while cursor in completed:
+            cursor = completed.pop(cursor)
+        scan['cursors'][network] = cursor
+    
+    def _get_progress(self) -> Dict[str, Any]:
+        with self._progress_lock:
+            subnets = [dict(p) for p in self._progress.values()]
+        scanned = sum(p['scanned'] for p in subnets)
+        total = sum(p['total'] for p in subnets)
+        elapsed = ((self._finished or time.monotonic()) - self._started) if self._started else 0.0
+        eta = None
+        if self.discovery_active and 0 < scanned < total:
+            eta = round(elapsed / scanned * (total - scanned), 1)
+        return {
+            'scanned': scanned,
+            'total': total,
+            'percent': round(100.0 * scanned / total, 1) if total else 0.0,
+            'elapsed_seconds': round(elapsed, 1),
+            'eta_seconds': eta,
+            'subnets': subnets
+        }
+    
+    def _start_scanner(self, network: ipaddress.IPv4Network, limiter: RateLimiter) -> Optional[ArpScanner]:
+        """Open the ARP scanner for a subnet, or None to use the fallback method"""
+        scanner = ArpScanner.for_network(network, limiter)
+        if scanner is None:
             return None
-        except (subprocess.TimeoutExpired, subprocess.CalledProcessError, Exception):
+        try:
+            scanner.start(on_reply=lambda ip, mac: self._add_result({'mac': mac, 'ip': ip}))
+        except OSError as e:
+            print(f"ARP scan of {network} unavailable: {e}")
             return None
+        return scanner
+    
+    def _scan_shard(self, network: ipaddress.IPv4Network, start: int, end: int, shard: List[str],
+                    method: str, limiter: RateLimiter, scanner: Optional[ArpScanner]) -> None:
+        """Probe one shard of addresses with the selected method"""
+        reply_deadline = None
+        try:
+            if not self.discovery_active or not shard:
+                return
+            # Once per shard rather than per reply keeps inventory checks off the hot path
+            self._sync_imported()
+            if method == 'arp' and scanner is not None:
+                # Only the requests: the subnet's scanner collects every reply
+                scanner.send(shard, should_continue=lambda: self.discovery_active)
+                reply_deadline = time.monotonic() + scanner.timeout
+            else:
+                discover = self._discover_batch_native if method == 'icmp' else self._discover_batch_arping
+                for device in discover(shard, limiter):
+                    self._add_result(device)
+        except Exception as e:
+            print(f"Network discovery error in {network}: {e}")
+        finally:
+            # An interrupted shard is not finished and will be rescanned on resume
+            if self.discovery_active:
+                self._advance(str(network), start, end, reply_deadline)
+            self._advance_answered()
+            self._save()
+            self._publish_state()
+    
+    def _plan(self, mode: str, networks: List[ipaddress.IPv4Network]) -> Dict[str, Tuple[Iterable[str], int, int]]:
+        """Decide what to scan per network: (addresses, start position, total)"""
+        if mode == 'refresh':
+            cutoff = (datetime.now() - timedelta(seconds=config.discovery_stale_seconds)).isoformat()
+            stale = sorted(self.results.stale(cutoff), key=self._ip_sort_key)
+            plan = {}
+            for network in networks:
+                targets = [ip for ip in stale
+                           if ipaddress.ip_address(ip).version == 4 and ipaddress.ip_address(ip) in network]
+                plan[str(network)] = (targets, 0, len(targets))
+            return plan
+        
+        names = [str(n) for n in networks]
+        scan = self._scan
+        resumable = scan is not None and not scan.get('finished') and scan.get('networks') == names
+        if not (resumable and mode in ('resume', 'auto')):
+            scan = {'networks': names, 'cursors': {name: 0 for name in names},
+                    'started_at': datetime.now().isoformat(), 'finished': False}
+        with self._progress_lock:
+            self._scan = scan
+            self._completed = {}
+            self._awaiting_replies = []
+        plan = {}
+        for network in networks:
+            cursor = scan['cursors'].get(str(network), 0)
+            hosts = (str(ip) for ip in islice(network.hosts(), cursor, None))
+            plan[str(network)] = (hosts, cursor, self._host_count(network))
+        return plan
     
-    def _network_discovery_worker(self) -> None:
-        """Background worker for network discovery"""
-        self.discovery_active = True
-        self.discovery_results.clear()
+    def _network_discovery_worker(self, mode: str = 'auto') -> None:
+        """Background worker for network discovery, started with discovery_active set"""
+        self._mode = mode
+        self._started = time.monotonic()
+        self._finished = None
+        with self._progress_lock:
+            self._progress = {}
+        self._publish_state()
         
+        completed = False
+        scanners: List[ArpScanner] = []
         try:
-            network_obj = ipaddress.IPv4Network(config.local_network, strict=False)
-            ips_to_scan = [str(ip) for ip in network_obj.hosts()]
+            networks = self._parse_networks()
+            ipv4_networks = [n for n in networks if n.version == 4]
+            ipv6_networks = [n for n in networks if n.version == 6]
+            discovery_mode = config.discovery_mode
+            # A passive harvest sweeps nothing, so it leaves the saved sweep and its cursors alone
+            plan = self._plan(mode, ipv4_networks) if discovery_mode != 'passive' else {}
+            with self._progress_lock:
+                self._progress = {name: {'network': name, 'scanned': start, 'total': total}
+                                  for name, (_, start, total) in plan.items()}
             
-            # Use threading to scan multiple IPs concurrently
-            def scan_ip(ip: str) -> None:
-                device = self._discover_device_by_ip(ip)
-                if device:
-                    self.discovery_results.append(device)
+            # IPv6 ranges are too large to sweep: ask every on-link node to
+            # answer a multicast ping, then read who landed in the neighbor table
+            if ipv6_networks and discovery_mode != 'passive':
+                solicit_ipv6_neighbors()
             
-            # Scan in batches to avoid overwhelming the network
-            batch_size = 20
+            # Hosts the kernel already resolved need no probing
+            resolved: Set[str] = set()
+            self._sync_imported()
+            if neighbor_table_available():
+                harvest = networks if discovery_mode in ('passive', 'hybrid') else ipv6_networks
+                for device in self._harvest_neighbors(harvest):
+                    resolved.add(device['ip'])
+                    self._add_result(device)
+            if discovery_mode == 'passive':
+                return
             
-            for i in range(0, len(ips_to_scan), batch_size):
-                batch = ips_to_scan[i:i + batch_size]
-                batch_threads: List[threading.Thread] = []
-
-                for ip in batch:
-                    if not self.discovery_active: 
+            # Preferred: raw ARP sweeps; otherwise ICMP plus the ARP table, or arping
+            fallback = 'icmp' if config.probe_backend == 'native' and neighbor_table_available() else 'arping'
+            use_arp = config.probe_backend == 'native' and arp_socket_available()
+            
+            workers = max(1, config.discovery_workers)
+            pending: Set[Future] = set()
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='discovery') as pool:
+                for network in ipv4_networks:
+                    if not self.discovery_active:
                         break
-                        
-                    thread = threading.Thread(target=scan_ip, args=(ip,))
-                    thread.start()
-                    batch_threads.append(thread)
-                
-                for thread in batch_threads:
-                    thread.join(timeout=5)  
-                
-                if not self.discovery_active:
-                    break
-                    
-                time.sleep(0.1)
+                    addresses, start, _ = plan[str(network)]
+                    limiter = RateLimiter(config.scan_rate_per_subnet)
+                    scanner = self._start_scanner(network, limiter) if use_arp else None
+                    if scanner is not None:
+                        scanners.append(scanner)
+                    method = 'arp' if scanner is not None else fallback
+                    size = ARPING_SHARD_SIZE if method == 'arping' else SHARD_SIZE
+                    for shard_start, shard_end, shard in self._shards(addresses, start, size, resolved):
+                        if not self.discovery_active:
+                            break
+                        # Keep the backlog bounded so shards are generated lazily
+                        while len(pending) >= workers * 2:
+                            _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        pending.add(pool.submit(self._scan_shard, network, shard_start, shard_end,
+                                                shard, method, limiter, scanner))
+                wait(pending)
+                # One final wait for the ARP replies of every subnet; the
+                # deadlines run from each subnet's last request, so they overlap
+                for scanner in scanners:
+                    scanner.finish(should_continue=lambda: self.discovery_active)
+            completed = self.discovery_active
+            self._advance_answered()
         
         except Exception as e:
             print(f"Network discovery error: {e}")
         
         finally:
+            # Shards whose replies are still due are rescanned on resume
+            self._advance_answered()
+            for scanner in scanners:
+                scanner.finish(should_continue=lambda: False)  # closes any scanner left open by an error
+            if completed and self._scan is not None and mode != 'refresh':
+                self._scan['finished'] = True
             self.discovery_active = False
+            self._finished = time.monotonic()
+            DISCOVERY_SCAN_SECONDS.observe(self._finished - self._started)
+            self._save(force=True)
+            self._publish_state()
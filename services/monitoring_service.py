@@ -1,51 +1,359 @@
 """Service for monitoring device status."""
 
+import heapq
+import itertools
+import math
+import random
 import threading
 import time
-from typing import Dict
+from datetime import datetime
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional, Tuple, TYPE_CHECKING
 from core.models import DeviceStatus
+from services.cluster_service import on_leader
 from services.device_service import DeviceService
-from core.utils import ping_device
 from core.config import config
+from core.events import event_bus
+from core.history import StatusHistory
+from core.metrics import MONITORING_BATCH_SECONDS, PROBE_RTT_SECONDS
+from core.probe_engine import MONITORING, probe_engine
+from core.versions import ChangeTracker
+
+if TYPE_CHECKING:
+    from core.shared_state import SharedState
+    from services.cluster_service import ClusterService
+
+# How often the schedule is reconciled with the device inventory
+SYNC_INTERVAL_SECONDS = 5
+# Shortest base interval a device can be probed at
+MIN_INTERVAL_SECONDS = 1.0
 
 
 class MonitoringService:
-    """Service class for monitoring device status."""
-    
-    def __init__(self, device_service: DeviceService):
+    """Service class for monitoring device status.
+
+    Each device is probed on its own schedule, kept in a priority queue keyed
+    on next-due time. A device's base interval is its ``monitor_interval`` or
+    ``monitoring.interval_seconds``; hosts that stay offline back off
+    exponentially up to ``max_interval_seconds``, a state change triggers a
+    quick recheck after ``recheck_seconds``, and every interval is jittered so
+    probes spread out instead of arriving in bursts.
+
+    Due devices are handed to the shared probe engine under its monitoring
+    budget; results come back to the monitoring thread, which applies them,
+    so the thread never blocks on a probe. Every result, with its round-trip
+    time, is added to a per-device ``StatusHistory`` for uptime analytics.
+
+    In a multi-worker deployment only the leader process monitors; statuses
+    are read from the shared state in every process, and history and
+    scheduler metrics are answered by the leader.
+    """
+
+    def __init__(self, device_service: DeviceService, cluster: Optional['ClusterService'] = None):
         self.device_service = device_service
+        self.cluster = cluster
         self.device_status: Dict[str, DeviceStatus] = {}
+        self.history = StatusHistory()
+        self._versions = ChangeTracker()
+        self._published_version: Optional[int] = None
         self._monitoring_thread: threading.Thread | None = None
-        self._stop_monitoring = False
-    
+        self._stop_event = threading.Event()
+
+        # Scheduler state, guarded by _cond
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[float, int, str]] = []
+        self._counter = itertools.count()
+        self._due: Dict[str, float] = {}
+        self._targets: Dict[str, Tuple[str, float]] = {}  # device_id -> (ip, base interval)
+        self._in_flight: set = set()
+        self._offline_streak: Dict[str, int] = {}
+        self._results: List[Tuple[str, Optional[float]]] = []  # (device_id, rtt) from the engine
+
+        # Scheduler metrics
+        self.probes_total = 0
+        self.lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
     def start_monitoring(self) -> None:
         """Start the device monitoring thread."""
         if self._monitoring_thread is None or not self._monitoring_thread.is_alive():
-            self._stop_monitoring = False
+            self._stop_event.clear()
             self._monitoring_thread = threading.Thread(target=self._monitor_devices, daemon=True)
             self._monitoring_thread.start()
-    
+
     def stop_monitoring(self) -> None:
         """Stop the device monitoring thread."""
-        self._stop_monitoring = True
-    
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify()
+        self.history.flush()
+
     def get_device_status(self, device_id: str) -> DeviceStatus:
         """Get the status of a specific device."""
+        if self.cluster is not None:
+            status = self.cluster.state.get_status(device_id)
+            return DeviceStatus(status) if status else DeviceStatus.UNKNOWN
         return self.device_status.get(device_id, DeviceStatus.UNKNOWN)
-    
+
     def get_all_statuses(self) -> Dict[str, str]:
         """Get all device statuses as a dictionary."""
+        if self.cluster is not None:
+            return self.cluster.state.all_statuses()
         return {device_id: status.value for device_id, status in self.device_status.items()}
-    
-    def _monitor_devices(self) -> None:
-        """Background thread to monitor device status."""
-        while not self._stop_monitoring:
-            devices = self.device_service.load_devices()
-            for device in devices:
-                device_id = str(device['id'])  # Convert to string for consistency
-                if device.get('ip'):  # Only ping devices with IP addresses
-                    status = ping_device(device['ip'])
-                    self.device_status[device_id] = DeviceStatus.ONLINE if status else DeviceStatus.OFFLINE
+
+    def get_status_version(self) -> int:
+        """Current version of the status map."""
+        if self.cluster is not None:
+            return self.cluster.state.status_version()
+        return self._versions.version
+
+    def get_statuses_since(self, since: int) -> Tuple[int, Optional[Dict[str, str]], List[str]]:
+        """Get (version, changed statuses, removed IDs) since a version.
+        Changed statuses is None when since is too old for a delta."""
+        if self.cluster is not None:
+            return self.cluster.state.statuses_since(since)
+        version, changes = self._versions.changes_since(since)
+        if changes is None:
+            return version, None, []
+        changed, removed = changes
+        statuses = {}
+        for device_id in changed:
+            status = self.device_status.get(device_id)
+            if status is not None:
+                statuses[device_id] = status.value
+        return version, statuses, removed
+
+    @on_leader
+    def get_uptime(self, device_id: str, window: float) -> Optional[Dict[str, Any]]:
+        """Uptime, flaps and RTT percentiles of a device over the last window
+        seconds, or None without history."""
+        return self.history.summarize(device_id, time.time() - window)
+
+    @on_leader
+    def get_uptime_summary(self, window: float) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Uptime statistics of every device with history."""
+        until = time.time()
+        return {device_id: self.history.summarize(device_id, until - window, until)
+                for device_id in self.history.device_ids()}
+
+    @on_leader
+    def get_monitoring_stats(self) -> Dict[str, Any]:
+        """Get scheduler metrics for the monitoring loop."""
+        with self._cond:
+            intervals = [self._current_interval(device_id) for device_id in self._targets]
+            next_due = self._queue[0][0] - time.monotonic() if self._queue else None
+            in_flight = len(self._in_flight)
+        return {
+            'interval_seconds': config.monitoring_interval,
+            'max_workers': config.monitoring_workers,
+            'probe_timeout_seconds': config.probe_timeout,
+            'scheduled_devices': len(intervals),
+            'in_flight': in_flight,
+            'probes_total': self.probes_total,
+            'probes_per_minute': round(sum(60.0 / i for i in intervals if i > 0), 1),
+            'next_probe_in_seconds': next_due,
+            'lag_seconds': round(self.lag_seconds, 3),
+            'max_lag_seconds': round(self.max_lag_seconds, 3),
+            'falling_behind': self.lag_seconds > config.probe_timeout,
+            'probe_engine': probe_engine.get_stats(),
+            'cluster': self.cluster.get_stats() if self.cluster is not None else None
+        }
+
+    def get_scheduler_load(self) -> Tuple[float, int]:
+        """(smoothed lag in seconds, probes in flight) of this process's
+        scheduler, read locally rather than from the leader."""
+        with self._cond:
+            return self.lag_seconds, len(self._in_flight)
+
+    def publish_statuses(self, state: 'SharedState') -> None:
+        """Copy status changes made since the last call to the shared state."""
+        since = self._published_version
+        version, changes = self._versions.changes_since(since if since is not None else 0)
+        if version == since:
+            return
+        statuses = dict(self.device_status)
+        if since is None or changes is None:
+            changed = {device_id: status.value for device_id, status in statuses.items()}
+            removed: List[str] = []
+        else:
+            changed = {device_id: statuses[device_id].value for device_id in changes[0]
+                       if device_id in statuses}
+            removed = changes[1]
+        if changed or removed:
+            state.publish_statuses(changed, removed)
+        self._published_version = version
+
+    def set_status(self, device_id: str, status: DeviceStatus) -> None:
+        """Store a probe result, recording transitions in the device history."""
+        previous = self.device_status.get(device_id)
+        self.device_status[device_id] = status
+        if previous != status:
+            self._versions.touch([device_id])
+            event_bus.publish('status', {device_id: status.value})
+        if previous is not None and previous != status:
+            try:
+                self.device_service.record_status_change(device_id, datetime.now().isoformat(), status.value)
+            except Exception as e:
+                print(f"Failed to record status change for {device_id}: {e}")
+
+    def _schedule(self, device_id: str, due: float) -> None:
+        """Queue a device's next probe. Older queue entries become stale."""
+        self._due[device_id] = due
+        heapq.heappush(self._queue, (due, next(self._counter), device_id))
+
+    def _current_interval(self, device_id: str) -> float:
+        """Interval for a device given how long it has been offline."""
+        base = self._targets[device_id][1]
+        streak = self._offline_streak.get(device_id, 0)
+        if streak > 1:
+            return min(base * config.monitoring_offline_backoff ** (streak - 1),
+                       max(base, config.monitoring_max_interval))
+        return base
+
+    def _jittered(self, interval: float) -> float:
+        jitter = config.monitoring_jitter
+        return interval * (1 + random.uniform(-jitter, jitter)) if jitter else interval
+
+    @staticmethod
+    def _base_interval(device: Dict[str, Any]) -> float:
+        """A device's monitor_interval, or the global interval if unset or
+        invalid, never shorter than MIN_INTERVAL_SECONDS"""
+        try:
+            interval = float(device.get('monitor_interval') or config.monitoring_interval)
+        except (TypeError, ValueError):
+            interval = float(config.monitoring_interval)
+        if not math.isfinite(interval):
+            interval = float(config.monitoring_interval)
+        return max(MIN_INTERVAL_SECONDS, interval)
+
+    def _sync_devices(self) -> None:
+        """Reconcile the schedule with the current device inventory."""
+        targets: Dict[str, Tuple[str, float]] = {}
+        known_ids = set()
+        for device in self.device_service.load_devices():
+            device_id = str(device['id'])  # Convert to string for consistency
+            known_ids.add(device_id)
+            if device.get('ip'):  # Only ping devices with IP addresses
+                targets[device_id] = (device['ip'], self._base_interval(device))
+            else:
+                self.set_status(device_id, DeviceStatus.UNKNOWN)
+
+        now = time.monotonic()
+        with self._cond:
+            for device_id in set(self._targets) - set(targets):
+                self._due.pop(device_id, None)
+                self._offline_streak.pop(device_id, None)
+            removed = set(self.device_status) - known_ids
+            for device_id in removed:
+                self.device_status.pop(device_id, None)
+            self._versions.remove(removed)
+            self.history.remove(removed)
+            for device_id, target in targets.items():
+                previous = self._targets.get(device_id)
+                if previous is not None and previous[0] != target[0]:
+                    # Re-addressed devices are probed right away
+                    self._offline_streak.pop(device_id, None)
+                    if device_id not in self._in_flight:
+                        self._schedule(device_id, now)
+                elif previous is None and device_id not in self._in_flight:
+                    # Spread first probes of new devices over a second
+                    self._schedule(device_id, now + random.uniform(0, 1))
+            self._targets = targets
+            self._cond.notify()
+
+    def _take_due(self) -> List[str]:
+        """Pop every device whose probe is due, recording scheduling lag."""
+        due = []
+        now = time.monotonic()
+        while self._queue and self._queue[0][0] <= now:
+            due_at, _, device_id = heapq.heappop(self._queue)
+            if self._due.get(device_id) != due_at or device_id in self._in_flight:
+                continue  # stale entry
+            del self._due[device_id]
+            self._in_flight.add(device_id)
+            due.append(device_id)
+            lag = now - due_at
+            self.lag_seconds = 0.9 * self.lag_seconds + 0.1 * lag
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+        return due
+
+    def _dispatch(self, due: List[str]) -> None:
+        """Hand due probes to the probe engine."""
+        by_ip: Dict[str, List[str]] = {}
+        with self._cond:
+            for device_id in due:
+                if device_id in self._targets:
+                    by_ip.setdefault(self._targets[device_id][0], []).append(device_id)
                 else:
-                    self.device_status[device_id] = DeviceStatus.UNKNOWN
-            time.sleep(config.monitoring_interval)
+                    self._in_flight.discard(device_id)  # deleted meanwhile
+        if not by_ip:
+            return
+        started = time.perf_counter()
+
+        def deliver(ip: str, rtt: Optional[float]) -> None:
+            # Runs on the engine loop: only queue the result for the monitoring thread
+            if rtt is not None:
+                PROBE_RTT_SECONDS.observe(rtt)
+            with self._cond:
+                self._results.extend((device_id, rtt) for device_id in by_ip.pop(ip, ()))
+                self._cond.notify()
+
+        def finished(future: Future) -> None:
+            MONITORING_BATCH_SECONDS.observe(time.perf_counter() - started)
+            if not future.cancelled() and future.exception() is not None:
+                print(f"Monitoring probe error: {future.exception()}")
+            # Anything left undelivered is rescheduled as offline rather than lost
+            with self._cond:
+                self._results.extend((device_id, None) for ids in by_ip.values() for device_id in ids)
+                by_ip.clear()
+                self._cond.notify()
+
+        future = probe_engine.ping_many(list(by_ip), config.probe_timeout, MONITORING, on_result=deliver)
+        future.add_done_callback(finished)
+
+    def _on_result(self, device_id: str, online: bool, rtt: Optional[float] = None) -> None:
+        """Record a probe result and compute the device's next due time."""
+        status = DeviceStatus.ONLINE if online else DeviceStatus.OFFLINE
+        with self._cond:
+            self._in_flight.discard(device_id)
+            if device_id not in self._targets:
+                return  # deleted while the probe was running
+            self.probes_total += 1
+            previous = self.device_status.get(device_id)
+            changed = previous is not None and previous != status
+            if online:
+                self._offline_streak.pop(device_id, None)
+            else:
+                self._offline_streak[device_id] = self._offline_streak.get(device_id, 0) + 1
+
+            if changed:
+                interval = min(config.monitoring_recheck, self._current_interval(device_id))
+            else:
+                interval = self._jittered(self._current_interval(device_id))
+            self._schedule(device_id, time.monotonic() + interval)
+            self._cond.notify()
+        self.set_status(device_id, status)
+        self.history.record(device_id, online, rtt)
+
+    def _monitor_devices(self) -> None:
+        """Background thread dispatching probes as they come due."""
+        next_sync = 0.0
+        while not self._stop_event.is_set():
+            if time.monotonic() >= next_sync:
+                try:
+                    self._sync_devices()
+                except Exception as e:
+                    print(f"Monitoring sync error: {e}")
+                next_sync = time.monotonic() + min(SYNC_INTERVAL_SECONDS, config.monitoring_interval)
+
+            with self._cond:
+                results, self._results = self._results, []
+                due = self._take_due()
+                if not due and not results:
+                    wake_at = min(next_sync, self._queue[0][0]) if self._queue else next_sync
+                    self._cond.wait(max(0.0, wake_at - time.monotonic()))
+                    continue
+            for device_id, rtt in results:
+                self._on_result(device_id, rtt is not None, rtt)
+            if due:
+                self._dispatch(due)
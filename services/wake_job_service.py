@@ -0,0 +1,209 @@
+"""Service for verifying that woken devices actually come online."""
+
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+from core.models import Device, DeviceStatus, WakeJob
+from core.utils import ping_devices
+from core.config import config
+from core.probe_engine import WAKE
+from services.cluster_service import on_leader
+from services.monitoring_service import MonitoringService
+from services.wol_service import WakeOnLanService
+
+if TYPE_CHECKING:
+    from services.cluster_service import ClusterService
+
+# Finished jobs kept around for the jobs API
+MAX_FINISHED_JOBS = 1000
+
+
+class WakeJobService:
+    """Tracks wake-and-verify jobs.
+
+    After a magic packet is sent, the device is probed on a fast cadence
+    (``wake_verify.initial_interval_seconds``, backing off up to
+    ``max_interval_seconds``) until it answers or ``timeout_seconds`` passes,
+    independently of the global monitoring interval. The packet is resent
+    every ``resend_after_seconds`` up to ``max_resends`` times.
+
+    In a multi-worker deployment jobs live in the leader process, so every
+    worker sees the same jobs.
+    """
+
+    def __init__(self, wol_service: WakeOnLanService, monitoring_service: MonitoringService,
+                 cluster: Optional['ClusterService'] = None):
+        self.wol_service = wol_service
+        self.monitoring_service = monitoring_service
+        self.cluster = cluster
+        self._jobs: 'OrderedDict[str, WakeJob]' = OrderedDict()
+        self._devices: Dict[str, Device] = {}
+        self._intervals: Dict[str, float] = {}
+        self._sent_monotonic: Dict[str, float] = {}
+        self._queue: List[Tuple[float, int, str]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    @on_leader
+    def start_job(self, device_id: str) -> Tuple[Optional[WakeJob], str]:
+        """Wake a device and start verifying it. Returns (job, message)."""
+        success, message, device = self.wol_service.wake_device(device_id)
+        if not device:
+            return None, message
+        job = self.track(device)
+        if not success:
+            self._finish(job['id'], 'failed')
+        return self.get_job(job['id']), message
+
+    @on_leader
+    def track(self, device: Device) -> WakeJob:
+        """Start verifying a device whose wake packet was just sent."""
+        now = datetime.now().isoformat()
+        job: WakeJob = {
+            'id': uuid.uuid4().hex[:12],
+            'device_id': str(device['id']),
+            'device_name': device['name'],
+            'state': 'waiting',
+            'created_at': now,
+            'sent_at': now,
+            'online_at': None,
+            'latency_seconds': None,
+            'probes': 0,
+            'resends': 0
+        }
+        with self._cond:
+            self._jobs[job['id']] = job
+            self._trim()
+            if not device.get('ip'):
+                job['state'] = 'unverifiable'
+                return dict(job)  # type: ignore
+            self._devices[job['id']] = device
+            self._sent_monotonic[job['id']] = time.monotonic()
+            self._intervals[job['id']] = config.wake_verify_initial_interval
+            self._schedule(job['id'], time.monotonic() + config.wake_verify_initial_interval)
+            self._ensure_runner()
+            self._cond.notify()
+        return dict(job)  # type: ignore
+
+    @on_leader
+    def get_job(self, job_id: str) -> Optional[WakeJob]:
+        """Get a job by ID."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None  # type: ignore
+
+    @on_leader
+    def list_jobs(self) -> List[WakeJob]:
+        """Get all known jobs, newest first."""
+        with self._cond:
+            return [dict(job) for job in reversed(self._jobs.values())]  # type: ignore
+
+    def _trim(self) -> None:
+        """Forget the oldest finished jobs beyond MAX_FINISHED_JOBS."""
+        finished = [job_id for job_id, job in self._jobs.items() if job['state'] != 'waiting']
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _schedule(self, job_id: str, due: float) -> None:
+        heapq.heappush(self._queue, (due, next(self._counter), job_id))
+
+    def _finish(self, job_id: str, state: str) -> None:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job['state'] = state
+            self._devices.pop(job_id, None)
+            self._intervals.pop(job_id, None)
+            self._sent_monotonic.pop(job_id, None)
+
+    def _ensure_runner(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _next_due(self) -> List[str]:
+        """Block until at least one job is due and return all due job IDs."""
+        with self._cond:
+            while True:
+                # Drop entries for jobs that already finished
+                while self._queue and self._queue[0][2] not in self._devices:
+                    heapq.heappop(self._queue)
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                wait = self._queue[0][0] - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                due = []
+                now = time.monotonic()
+                while self._queue and self._queue[0][0] <= now:
+                    job_id = heapq.heappop(self._queue)[2]
+                    if job_id in self._devices:
+                        due.append(job_id)
+                return due
+
+    def _run(self) -> None:
+        """Runner loop: probe due jobs in one batch and reschedule the rest."""
+        while True:
+            due = self._next_due()
+            with self._cond:
+                targets = {job_id: self._devices[job_id] for job_id in due if job_id in self._devices}
+            try:
+                reachable = ping_devices([d['ip'] for d in targets.values()],
+                                         config.wake_verify_probe_timeout, WAKE)
+            except Exception as e:
+                print(f"Wake verification probe error: {e}")
+                reachable = {}
+
+            for job_id, device in targets.items():
+                self._handle_result(job_id, device, reachable.get(device['ip'], False))
+
+    def _handle_result(self, job_id: str, device: Device, online: bool) -> None:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            sent = self._sent_monotonic.get(job_id)
+            if job is None or sent is None:
+                return
+            job['probes'] += 1
+            now = time.monotonic()
+            elapsed = now - sent
+
+        if online:
+            with self._cond:
+                job['online_at'] = datetime.now().isoformat()
+                job['latency_seconds'] = round(elapsed, 3)
+            self._finish(job_id, 'online')
+            self.monitoring_service.set_status(job['device_id'], DeviceStatus.ONLINE)
+            self.wol_service.device_service.update_device(job['device_id'], {'last_wake_latency': round(elapsed, 3)})
+            return
+
+        if elapsed >= config.wake_verify_timeout:
+            self._finish(job_id, 'timeout')
+            return
+
+        resend_after = config.wake_verify_resend_after
+        if resend_after and job['resends'] < config.wake_verify_max_resends \
+                and elapsed >= resend_after * (job['resends'] + 1):
+            try:
+                self.wol_service.send_packet(device)
+                with self._cond:
+                    job['resends'] += 1
+            except (ValueError, OSError) as e:
+                print(f"Failed to resend wake packet to {device['name']}: {e}")
+
+        with self._cond:
+            interval = self._intervals.get(job_id)
+            if interval is None:
+                return
+            self._intervals[job_id] = min(interval * config.wake_verify_backoff,
+                                          config.wake_verify_max_interval)
+            # Always take a final probe at the deadline
+            self._schedule(job_id, min(now + interval, sent + config.wake_verify_timeout))
+            self._cond.notify()
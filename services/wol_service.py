@@ -1,45 +1,142 @@
 """Service for Wake-on-LAN functionality."""
 
 import subprocess
+import time
 from datetime import datetime
-from core.models import Device
+from typing import Iterable, List, Optional, TYPE_CHECKING
+from core.models import Device, DeviceStatus, WakeResult
+from core.magic_packet import MagicPacketSender
 from services.device_service import DeviceService
 from core.config import config
+from core.metrics import WAKE_SECONDS, WAKES
+from core.probe_engine import WAKE, probe_engine
+
+if TYPE_CHECKING:
+    from services.monitoring_service import MonitoringService
 
 
 class WakeOnLanService:
     """Service class for Wake-on-LAN operations."""
-    
-    def __init__(self, device_service: DeviceService):
+
+    def __init__(self, device_service: DeviceService, monitoring_service: Optional['MonitoringService'] = None):
         self.device_service = device_service
-    
+        self.monitoring_service = monitoring_service
+        self._sender = MagicPacketSender()
+
     def wake_device(self, device_id: str) -> tuple[bool, str, Device | None]:
         """
         Wake up a device by ID.
         Returns (success, message, device).
         """
+        started = time.perf_counter()
+        result = self._wake_device(device_id)
+        WAKE_SECONDS.observe(time.perf_counter() - started)
+        WAKES.labels('success' if result[0] else 'failure').inc()
+        return result
+
+    def _wake_device(self, device_id: str) -> tuple[bool, str, Device | None]:
         device = self.device_service.get_device_by_id(device_id)
         
         if not device:
             return False, 'Device not found', None
         
         try:
-            subprocess.run([config.wakeonlan_command, device['mac']], 
-                          capture_output=True, text=True, check=True)
+            if config.wol_method == 'command':
+                result = probe_engine.run_command([config.wakeonlan_command, device['mac']],
+                                                  budget=WAKE).result()
+                result.check_returncode()
+            else:
+                self._sender.send_device(device)
             
             # Update last wake time
-            updates = {'last_wake': datetime.now().isoformat()}
+            timestamp = datetime.now().isoformat()
+            updates = {'last_wake': timestamp}
             self.device_service.update_device(device_id, updates)
             
             # Get updated device
             updated_device = self.device_service.get_device_by_id(device_id)
             
             message = f'Wake-on-LAN packet sent to {device["name"]} ({device["mac"]})'
+            self.device_service.record_wake_event(device_id, timestamp, True, message)
             return True, message, updated_device
             
         except subprocess.CalledProcessError as e:
             error_msg = f'Failed to wake {device["name"]}: {e}'
+            self.device_service.record_wake_event(device_id, datetime.now().isoformat(), False, error_msg)
             return False, error_msg, device
         except FileNotFoundError:
             error_msg = 'wakeonlan command not found. Please install it first.'
+            self.device_service.record_wake_event(device_id, datetime.now().isoformat(), False, error_msg)
             return False, error_msg, device
+        except (ValueError, OSError) as e:
+            error_msg = f'Failed to wake {device["name"]}: {e}'
+            self.device_service.record_wake_event(device_id, datetime.now().isoformat(), False, error_msg)
+            return False, error_msg, device
+
+    def send_packet(self, device: Device) -> None:
+        """Send a magic packet to a device without updating its record."""
+        self._sender.send_device(device)
+
+    def select_devices(self, device_ids: Iterable[str] = (), tags: Iterable[str] = (),
+                       all_offline: bool = False) -> List[Device]:
+        """Resolve a bulk wake selection (IDs, tags and/or every offline device)."""
+        device_ids = {str(i) for i in device_ids}
+        tags = {t.lower() for t in tags}
+        selected = []
+        for device in self.device_service.load_devices():
+            device_id = str(device['id'])
+            if device_id in device_ids or tags.intersection(device.get('tags') or []):
+                selected.append(device)
+            elif all_offline and self.monitoring_service is not None and \
+                    self.monitoring_service.get_device_status(device_id) == DeviceStatus.OFFLINE:
+                selected.append(device)
+        return selected
+
+    def wake_devices(self, devices: List[Device]) -> List[WakeResult]:
+        """
+        Wake many devices from one in-process UDP socket, paced by
+        wol.packets_per_second (or with the wakeonlan command when
+        wol.method is 'command'), and record every last_wake in a single write.
+        """
+        errors = self._run_commands(devices) if config.wol_method == 'command' else self._sender.send_many(devices)
+        timestamp = datetime.now().isoformat()
+
+        results: List[WakeResult] = []
+        updates = {}
+        events = []
+        for device, error in zip(devices, errors):
+            if error is None:
+                message = f'Wake-on-LAN packet sent to {device["name"]} ({device["mac"]})'
+                updates[str(device['id'])] = {'last_wake': timestamp}
+            else:
+                message = f'Failed to wake {device["name"]}: {error}'
+            events.append((str(device['id']), timestamp, error is None, message))
+            results.append({
+                'id': str(device['id']),
+                'name': device['name'],
+                'mac': device['mac'],
+                'success': error is None,
+                'message': message
+            })
+
+        if updates:
+            self.device_service.update_devices(updates)
+        if events:
+            self.device_service.record_wake_events(events)
+        return results
+
+    def _run_commands(self, devices: List[Device]) -> List[Optional[str]]:
+        """Run the wakeonlan command for many devices within the wake budget.
+        Returns one error message per device, None on success."""
+        futures = [probe_engine.run_command([config.wakeonlan_command, device['mac']], budget=WAKE)
+                   for device in devices]
+        errors: List[Optional[str]] = []
+        for future in futures:
+            try:
+                future.result().check_returncode()
+                errors.append(None)
+            except FileNotFoundError:
+                errors.append('wakeonlan command not found. Please install it first.')
+            except (subprocess.CalledProcessError, ValueError, OSError) as e:
+                errors.append(str(e))
+        return errors
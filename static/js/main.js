@@ -1,6 +1,9 @@
 // Global variables
 let discoveryInterval = null;
 let statusMonitoringInterval = null;
+let eventSource = null;
+let eventStreamConnected = false;
+let discoveryState = null;
 
 // Auto-format MAC address input
 function setupMacAddressFormatting(inputId) {
@@ -28,33 +31,43 @@ function setupWakeConfirmations() {
     });
   });
 }
+// Apply a map of device id -> status to the indicators on the current page
+function applyDeviceStatuses(data) {
+  document.querySelectorAll("[data-device-id]").forEach((statusCircle) => {
+    const status = data[statusCircle.dataset.deviceId];
+    if (status) {
+      statusCircle.className = `status-circle status-${status}`;
+      statusCircle.title = `Status: ${status}`;
+    }
+  });
+}
 
 // Function to update device status
 function updateDeviceStatus() {
   fetch("/status")
     .then((response) => response.json())
     .then((data) => {
-      Object.keys(data).forEach((deviceId) => {
-        const statusCircle = document.querySelector(
-          `[data-device-id="${deviceId}"]`
-        );
-        if (statusCircle) {
-          const status = data[deviceId];
-          statusCircle.className = `status-circle status-${status}`;
-          statusCircle.title = `Status: ${status}`;
-        }
-      });
+      applyDeviceStatuses(data);
     })
     .catch((error) => {
       console.error("Error fetching device status:", error);
     });
 }
 
-// Function to refresh the device list
+// Function to refresh the device list, keeping the current filters and page
 function refreshDeviceList() {
-  fetch("/devices")
+  const params = new URLSearchParams(window.location.search);
+  if (!params.has("page")) {
+    params.set("page", "1");
+  }
+  fetch(`/devices?${params}`)
     .then((response) => response.json())
-    .then((devices) => {
+    .then((result) => {
+      const devices = result.devices;
+      const deviceCount = document.querySelector(".device-count");
+      if (deviceCount) {
+        deviceCount.textContent = `${result.total} device${result.total === 1 ? "" : "s"}`;
+      }
       const devicesGrid = document.querySelector(".devices-grid");
       if (!devicesGrid) {
         // If no devices grid exists, create one
@@ -78,9 +91,11 @@ function refreshDeviceList() {
                     <div class="device-header">
                         <div class="device-name-container">
                             <div class="device-name">${device.name}</div>
-                            <span class="status-circle status-unknown" data-device-id="${
-                              device.id
-                            }" title="Status: loading..."></span>
+                            <span class="status-circle status-${
+                              device.status
+                            }" data-device-id="${device.id}" title="Status: ${
+            device.status
+          }"></span>
                         </div>
                     </div>
                     <div class="device-info">
@@ -202,8 +217,10 @@ function startDiscovery() {
       // Clear previous devices display when starting new search
       document.getElementById("discoveredDevices").innerHTML = "";
 
-      // Start polling for discovery status
-      discoveryInterval = setInterval(checkDiscoveryStatus, 2000);
+      // Progress arrives over the event stream; poll only without it
+      if (!eventStreamConnected) {
+        discoveryInterval = setInterval(checkDiscoveryStatus, 2000);
+      }
     })
     .catch((error) => {
       console.error("Error starting discovery:", error);
@@ -255,15 +272,23 @@ function checkDiscoveryStatus() {
 }
 
 function updateDiscoveryStatusModal(data) {
+  discoveryState = data;
   const statusDiv = document.getElementById("discoveryStatus");
   const devicesDiv = document.getElementById("discoveredDevices");
 
   if (data.active) {
+    const progress = data.progress && data.progress.total ? data.progress : null;
+    const progressText = progress
+      ? ` (${progress.scanned}/${progress.total} addresses${
+          progress.eta_seconds !== null ? `, about ${Math.ceil(progress.eta_seconds)}s left` : ""
+        })`
+      : "";
+    const progressWidth = progress ? `${progress.percent}%` : "100%";
     statusDiv.innerHTML = `
-            <p>Scanning network... Found ${data.count} devices</p>
+            <p>Scanning network... Found ${data.count} devices${progressText}</p>
             <div style="margin: 10px 0;">
                 <div style="background: #e0e0e0; border-radius: 10px; height: 8px; overflow: hidden;">
-                    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); height: 100%; width: 100%; animation: pulse-progress 1.5s ease-in-out infinite; border-radius: 10px;"></div>
+                    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); height: 100%; width: ${progressWidth}; animation: pulse-progress 1.5s ease-in-out infinite; border-radius: 10px;"></div>
                 </div>
             </div>
             <div style="display: flex; gap: 10px; margin-top: 15px;">
@@ -419,6 +444,12 @@ function importSingleDevice(mac) {
 function startStatusMonitoring() {
   if (statusMonitoringInterval) {
     clearInterval(statusMonitoringInterval);
+    statusMonitoringInterval = null;
+  }
+
+  // Status changes are pushed over the event stream; poll only without it
+  if (eventStreamConnected) {
+    return;
   }
 
   if (document.querySelectorAll(".status-circle").length > 0) {
@@ -428,6 +459,79 @@ function startStatusMonitoring() {
   }
 }
 
+// Event stream: status and discovery deltas pushed by the server.
+// Polling is only used while the stream is unavailable.
+function isDiscoverySectionVisible() {
+  const discoverySection = document.getElementById("discoverySection");
+  return discoverySection && discoverySection.style.display === "block";
+}
+
+function applyDiscoveryEvent(data) {
+  if (!discoveryState || data.count < discoveryState.devices.length) {
+    // A new search started
+    discoveryState = { active: data.active, count: 0, devices: [] };
+  }
+  discoveryState.active = data.active;
+  discoveryState.count = data.count;
+  if (data.progress) {
+    discoveryState.progress = data.progress;
+  }
+  if (data.device) {
+    discoveryState.devices.push(data.device);
+  }
+  if (isDiscoverySectionVisible()) {
+    updateDiscoveryStatusModal(discoveryState);
+  }
+}
+
+function startEventStream() {
+  if (!window.EventSource) {
+    return;
+  }
+
+  eventSource = new EventSource("/events");
+
+  eventSource.onopen = function () {
+    eventStreamConnected = true;
+    if (statusMonitoringInterval) {
+      clearInterval(statusMonitoringInterval);
+      statusMonitoringInterval = null;
+    }
+    if (discoveryInterval) {
+      clearInterval(discoveryInterval);
+      discoveryInterval = null;
+    }
+    // Catch up on anything missed while disconnected
+    updateDeviceStatus();
+  };
+
+  eventSource.onerror = function () {
+    // The browser reconnects on its own; poll in the meantime
+    if (eventStreamConnected) {
+      eventStreamConnected = false;
+      startStatusMonitoring();
+      if (discoveryState && discoveryState.active && !discoveryInterval) {
+        discoveryInterval = setInterval(checkDiscoveryStatus, 2000);
+      }
+    }
+  };
+
+  eventSource.addEventListener("status", (event) => {
+    applyDeviceStatuses(JSON.parse(event.data));
+  });
+
+  eventSource.addEventListener("discovery", (event) => {
+    applyDiscoveryEvent(JSON.parse(event.data));
+  });
+
+  eventSource.addEventListener("resync", () => {
+    updateDeviceStatus();
+    if (isDiscoverySectionVisible()) {
+      checkDiscoveryStatus();
+    }
+  });
+}
+
 // Edit Device Modal Functions
 function openEditModal(deviceId, name, mac, ip, description) {
   document.getElementById("editName").value = name;
@@ -522,8 +626,9 @@ function initializeApp() {
     });
   }
 
-  // Start initial monitoring
+  // Start initial monitoring, then switch to pushed updates
   startStatusMonitoring();
+  startEventStream();
 
   // Close modal when clicking outside of it
   window.onclick = function (event) {
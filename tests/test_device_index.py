@@ -0,0 +1,64 @@
+"""Tests for the paged device query index."""
+
+import ipaddress
+
+import pytest
+
+from core.device_index import DeviceIndex
+
+
+def device(device_id, name, ip, last_wake=None):
+    return {'id': device_id, 'name': name, 'mac': '', 'ip': ip, 'description': '',
+            'created_at': None, 'last_wake': last_wake}
+
+
+@pytest.fixture
+def index():
+    devices = [
+        device('a', 'Office-PC', '192.168.1.20', '2025-03-01'),
+        device('b', 'nas', '192.168.1.5'),
+        device('c', 'Lab-Server', '10.0.0.7', '2025-01-01'),
+        device('d', 'office-printer', ''),
+        device('e', 'Lab-PC', '192.168.2.9', '2025-02-01'),
+    ]
+    return DeviceIndex({d['id']: d for d in devices})
+
+
+def test_unfiltered_pages_keep_inventory_order(index):
+    assert index.select(offset=0, limit=2) == (5, ['a', 'b'])
+    assert index.select(offset=4, limit=2) == (5, ['e'])
+    assert index.select(offset=9, limit=2) == (5, [])
+
+
+def test_sort_by_name_is_case_insensitive(index):
+    assert index.select(sort='name', limit=10) == (5, ['e', 'c', 'b', 'a', 'd'])
+    assert index.select(sort='name', descending=True, offset=1, limit=2) == (5, ['a', 'b'])
+
+
+def test_sort_by_ip_is_numeric_with_missing_addresses_last(index):
+    assert index.select(sort='ip', limit=10) == (5, ['c', 'b', 'a', 'e', 'd'])
+
+
+def test_subnet_filter(index):
+    network = ipaddress.ip_network('192.168.1.0/24')
+    assert index.select(network=network, sort='ip') == (2, ['b', 'a'])
+    assert index.select(network=ipaddress.ip_network('172.16.0.0/12')) == (0, [])
+
+
+def test_name_filter_with_short_and_trigram_queries(index):
+    assert index.select(name='PC') == (2, ['a', 'e'])
+    assert index.select(name='OFFICE', sort='name') == (2, ['a', 'd'])
+    assert index.select(name='lab-s') == (1, ['c'])
+    assert index.select(name='missing') == (0, [])
+
+
+def test_filters_and_predicate_combine(index):
+    network = ipaddress.ip_network('192.168.0.0/16')
+    assert index.select(network=network, name='pc', sort='last_wake', descending=True) == (2, ['a', 'e'])
+    assert index.select(predicate=lambda i: i in {'b', 'c', 'e'}, sort='name', offset=1, limit=1) == (3, ['c'])
+    assert index.select(predicate=lambda i: i != 'a', descending=True, limit=2) == (4, ['e', 'd'])
+
+
+def test_unknown_sort_key(index):
+    with pytest.raises(ValueError):
+        index.select(sort='mac')
@@ -0,0 +1,90 @@
+"""Tests for DeviceService instances sharing one store, as separate worker
+processes do."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from core.shared_state import SharedState
+from core.storage import JsonDeviceStore, SqliteDeviceStore
+from services.device_service import DeviceService
+
+
+def device(n, name=None):
+    return {'id': f'd{n}', 'name': name or f'host-{n}', 'mac': f'AA:BB:CC:DD:EE:{n:02X}', 'ip': '',
+            'description': '', 'created_at': None, 'last_wake': None}
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def make_store(request, tmp_path):
+    if request.param == 'json':
+        return lambda: JsonDeviceStore(str(tmp_path / 'devices.json'))
+    return lambda: SqliteDeviceStore(str(tmp_path / 'devices.db'))
+
+
+def names(service):
+    return sorted((d['id'], d['name']) for d in service.load_devices())
+
+
+def test_flushes_from_two_instances_keep_both_changes(make_store):
+    a, b = DeviceService(make_store()), DeviceService(make_store())
+    a.load_devices()
+    b.load_devices()
+    a.add_device(device(1))
+    b.add_device(device(2))
+    # b writes first, so a flushes over a store that changed since it loaded
+    b.flush()
+    a.flush()
+    a.update_device('d1', {'name': 'renamed'})
+    a.flush()
+
+    expected = [('d1', 'renamed'), ('d2', 'host-2')]
+    assert names(a) == expected
+    assert names(b) == expected
+    assert names(DeviceService(make_store())) == expected
+
+
+def test_deletes_and_updates_from_two_instances_merge(make_store):
+    DeviceService(make_store()).save_devices([device(1), device(2), device(3)])
+    a, b = DeviceService(make_store()), DeviceService(make_store())
+    a.load_devices()
+    b.load_devices()
+    a.delete_device('d1')
+    b.update_device('d2', {'name': 'renamed'})
+    a.flush()
+    b.flush()
+
+    expected = [('d2', 'renamed'), ('d3', 'host-3')]
+    assert names(a) == expected
+    assert names(b) == expected
+
+
+def test_versions_advance_for_changes_from_another_instance(make_store):
+    a, b = DeviceService(make_store()), DeviceService(make_store())
+    a.add_device(device(1))
+    a.flush()
+    since = b.get_version()
+    a.update_device('d1', {'name': 'renamed'})
+    a.flush()
+
+    version, changed, deleted = b.get_changes_since(since)
+    assert version > since
+    assert [d['name'] for d in changed] == ['renamed']
+    assert deleted == []
+
+
+def test_cluster_instances_report_the_same_versions(tmp_path):
+    cluster = SimpleNamespace(state=SharedState(str(tmp_path / 'shared.db')))
+    store = str(tmp_path / 'devices.db')
+    a = DeviceService(SqliteDeviceStore(store), cluster=cluster)
+    b = DeviceService(SqliteDeviceStore(store), cluster=cluster)
+    since = b.get_version()
+    a.add_device(device(1))
+    a.delete_device('d1')
+    a.add_device(device(2))
+
+    assert a.get_version() == b.get_version() > since
+    version, changed, deleted = b.get_changes_since(since)
+    assert version == a.get_version()
+    assert [d['id'] for d in changed] == ['d2']
+    assert deleted == ['d1']
@@ -0,0 +1,65 @@
+"""Tests for probe history summaries and compressed segments."""
+
+from array import array
+
+from core.history import StatusHistory, _decode_segment, _encode_segment, summarize_samples
+
+
+def columns(samples):
+    """Columns from (timestamp, online, rtt_ms) tuples"""
+    return (array('I', [s[0] for s in samples]), array('B', [s[1] for s in samples]),
+            array('f', [s[2] for s in samples]))
+
+
+def test_summarize_empty():
+    assert summarize_samples(columns([]), 0, 100) is None
+
+
+def test_summarize_weights_uptime_by_time():
+    # Online 100..160, offline 160..190, online again until 200
+    summary = summarize_samples(columns([(100, 1, 2.0), (130, 1, 4.0), (160, 0, -1.0), (190, 1, 6.0)]), 100, 200)
+    assert summary['samples'] == 4
+    assert summary['covered_seconds'] == 100
+    assert summary['online_seconds'] == 70
+    assert summary['offline_seconds'] == 30
+    assert summary['uptime_percent'] == 70
+    assert summary['flaps'] == 2
+    assert summary['current'] == 'online'
+    assert summary['rtt_ms'] == {'p50': 4.0, 'p90': 6.0, 'p99': 6.0, 'min': 2.0, 'max': 6.0}
+
+
+def test_summarize_clips_the_sample_before_the_window():
+    # The offline sample at 50 is in effect at since=100 but not counted itself
+    summary = summarize_samples(columns([(50, 0, -1.0), (150, 1, 3.0)]), 100, 200)
+    assert summary['samples'] == 1
+    assert summary['covered_seconds'] == 100
+    assert summary['online_seconds'] == 50
+    assert summary['flaps'] == 1
+    assert summary['rtt_ms']['min'] == 3.0
+
+
+def test_summarize_without_rtts():
+    summary = summarize_samples(columns([(0, 0, -1.0), (10, 0, -1.0)]), 0, 20)
+    assert summary['uptime_percent'] == 0
+    assert summary['current'] == 'offline'
+    assert summary['rtt_ms'] is None
+
+
+def test_segment_round_trip():
+    original = columns([(1_700_000_000, 1, 1.5), (1_700_000_030, 0, -1.0), (1_700_000_095, 1, 12.25)])
+    decoded = _decode_segment(_encode_segment(*original))
+    assert decoded == original
+
+
+def test_history_reads_segments_after_restart(tmp_path):
+    history = StatusHistory(capacity=4, directory=str(tmp_path), retention_days=36500)
+    for i in range(10):
+        history.record('dev/1', i % 3 != 0, rtt=0.001 * i, timestamp=1000 + 10 * i)
+    history.flush()
+
+    reloaded = StatusHistory(capacity=4, directory=str(tmp_path), retention_days=36500)
+    times, states, rtts = reloaded.samples('dev/1', 0)
+    assert list(times) == [1000 + 10 * i for i in range(10)]
+    assert list(states) == [int(i % 3 != 0) for i in range(10)]
+    assert [round(r, 3) for r in rtts] == [float(i) for i in range(10)]
+    assert reloaded.summarize('dev/1', 1000, 1100) == history.summarize('dev/1', 1000, 1100)
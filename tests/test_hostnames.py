@@ -0,0 +1,70 @@
+"""Tests for the DNS PTR and NetBIOS node status parsers."""
+
+import struct
+
+from core.hostnames import build_nbstat_query, build_ptr_query, parse_nbstat_response, parse_ptr_response
+
+
+def ptr_response(query, name, rcode=0, compressed=False):
+    """Response to a PTR query carrying one answer"""
+    header = bytearray(query[:12])
+    header[2:4] = struct.pack('!H', 0x8180 | rcode)
+    header[6:8] = struct.pack('!H', 1)  # one answer
+    if compressed:
+        # A CNAME answer for www.example.com, then the PTR answer 'host' plus
+        # a pointer to 'example.com' inside the CNAME data
+        header[6:8] = struct.pack('!H', 2)
+        cname = b'\xc0\x0c' + struct.pack('!HHIH', 5, 1, 60, 17) + b'\x03www\x07example\x03com\x00'
+        example = len(query) + 12 + 4
+        rdata = b'\x04host' + struct.pack('!H', 0xC000 | example)
+        answer = b'\xc0\x0c' + struct.pack('!HHIH', 12, 1, 60, len(rdata)) + rdata
+        return bytes(header) + query[12:] + cname + answer
+    rdata = b''.join(bytes([len(label)]) + label.encode() for label in name.split('.')) + b'\x00'
+    answer = b'\xc0\x0c' + struct.pack('!HHIH', 12, 1, 60, len(rdata)) + rdata
+    return bytes(header) + query[12:] + answer
+
+
+def test_parse_ptr_response():
+    query = build_ptr_query('192.168.1.20', 0x1234)
+    assert parse_ptr_response(ptr_response(query, 'office-pc.lan')) == 'office-pc.lan'
+
+
+def test_parse_ptr_response_follows_compression_pointers():
+    query = build_ptr_query('10.0.0.7', 7)
+    assert parse_ptr_response(ptr_response(query, '', compressed=True)) == 'host.example.com'
+
+
+def test_parse_ptr_response_rejects_errors_and_garbage():
+    query = build_ptr_query('192.168.1.20', 1)
+    assert parse_ptr_response(ptr_response(query, 'x.lan', rcode=3)) is None  # NXDOMAIN
+    assert parse_ptr_response(query) is None  # no answers
+    assert parse_ptr_response(ptr_response(query, 'office-pc.lan')[:-8]) is None  # truncated
+    assert parse_ptr_response(b'') is None
+
+
+def test_parse_ptr_response_rejects_compression_loops():
+    query = build_ptr_query('192.168.1.20', 1)
+    looped = query[:6] + b'\x00\x01' + query[8:] + b'\xc0' + bytes([len(query)]) + b'\x00' * 10
+    assert parse_ptr_response(looped) is None
+
+
+def nbstat_response(names):
+    """Node status response listing (name, suffix, flags) entries"""
+    query = build_nbstat_query(5)
+    entries = b''.join(name.encode().ljust(15) + bytes([suffix]) + struct.pack('!H', flags)
+                       for name, suffix, flags in names)
+    rdata = bytes([len(names)]) + entries + b'\x00' * 6
+    return (struct.pack('!HHHHHH', 5, 0x8400, 0, 1, 0, 0) + query[12:-4]
+            + struct.pack('!HHIH', 0x21, 1, 0, len(rdata)) + rdata)
+
+
+def test_parse_nbstat_response_returns_the_unique_workstation_name():
+    response = nbstat_response([('WORKGROUP', 0x00, 0x8400), ('OFFICE-PC', 0x20, 0x0400),
+                                ('OFFICE-PC', 0x00, 0x0400)])
+    assert parse_nbstat_response(response) == 'OFFICE-PC'
+
+
+def test_parse_nbstat_response_without_a_workstation_name():
+    assert parse_nbstat_response(nbstat_response([('WORKGROUP', 0x00, 0x8400)])) is None
+    assert parse_nbstat_response(nbstat_response([('OFFICE-PC', 0x00, 0x0400)])[:-30]) is None
+    assert parse_nbstat_response(b'\x00' * 12) is None
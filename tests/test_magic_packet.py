@@ -0,0 +1,71 @@
+"""Tests for magic packet construction."""
+
+import time
+
+import pytest
+
+from core.magic_packet import MagicPacketSender, build_magic_packet, parse_secureon_password
+
+MAC = 'AA:BB:CC:DD:EE:FF'
+MAC_BYTES = bytes.fromhex('aabbccddeeff')
+
+
+def test_build_magic_packet():
+    packet = build_magic_packet(MAC)
+    assert len(packet) == 102
+    assert packet == b'\xff' * 6 + MAC_BYTES * 16
+
+
+@pytest.mark.parametrize('mac', ['aa-bb-cc-dd-ee-ff', 'aabb.ccdd.eeff', 'AABBCCDDEEFF'])
+def test_build_magic_packet_accepts_common_notations(mac):
+    assert build_magic_packet(mac) == build_magic_packet(MAC)
+
+
+def test_build_magic_packet_with_six_byte_secureon_password():
+    packet = build_magic_packet(MAC, '01:02:03:04:05:06')
+    assert len(packet) == 108
+    assert packet[:102] == build_magic_packet(MAC)
+    assert packet[102:] == b'\x01\x02\x03\x04\x05\x06'
+
+
+def test_build_magic_packet_with_four_byte_secureon_password():
+    packet = build_magic_packet(MAC, '192.168.0.1')
+    assert len(packet) == 106
+    assert packet[102:] == b'\xc0\xa8\x00\x01'
+
+
+def test_empty_secureon_password_is_ignored():
+    assert build_magic_packet(MAC, '') == build_magic_packet(MAC)
+
+
+@pytest.mark.parametrize('password', ['01:02:03', 'not-a-password', '300.1.1.1', '01:02:03:04:05:06:07'])
+def test_invalid_secureon_password(password):
+    with pytest.raises(ValueError):
+        parse_secureon_password(password)
+    with pytest.raises(ValueError):
+        build_magic_packet(MAC, password)
+
+
+def test_invalid_mac():
+    with pytest.raises(ValueError):
+        build_magic_packet('AA:BB:CC')
+
+
+def test_send_many_paces_every_repeated_packet():
+    sender = MagicPacketSender(broadcast_address='127.0.0.1', port=9, repeat=3)
+    sent = []
+
+    class Socket:
+        def sendto(self, packet, target):
+            sent.append((time.monotonic(), packet, target))
+
+    sender.close()
+    sender._sock = Socket()
+    devices = [{'id': '1', 'name': 'a', 'mac': MAC}, {'id': '2', 'name': 'b', 'mac': 'bad'}]
+    errors = sender.send_many(devices, packets_per_second=50)
+
+    assert errors[0] is None and 'Invalid MAC' in errors[1]
+    assert [target for _, _, target in sent] == [('127.0.0.1', 9)] * 3
+    assert all(packet == build_magic_packet(MAC) for _, packet, _ in sent)
+    # 3 packets at 50 per second span at least two 20 ms gaps
+    assert sent[-1][0] - sent[0][0] >= 0.038
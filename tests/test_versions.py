@@ -0,0 +1,60 @@
+"""Tests for version tracking used by ETags and delta responses."""
+
+from core.versions import ChangeTracker
+
+
+def test_changes_since_returns_keys_changed_after_a_version():
+    tracker = ChangeTracker()
+    start = tracker.version
+    tracker.touch(['a', 'b'])
+    middle = tracker.version
+    tracker.touch(['c'])
+    tracker.remove(['a'])
+
+    assert tracker.version == start + 3
+    version, (changed, deleted) = tracker.changes_since(start)
+    assert version == tracker.version
+    assert sorted(changed) == ['b', 'c']
+    assert deleted == ['a']
+
+    _, (changed, deleted) = tracker.changes_since(middle)
+    assert changed == ['c']
+    assert deleted == ['a']
+
+    assert tracker.changes_since(tracker.version) == (tracker.version, ([], []))
+
+
+def test_touch_after_remove_revives_a_key():
+    tracker = ChangeTracker()
+    start = tracker.version
+    tracker.remove(['a'])
+    tracker.touch(['a'])
+    assert tracker.changes_since(start)[1] == (['a'], [])
+
+
+def test_empty_changes_do_not_bump_the_version():
+    tracker = ChangeTracker()
+    version = tracker.version
+    tracker.touch([])
+    tracker.remove(iter(()))
+    assert tracker.version == version
+
+
+def test_unknown_versions_need_full_state():
+    tracker = ChangeTracker()
+    tracker.touch(['a'])
+    assert tracker.changes_since(tracker.version - 2) == (tracker.version, None)
+    assert tracker.changes_since(tracker.version + 1) == (tracker.version, None)
+
+
+def test_dropping_tombstones_raises_the_floor():
+    tracker = ChangeTracker(max_tombstones=2)
+    start = tracker.version
+    tracker.touch(['keep'])
+    tracker.remove(['a', 'b', 'c'])
+
+    assert tracker.changes_since(start) == (tracker.version, None)
+    tracker.touch(['d'])
+    _, (changed, deleted) = tracker.changes_since(tracker.version - 1)
+    assert changed == ['d']
+    assert deleted == []